@@ -0,0 +1,164 @@
+"""API scenarios against a generated dataset: capture throughput, dashboard latency and login rate
+
+Usage: python benchmarks/bench_api.py --db bench-10k.db [--scenario capture_submission ...]
+                                      [--requests 500] [--threads 4] [--output results.json]
+
+Generate the database with datagen.py first. Requests go through Flask's test client, so
+the numbers cover the application and database but not a network or WSGI server. Capture
+requests write to the database; regenerate it for comparable runs.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, '..', 'src'))
+
+from datagen import event_payload
+
+SCENARIOS = ['capture_submission', 'get_client_submissions', 'get_client_analytics', 'login']
+DEFAULT_REQUESTS = {'capture_submission': 1000, 'get_client_submissions': 200, 'get_client_analytics': 50, 'login': 20}
+
+def load_app(db_path):
+    """Import the app against the benchmark database, with spam rate limits out of the way"""
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(db_path)}'
+    for name in ('SPAM_RATE_PER_IP', 'SPAM_BURST_PER_IP', 'SPAM_RATE_PER_CLIENT', 'SPAM_BURST_PER_CLIENT'):
+        os.environ.setdefault(name, '100000000')
+    from main import app, init_db
+    with app.app_context():
+        init_db()
+    return app
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def make_requests(scenario, manifest, count, seed):
+    """(method, path, json body) for each request, decided up front so every run is identical"""
+    rng = random.Random(seed)
+    targets = [manifest['largest_client']['client_id'], manifest['median_client']['client_id']]
+    requests = []
+    for index in range(count):
+        client_id = targets[index % len(targets)]
+        if scenario == 'capture_submission':
+            # Unique emails keep the idempotency check from answering captures as duplicates
+            payload = event_payload(rng, f'bench{seed}-{index}')
+            payload['_lead_score_factors']['has_utm_source'] = bool(payload.get('utm_source'))
+            requests.append(('POST', f'/api/submissions/{client_id}', payload))
+        elif scenario == 'get_client_submissions':
+            requests.append(('GET', f'/api/submissions/client/{client_id}?limit=100', None))
+        elif scenario == 'get_client_analytics':
+            requests.append(('GET', f'/api/submissions/analytics/{client_id}', None))
+        elif scenario == 'login':
+            requests.append(('POST', '/api/auth/login', {'username': 'admin', 'password': 'admin123'}))
+    return requests
+
+def run_scenario(app, scenario, requests, threads, headers=None):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    chunks = [requests[i::threads] for i in range(threads)]
+
+    def worker(chunk):
+        client = app.test_client()
+        timings = []
+        failed = []
+        for method, path, body in chunk:
+            started = time.perf_counter()
+            response = client.open(path, method=method, json=body, headers=headers)
+            timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failed.append(response.status_code)
+        with lock:
+            latencies.extend(timings)
+            errors.extend(failed)
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks if chunk]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'scenario': scenario,
+        'requests': len(requests),
+        'threads': threads,
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(len(requests) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    return {
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='Scenario to run; repeat for several (default: all)')
+    parser.add_argument('--requests', type=int, help='Requests per scenario (default depends on scenario)')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per scenario')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--accept-encoding', help='Accept-Encoding header to send, e.g. gzip (default: none)')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with open(args.db + '.json') as f:
+        manifest = json.load(f)
+    app = load_app(args.db)
+
+    headers = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else None
+    results = []
+    for scenario in args.scenario or SCENARIOS:
+        count = args.requests or DEFAULT_REQUESTS[scenario]
+        warmup = make_requests(scenario, manifest, args.warmup, args.seed + 1000)
+        run_scenario(app, scenario, warmup, 1, headers)
+        result = run_scenario(app, scenario, make_requests(scenario, manifest, count, args.seed), args.threads, headers)
+        print(f"{scenario:<24} {result['requests_per_sec']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+              f"p95 {result['p95_ms']:>8.2f} ms  errors {result['errors']}", file=sys.stderr)
+        results.append(result)
+
+    report = {
+        'benchmark': 'api',
+        'environment': environment(),
+        'accept_encoding': args.accept_encoding,
+        'dataset': manifest,
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
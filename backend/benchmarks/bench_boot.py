@@ -0,0 +1,74 @@
+"""Worker cold start: time from a fresh interpreter to a ready ASGI application
+
+Usage: python benchmarks/bench_boot.py [--runs 10] [--db bench-boot.db] [--output results.json]
+
+Each run imports asgi.py in a new process against an initialized database, the way a
+uvicorn worker starts after `flask init-db` has run at deploy time.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+PROBE = '''
+import json, time
+started = time.perf_counter()
+from asgi import application
+print(json.dumps(dict(application.flask_app.extensions['boot'], import_asgi_seconds=time.perf_counter() - started)))
+'''
+
+def run_python(code, env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return time.perf_counter() - started, result.stdout.strip().splitlines()
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'mean_ms': round(statistics.mean(values) * 1000, 1),
+        'p50_ms': round(values[len(values) // 2] * 1000, 1),
+        'max_ms': round(values[-1] * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--db', help='Database to boot against (default: a new temporary one)')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'boot.db')
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.abspath(db_path)}')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'init-db'], cwd=SRC_DIR, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+    interpreter = [run_python('pass', env)[0] for _ in range(args.runs)]
+    process = []
+    phases = {}
+    for _ in range(args.runs):
+        elapsed, output = run_python(PROBE, env)
+        process.append(elapsed)
+        for phase, seconds in json.loads(output[-1]).items():
+            phases.setdefault(phase, []).append(seconds)
+
+    results = [dict(phase='process_total', **summarize(process)),
+               dict(phase='interpreter_startup', **summarize(interpreter))]
+    results += [dict(phase=phase.replace('_seconds', ''), **summarize(values)) for phase, values in sorted(phases.items())]
+    for result in results:
+        print(f"{result['phase']:<20} p50 {result['p50_ms']:8.1f} ms  max {result['max_ms']:8.1f} ms", file=sys.stderr)
+
+    report = {'benchmark': 'boot', 'runs': args.runs, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Response compression: size and CPU cost per encoding and level on dashboard-sized JSON payloads
+
+Usage: python benchmarks/bench_compression.py [--rows 1000] [--iterations 20] [--output results.json]
+
+Payloads are shaped like /api/submissions/client/<id> responses and go through the same
+streaming compressor as the after_request hook. Encodings whose library is missing are skipped.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from datagen import event_payload
+from services.compression import available_encodings, compress_stream, CHUNK_BYTES
+
+LEVELS = {'gzip': [1, 6, 9], 'br': [1, 4, 6], 'zstd': [1, 3, 9]}
+
+def submissions_payload(rng, rows):
+    submissions = []
+    for index in range(rows):
+        data = event_payload(rng, index)
+        data.pop('_lead_score_factors')
+        submissions.append({
+            'id': index + 1,
+            'form_id': data['_form_id'],
+            'form_type': data['_form_type'],
+            'form_url': data['_form_url'],
+            'page_title': data['_form_title'],
+            'submission_date': '2025-03-14T09:26:53',
+            'email': data['email'],
+            'name': data['name'],
+            'phone': data.get('phone'),
+            'initial_utm_source': data.get('utm_source_initial'),
+            'recent_utm_source': data.get('utm_source'),
+            'recent_utm_campaign': data.get('utm_campaign'),
+            'session_count': data['session_count'],
+            'pages_visited': data['pages_visited'],
+            'page_journey': data['page_journey'],
+            'lead_quality_score': 55.0,
+            'additional_data': {'email': data['email'], 'name': data['name'], 'message': data['message']},
+        })
+    return json.dumps({'success': True, 'submissions': submissions}).encode()
+
+def measure(body, encoding, level, iterations):
+    chunks = [body[i:i + CHUNK_BYTES] for i in range(0, len(body), CHUNK_BYTES)]
+    compressed = 0
+    cpu_started = time.thread_time()
+    wall_started = time.perf_counter()
+    for _ in range(iterations):
+        compressed = sum(len(part) for part in compress_stream(chunks, encoding, level))
+    cpu = (time.thread_time() - cpu_started) / iterations
+    wall = (time.perf_counter() - wall_started) / iterations
+    return compressed, cpu, wall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    body = submissions_payload(random.Random(args.seed), args.rows)
+    megabytes = len(body) / 1e6
+    results = []
+    for encoding in available_encodings(['gzip', 'br', 'zstd']):
+        for level in LEVELS[encoding]:
+            compressed, cpu, wall = measure(body, encoding, level, args.iterations)
+            results.append({
+                'method': f'{encoding}-{level}',
+                'bytes': len(body),
+                'bytes_compressed': compressed,
+                'ratio': round(len(body) / compressed, 2),
+                'cpu_ms': round(cpu * 1000, 2),
+                'cpu_ms_per_mb': round(cpu * 1000 / megabytes, 2),
+                'mb_per_sec': round(megabytes / wall, 1),
+            })
+            print(f"{encoding + '-' + str(level):<8} {compressed:9d} B  x{len(body) / compressed:5.1f}  "
+                  f"{cpu * 1000:7.2f} ms CPU", file=sys.stderr)
+
+    report = {'benchmark': 'compression', 'rows': args.rows, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
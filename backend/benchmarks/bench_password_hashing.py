@@ -0,0 +1,67 @@
+"""Password hashing throughput: logins/sec per core for candidate hash parameters
+
+Usage: python benchmarks/bench_password_hashing.py [--methods scrypt:32768:8:1,pbkdf2:sha256:600000]
+                                                   [--seconds 3] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from services.passwords import PasswordHasher
+
+DEFAULT_METHODS = 'scrypt:32768:8:1,scrypt:16384:8:1,pbkdf2:sha256:600000,pbkdf2:sha256:260000'
+
+def measure(hasher, stored_hash, seconds, threads):
+    """Verifications per second with `threads` callers hammering the hasher"""
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        count = 0
+        while time.perf_counter() < deadline:
+            hasher.verify(stored_hash, 'benchmark-password')
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as callers:
+        total = sum(callers.map(lambda _: worker(), range(threads)))
+    return total / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', default=DEFAULT_METHODS)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    results = []
+    for method in args.methods.split(','):
+        hasher = PasswordHasher(method, workers=cores, queue_limit=cores * 4, timeout=60)
+        stored_hash = hasher.hash('benchmark-password')
+
+        single = measure(hasher, stored_hash, args.seconds, threads=1)
+        pooled = measure(hasher, stored_hash, args.seconds, threads=cores * 2)
+        results.append({
+            'method': hasher.method_prefix,
+            'verify_ms': round(1000 / single, 2),
+            'logins_per_sec_single_thread': round(single, 1),
+            'logins_per_sec_pool': round(pooled, 1),
+            'logins_per_sec_per_core': round(pooled / cores, 1)
+        })
+        print(f"{hasher.method_prefix:<28} {1000 / single:8.2f} ms/verify  "
+              f"{pooled / cores:8.1f} logins/sec/core", file=sys.stderr)
+
+    report = {'benchmark': 'password_hashing', 'cores': cores, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Webhook delivery: outbox throughput against a local stub receiver, healthy and flaky
+
+Usage: python benchmarks/bench_webhooks.py [--submissions 2000] [--latency-ms 20] [--failure-rate 0.2]
+                                           [--output results.json]
+
+Submissions are captured through the batch endpoint (which writes the outbox rows), then
+`flask deliver-webhooks` passes run until the outbox is drained. The stub checks every
+signature and counts the TCP connections it accepted, which shows connection reuse.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bench_api import load_app
+from datagen import event_payload
+
+SECRET = 'bench-secret'
+
+class StubReceiver(ThreadingHTTPServer):
+    """CRM stand-in: keep-alive HTTP/1.1, fixed latency, a fraction of requests answered 503"""
+    daemon_threads = True
+
+    def __init__(self, latency, failure_rate, seed):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = self.requests = self.failed = self.bad_signatures = 0
+        self.delivered = set()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/hook'
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        expected = 'sha256=' + hmac.new(SECRET.encode(), f"{self.headers['X-LeadLift-Timestamp']}.".encode() + body,
+                                        hashlib.sha256).hexdigest()
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.requests += 1
+            failed = self.server.rng.random() < self.server.failure_rate
+            if hmac.compare_digest(expected, self.headers['X-LeadLift-Signature']):
+                if failed:
+                    self.server.failed += 1
+                else:
+                    self.server.delivered.update(item['delivery_id'] for item in json.loads(body)['submissions'])
+            else:
+                self.server.bad_signatures += 1
+        self.send_response(503 if failed else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+def capture(app, client_id, count, seed):
+    """Store `count` submissions through the batch endpoint, 20 per request"""
+    rng = random.Random(seed)
+    client = app.test_client()
+    for start in range(0, count, 20):
+        events = [event_payload(rng, f'hook{seed}-{index}') for index in range(start, min(start + 20, count))]
+        response = client.post(f'/api/submissions/{client_id}/batch', json={'v': 1, 'events': events})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+def run_scenario(app, name, args, failure_rate, seed):
+    from models.user import db, Client, DeliveryOutbox, Webhook
+    from services.delivery import get_deliverer, invalidate_webhooks
+
+    stub = StubReceiver(args.latency_ms / 1000, failure_rate, seed)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    client_id = f'bench-hooks-{name}'
+    with app.app_context():
+        db.session.add(Client(name=name, domain='example.com', client_id=client_id))
+        db.session.add(Webhook(client_id=client_id, url=stub.url, secret=SECRET))
+        db.session.commit()
+        invalidate_webhooks(client_id)
+
+    capture(app, client_id, args.submissions, seed)
+
+    passes = 0
+    started = time.perf_counter()
+    with app.app_context():
+        deliverer = get_deliverer()
+        while DeliveryOutbox.query.filter_by(client_id=client_id, status='pending').count():
+            deliverer.deliver_pending()
+            passes += 1
+        elapsed = time.perf_counter() - started
+        failed = DeliveryOutbox.query.filter_by(client_id=client_id, status='failed').count()
+    stub.shutdown()
+
+    result = {
+        'scenario': name,
+        'submissions': args.submissions,
+        'failure_rate': failure_rate,
+        'delivered': len(stub.delivered),
+        'failed': failed,
+        'passes': passes,
+        'http_requests': stub.requests,
+        'http_errors': stub.failed,
+        'connections': stub.connections,
+        'bad_signatures': stub.bad_signatures,
+        'drain_ms': round(elapsed * 1000, 1),
+        'deliveries_per_sec': round(len(stub.delivered) / elapsed, 1),
+    }
+    print(f"{name:<8} {result['delivered']:6d} delivered in {elapsed:6.2f}s  {result['http_requests']} requests "
+          f"over {result['connections']} connections, {passes} passes", file=sys.stderr)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--submissions', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--failure-rate', type=float, default=0.2)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    # Retries are due immediately so the flaky run measures delivery work rather than backoff sleeps
+    os.environ['WEBHOOK_BACKOFF_SECONDS'] = '0'
+    # The stub listens on loopback, which webhook delivery refuses by default
+    os.environ['WEBHOOK_ALLOW_PRIVATE_TARGETS'] = 'true'
+    os.environ['WEBHOOK_BATCH_SIZE'] = str(args.batch_size)
+    os.environ['WEBHOOK_CONCURRENCY'] = str(args.concurrency)
+    workdir = tempfile.mkdtemp(prefix='bench-webhooks-')
+    app = load_app(os.path.join(workdir, 'webhooks.db'))
+
+    results = [
+        run_scenario(app, 'healthy', args, 0.0, args.seed),
+        run_scenario(app, 'flaky', args, args.failure_rate, args.seed + 1),
+    ]
+    report = {
+        'benchmark': 'webhooks',
+        'latency_ms': args.latency_ms,
+        'batch_size': args.batch_size,
+        'concurrency': args.concurrency,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Tracking payload size and parse time: verbose JSON (v1) vs compact positional batches (v2)
+
+Usage: python benchmarks/bench_wire_format.py [--events 20] [--iterations 2000] [--output results.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from services.beacon import parse_batch, COMPACT_META_KEYS, COMPACT_UTM_KEYS, COMPACT_SESSION_KEYS
+
+SOURCES = ['google', 'facebook', 'linkedin', 'newsletter', 'bing', '']
+MEDIUMS = ['cpc', 'social', 'email', 'organic', '']
+
+def verbose_event(rng, index):
+    """Event shaped like the v1 tracking script payload"""
+    source = rng.choice(SOURCES)
+    event = {
+        'name': f'Lead {index}',
+        'email': f'lead{index}@example.com',
+        'phone': '555-0100',
+        'message': 'Interested in a quote for next month',
+        '_form_id': 'contact-form',
+        '_form_url': 'https://www.example.com/contact?ref=nav',
+        '_form_path': '/contact',
+        '_form_title': 'Contact Us | Example Co',
+        '_timestamp': '2024-05-01T12:00:00.000Z',
+        '_form_field_count': 5,
+        '_form_type': 'contact',
+        'utm_source': source,
+        'utm_medium': rng.choice(MEDIUMS),
+        'utm_campaign': 'spring-sale' if source else '',
+        'utm_term': '',
+        'utm_content': '',
+        'utm_source_initial': rng.choice(SOURCES),
+        'utm_medium_initial': rng.choice(MEDIUMS),
+        'utm_campaign_initial': '',
+        'session_count': str(rng.randint(1, 6)),
+        'engaged_duration': str(rng.randint(0, 600)),
+        'page_journey': '/,/services,/pricing,/contact',
+        'pages_visited': str(rng.randint(1, 8)),
+        '_idempotency_key': f'{index:08x}-6a1c-4c1e-9d5b-3f0e2a7c9b11',
+    }
+    event['_lead_score_factors'] = {
+        'session_count': int(event['session_count']),
+        'engaged_duration': int(event['engaged_duration']),
+        'pages_visited': int(event['pages_visited']),
+        'has_utm_source': bool(source),
+        'form_complexity': 5
+    }
+    return event
+
+def compact_event(event):
+    """Same conversion as toCompact() in the generated tracking script"""
+    skip = set(COMPACT_META_KEYS) | set(COMPACT_UTM_KEYS) | set(COMPACT_SESSION_KEYS) | {'_idempotency_key', '_lead_score_factors'}
+    compact = [event.get(key, '') for key in COMPACT_META_KEYS]
+    compact.append([event.get(key) or '' for key in COMPACT_UTM_KEYS])
+    compact.append([int(event['session_count']), int(event['engaged_duration']),
+                    int(event['pages_visited']), event['page_journey']])
+    compact.append(event['_idempotency_key'])
+    compact.append({k: v for k, v in event.items() if k not in skip})
+    return compact
+
+def time_parse(body, iterations, max_events):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse_batch(body, max_events)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    events = [verbose_event(rng, i) for i in range(args.events)]
+    formats = {
+        'v1_verbose': json.dumps({'v': 1, 'events': events}, separators=(',', ':')).encode(),
+        'v2_compact': json.dumps({'v': 2, 'e': [compact_event(e) for e in events]}, separators=(',', ':')).encode(),
+    }
+
+    results = []
+    for name, body in formats.items():
+        parse_us = time_parse(body, args.iterations, args.events)
+        results.append({
+            'format': name,
+            'events': args.events,
+            'bytes': len(body),
+            'bytes_gzip': len(gzip.compress(body)),
+            'bytes_per_event': round(len(body) / args.events, 1),
+            'parse_us_per_batch': round(parse_us, 1),
+            'parse_us_per_event': round(parse_us / args.events, 2)
+        })
+        print(f"{name:<12} {len(body):7d} B  {len(gzip.compress(body)):6d} B gz  "
+              f"{parse_us / args.events:7.2f} us/event", file=sys.stderr)
+
+    report = {'benchmark': 'wire_format', 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
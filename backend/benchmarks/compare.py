@@ -0,0 +1,94 @@
+"""Compare two benchmark result files and flag regressions
+
+Usage: python benchmarks/compare.py baseline.json candidate.json [--threshold 10] [--output diff.json]
+
+Accepts run_suite.py reports or single benchmark reports. Throughput metrics (*per_sec*)
+regress when they drop, latency metrics (*_ms, *_us*) when they rise. Exits with status 1
+if any metric is worse than the baseline by more than the threshold (percent).
+"""
+import argparse
+import json
+import sys
+
+# First of these fields present in a result row names it
+IDENTITY_FIELDS = ('scenario', 'method', 'format', 'phase')
+
+def direction(metric):
+    """1 if higher is better, -1 if lower is better, None for metrics that are not compared"""
+    if 'per_sec' in metric or 'per_core' in metric:
+        return 1
+    if metric.endswith('_ms') or '_us' in metric:
+        return -1
+    return None
+
+def by_benchmark(report):
+    if 'benchmarks' in report:
+        return report['benchmarks']
+    return {report['benchmark']: report}
+
+def result_rows(benchmark):
+    rows = {}
+    for row in benchmark.get('results', []):
+        name = next((row[field] for field in IDENTITY_FIELDS if field in row), None)
+        if name is not None:
+            rows[name] = row
+    return rows
+
+def compare(baseline, candidate, threshold):
+    changes = []
+    baseline_benchmarks = by_benchmark(baseline)
+    for benchmark, candidate_report in sorted(by_benchmark(candidate).items()):
+        if benchmark not in baseline_benchmarks:
+            continue
+        baseline_rows = result_rows(baseline_benchmarks[benchmark])
+        for name, row in sorted(result_rows(candidate_report).items()):
+            before_row = baseline_rows.get(name)
+            if before_row is None:
+                continue
+            for metric, after in sorted(row.items()):
+                sign = direction(metric)
+                before = before_row.get(metric)
+                if sign is None or not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+                    continue
+                if not before:
+                    continue
+                change = (after - before) / before * 100
+                changes.append({
+                    'benchmark': benchmark,
+                    'name': name,
+                    'metric': metric,
+                    'baseline': before,
+                    'candidate': after,
+                    'change_pct': round(change, 1),
+                    'regression': change * sign < -threshold,
+                })
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    changes = compare(baseline, candidate, args.threshold)
+    for change in changes:
+        marker = 'REGRESSION' if change['regression'] else ''
+        print(f"{change['benchmark']:<18} {change['name']:<26} {change['metric']:<30} "
+              f"{change['baseline']:>10} -> {change['candidate']:>10}  {change['change_pct']:>+7.1f}%  {marker}")
+
+    regressions = [change for change in changes if change['regression']]
+    report = {'threshold_pct': args.threshold, 'regressions': len(regressions), 'changes': changes}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Synthetic benchmark dataset: clients, forms, UTM journeys and submissions in a SQLite file
+
+Usage: python benchmarks/datagen.py --db bench-10k.db [--size 10k|1m|10m] [--submissions N]
+                                    [--clients N] [--seed 42]
+
+Writes a manifest next to the database (<db>.json) that bench_api.py uses to pick
+its target clients. The same seed always produces the same data.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from sqlalchemy import create_engine, insert
+from models.user import db
+from routes.submissions import calculate_lead_score
+
+# submissions, clients
+SIZES = {
+    '10k': (10_000, 50),
+    '1m': (1_000_000, 500),
+    '10m': (10_000_000, 2_000),
+}
+BATCH_SIZE = 10_000
+
+INDUSTRIES = ['Legal', 'Dental', 'Home Services', 'Real Estate', 'SaaS', 'Healthcare', 'Automotive', 'Education']
+FORM_TYPES = [('contact', 5), ('quote', 8), ('newsletter', 1), ('demo', 6), ('signup', 3)]
+PAGES = ['/', '/pricing', '/about', '/services', '/blog', '/blog/guide', '/case-studies', '/contact', '/faq']
+
+# source -> (medium, campaigns); the empty source is direct traffic
+CHANNELS = {
+    'google': ('cpc', ['brand', 'generic', 'competitor', 'retargeting']),
+    'facebook': ('social', ['spring-promo', 'lookalike', 'video-views']),
+    'linkedin': ('social', ['decision-makers', 'webinar']),
+    'newsletter': ('email', ['weekly', 'product-update']),
+    'bing': ('cpc', ['brand', 'generic']),
+    'organic': ('organic', ['']),
+    '': ('', ['']),
+}
+CHANNEL_WEIGHTS = [30, 15, 6, 8, 4, 17, 20]
+
+def client_weights(count, skew=1.1):
+    """Zipf-like sizes: a few large clients, a long tail of small ones"""
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+def make_clients(rng, count):
+    clients = []
+    for index in range(count):
+        clients.append({
+            'client_id': f'{rng.getrandbits(32):08x}',
+            'name': f'Client {index}',
+            'domain': f'client{index}.example.com',
+            'industry': rng.choice(INDUSTRIES),
+            'created_at': datetime(2023, 1, 1),
+            'updated_at': datetime(2023, 1, 1),
+        })
+    return clients
+
+def make_forms(rng, clients):
+    """Each client's (form_type, field_count, catalog id) choices and the forms catalog rows"""
+    forms = {}
+    rows = []
+    for client in clients:
+        types = rng.sample(FORM_TYPES, rng.randint(1, 3))
+        forms[client['client_id']] = []
+        for form_type, field_count in types:
+            rows.append({
+                'id': len(rows) + 1,
+                'client_id': client['client_id'],
+                'form_name': f'{form_type}-form',
+                'form_identifier': f'{form_type}-form',
+                'form_type': form_type,
+                'created_at': datetime(2023, 1, 1),
+            })
+            forms[client['client_id']].append((form_type, field_count, len(rows)))
+    return forms, rows
+
+def utm_dictionary():
+    values = set()
+    for source, (medium, campaigns) in CHANNELS.items():
+        values.update([source, medium] + campaigns)
+    values.discard('')
+    return {value: index for index, value in enumerate(sorted(values), start=1)}
+
+def touch(rng):
+    source = rng.choices(list(CHANNELS), CHANNEL_WEIGHTS)[0]
+    medium, campaigns = CHANNELS[source]
+    return source, medium, rng.choice(campaigns)
+
+def event_payload(rng, index, form_type='contact', field_count=5):
+    """One visitor journey as the tracking script would send it"""
+    first = touch(rng)
+    # Most leads convert in the session they arrived in; the rest come back via another channel
+    last = first if rng.random() < 0.7 else touch(rng)
+    session_count = min(1 + int(rng.expovariate(0.6)), 30)
+    pages_visited = min(1 + int(rng.expovariate(0.35)), 40)
+    engaged = int(rng.lognormvariate(4.2, 1.0))
+    data = {
+        'email': f'lead{index}@example.com',
+        'name': f'Lead {index}',
+        '_form_id': f'{form_type}-form',
+        '_form_type': form_type,
+        '_form_url': f'https://www.example.com/{form_type}',
+        '_form_path': f'/{form_type}',
+        '_form_title': f'{form_type.title()} | Example Co',
+        '_form_field_count': field_count,
+        'session_count': session_count,
+        'engaged_duration': engaged,
+        'pages_visited': pages_visited,
+        'page_journey': json.dumps(rng.sample(PAGES, min(pages_visited, len(PAGES)))),
+        'message': 'Looking for a quote' if form_type in ('quote', 'contact') else '',
+    }
+    if rng.random() < 0.6:
+        data['phone'] = f'555-{rng.randint(1000, 9999)}'
+    for prefix, (source, medium, campaign) in (('', last), ('_initial', first)):
+        if source:
+            data[f'utm_source{prefix}'] = source
+            data[f'utm_medium{prefix}'] = medium
+            if campaign:
+                data[f'utm_campaign{prefix}'] = campaign
+    data['_lead_score_factors'] = {
+        'session_count': session_count,
+        'engaged_duration': engaged,
+        'pages_visited': pages_visited,
+        'has_utm_source': bool(last[0]),
+        'form_complexity': field_count,
+    }
+    return data
+
+def submission_row(rng, index, client_id, form, submitted, utm_ids):
+    form_type, field_count, form_ref_id = form
+    data = event_payload(rng, index, form_type, field_count)
+    factors = data.pop('_lead_score_factors')
+    return {
+        'client_id': client_id,
+        'form_name': data['_form_id'],
+        'form_id': data['_form_id'],
+        'form_ref_id': form_ref_id,
+        'form_type': form_type,
+        'form_url': data['_form_url'],
+        'form_path': data['_form_path'],
+        'page_title': data['_form_title'],
+        'submission_date': submitted,
+        'email': data['email'],
+        'name': data['name'],
+        'phone': data.get('phone'),
+        'initial_utm_source_id': utm_ids.get(data.get('utm_source_initial')),
+        'initial_utm_medium_id': utm_ids.get(data.get('utm_medium_initial')),
+        'initial_utm_campaign_id': utm_ids.get(data.get('utm_campaign_initial')),
+        'recent_utm_source_id': utm_ids.get(data.get('utm_source')),
+        'recent_utm_medium_id': utm_ids.get(data.get('utm_medium')),
+        'recent_utm_campaign_id': utm_ids.get(data.get('utm_campaign')),
+        'engaged_session_duration_seconds': factors['engaged_duration'],
+        'page_journey': data['page_journey'],
+        'session_count': factors['session_count'],
+        'pages_visited': factors['pages_visited'],
+        'lead_quality_score': calculate_lead_score(factors, data),
+        'additional_data': json.dumps({'email': data['email'], 'name': data['name'], 'message': data['message']}),
+    }
+
+def generate(path, submissions, client_count, seed):
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f'sqlite:///{os.path.abspath(path)}')
+    db.metadata.create_all(engine)
+    tables = db.metadata.tables
+
+    clients = make_clients(rng, client_count)
+    forms, form_rows = make_forms(rng, clients)
+    utm_ids = utm_dictionary()
+    weights = client_weights(client_count)
+    client_ids = [client['client_id'] for client in clients]
+    counts = dict.fromkeys(client_ids, 0)
+    start = datetime(2024, 1, 1)
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        connection.exec_driver_sql('PRAGMA synchronous=OFF')
+        connection.execute(insert(tables['clients']), clients)
+        connection.execute(insert(tables['forms']), form_rows)
+        connection.execute(insert(tables['utm_values']), [{'id': i, 'value': v} for v, i in utm_ids.items()])
+
+        for batch_start in range(0, submissions, BATCH_SIZE):
+            rows = []
+            for index in range(batch_start, min(batch_start + BATCH_SIZE, submissions)):
+                client_id = rng.choices(client_ids, weights)[0]
+                counts[client_id] += 1
+                submitted = start + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+                rows.append(submission_row(rng, index, client_id, rng.choice(forms[client_id]), submitted, utm_ids))
+            connection.execute(insert(tables['submissions']), rows)
+            print(f'{batch_start + len(rows):>12,} submissions', end='\r', file=sys.stderr)
+    print(file=sys.stderr)
+
+    ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    manifest = {
+        'database': os.path.abspath(path),
+        'seed': seed,
+        'submissions': submissions,
+        'clients': client_count,
+        'largest_client': {'client_id': ranked[0][0], 'submissions': ranked[0][1]},
+        'median_client': {'client_id': ranked[len(ranked) // 2][0], 'submissions': ranked[len(ranked) // 2][1]},
+        'generated_seconds': round(time.perf_counter() - started, 1),
+    }
+    with open(path + '.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k')
+    parser.add_argument('--submissions', type=int)
+    parser.add_argument('--clients', type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    submissions, clients = SIZES[args.size]
+    manifest = generate(args.db, args.submissions or submissions, args.clients or clients, args.seed)
+    print(json.dumps(manifest, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Run every benchmark against a generated dataset and merge the reports into one JSON file
+
+Usage: python benchmarks/run_suite.py [--size 10k|1m|10m] [--seed 42] [--workdir bench-data]
+                                      [--threads 4] [--quick] [--output results.json]
+
+Compare two result files with compare.py. The dataset is generated once per size and seed
+and kept pristine in the work directory; each run works on a copy because the capture
+scenario writes to it.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+from bench_api import environment
+from datagen import SIZES
+
+def run_script(script, args):
+    command = [sys.executable, os.path.join(BENCH_DIR, script)] + args
+    print(f"$ {' '.join(command)}", file=sys.stderr)
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+def run_benchmark(script, args, workdir):
+    """The JSON report a benchmark script writes with --output"""
+    output = os.path.join(workdir, f'{os.path.splitext(script)[0]}.json')
+    run_script(script, args + ['--output', output])
+    with open(output) as f:
+        return json.load(f)
+
+def prepare_dataset(size, seed, workdir):
+    """Path to a fresh copy of the dataset, generating the pristine one on first use"""
+    pristine = os.path.join(workdir, f'pristine-{size}-{seed}.db')
+    if not os.path.exists(pristine + '.json'):
+        run_script('datagen.py', ['--db', pristine, '--size', size, '--seed', str(seed)])
+
+    run_db = os.path.join(workdir, f'run-{size}-{seed}.db')
+    shutil.copyfile(pristine, run_db)
+    with open(pristine + '.json') as f:
+        manifest = json.load(f)
+    manifest['database'] = os.path.abspath(run_db)
+    with open(run_db + '.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return run_db
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', default='bench-data')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--quick', action='store_true', help='Fewer requests and iterations, for a smoke run')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    run_db = prepare_dataset(args.size, args.seed, args.workdir)
+
+    api_args = ['--db', run_db, '--threads', str(args.threads)]
+    hashing_args = []
+    wire_args = []
+    boot_args = []
+    compression_args = []
+    webhook_args = []
+    if args.quick:
+        api_args += ['--requests', '20']
+        hashing_args += ['--seconds', '0.5']
+        wire_args += ['--iterations', '200']
+        boot_args += ['--runs', '3']
+        compression_args += ['--iterations', '3']
+        webhook_args += ['--submissions', '200']
+
+    benchmarks = [
+        run_benchmark('bench_api.py', api_args, args.workdir),
+        run_benchmark('bench_password_hashing.py', hashing_args, args.workdir),
+        run_benchmark('bench_wire_format.py', wire_args, args.workdir),
+        run_benchmark('bench_boot.py', boot_args, args.workdir),
+        run_benchmark('bench_compression.py', compression_args, args.workdir),
+        run_benchmark('bench_webhooks.py', webhook_args, args.workdir),
+    ]
+
+    report = {
+        'suite': 'leadlift',
+        'size': args.size,
+        'seed': args.seed,
+        'quick': args.quick,
+        'environment': environment(),
+        'benchmarks': {benchmark.pop('benchmark'): benchmark for benchmark in benchmarks},
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
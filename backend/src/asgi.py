@@ -0,0 +1,10 @@
+"""ASGI entry point: tracking captures and dashboard files are served natively, the API by the Flask app
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8080
+"""
+from asgiref.wsgi import WsgiToAsgi
+from main import app
+from services.async_ingest import IngestApp
+from services.static_assets import StaticAssetApp, get_manifest
+
+application = IngestApp(app, StaticAssetApp(get_manifest(app), WsgiToAsgi(app)))
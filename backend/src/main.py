@@ -1,60 +1,220 @@
 import os
 import sys
+import time
+import click
 # DON'T CHANGE THIS PATH
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, request, jsonify, send_from_directory
+# Boot time is reported on /api/health/live and /api/metrics
+BOOT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-from models.user import db, User, Client, Form, Submission
+from models.user import db, User
+from services.search import init_search_index
+from services.sharding import parse_shards, init_sharding, create_shard_tables
+from services.replicas import parse_replicas, init_read_replicas, remember_write
+from services.metrics import init_metrics, render_metrics
+from services.profiling import init_profiling
+from services.health import liveness, readiness
+from services.static_assets import init_static_assets, get_manifest
+from services.compression import init_compression
 
 # Load environment variables
 load_dotenv()
 
-# Import all the route blueprints
-from routes.auth import auth_bp
-from routes.users import users_bp  
-from routes.clients import clients_bp
-from routes.forms import forms_bp
-from routes.submissions import submissions_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
-
-# Get frontend URL from environment
-frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
-
-# Enable CORS for all routes with environment-based origins
-CORS(app,
-     supports_credentials=True,
-     origins=[
-         'http://localhost:5173', 
-         'http://localhost:3000', 
-         frontend_url,
-         'https://leadlift-ai.vercel.app',
-         'https://*.vercel.app'
-     ],
-     allow_headers=['Content-Type', 'Authorization'],
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
-
-# Database configuration - using SQLite for development
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///lead_tracking.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Create tables and default admin user
-with app.app_context():
+def create_app():
+    """Build the Flask app; schema creation and seeding are left to `flask init-db`"""
+    app_started = time.perf_counter()
+    
+    # The instance folder is pinned so `flask` commands (which import this module as src.main) use the
+    # same SQLite files as the server
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'),
+                instance_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance'))
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+
+    # Bearer token auth: comma-separated signing keys (newest last) for rotation, defaults to SECRET_KEY
+    app.config['TOKEN_SECRET_KEYS'] = [k for k in os.getenv('TOKEN_SECRET_KEYS', '').split(',') if k]
+    app.config['ACCESS_TOKEN_TTL'] = int(os.getenv('ACCESS_TOKEN_TTL', 900))
+    app.config['REFRESH_TOKEN_TTL'] = int(os.getenv('REFRESH_TOKEN_TTL', 14 * 24 * 3600))
+
+    # Password hashing: Werkzeug method string, worker pool size, extra queued requests and wait timeout.
+    # Stored hashes with other parameters are upgraded on the next successful login.
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.getenv('PASSWORD_HASH_QUEUE', 32))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Get frontend URL from environment
+    frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
+
+    # Enable CORS for all routes with environment-based origins
+    CORS(app,
+         supports_credentials=True,
+         origins=[
+             'http://localhost:5173', 
+             'http://localhost:3000', 
+             frontend_url,
+             'https://leadlift-ai.vercel.app',
+             'https://*.vercel.app'
+         ],
+         allow_headers=['Content-Type', 'Authorization', 'Idempotency-Key'],
+         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+
+    # Database configuration - using SQLite for development (overridable, e.g. by the benchmark suite)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///lead_tracking.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Per-client sharding: extra databases as name=url pairs. Submissions are placed on the primary
+    # database ('default') or one of these by a consistent hash of client_id; run
+    # `flask rebalance-shards` after changing the list.
+    app.config['SUBMISSION_SHARDS'] = parse_shards(os.getenv('SUBMISSION_SHARDS', ''))
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config['SUBMISSION_SHARDS'])
+    db.init_app(app)
+    init_sharding(app)
+
+    # Read replicas for dashboard GETs, as shard=url pairs ('default' is the primary database), or
+    # 'auto' to open each SQLite database read-only in WAL mode. Users are kept on the primary for
+    # REPLICA_READ_AFTER_WRITE_SECONDS after a write so they see their own changes despite lag.
+    app.config['READ_REPLICAS'] = parse_replicas(os.getenv('READ_REPLICAS', ''))
+    app.config['REPLICA_READ_AFTER_WRITE_SECONDS'] = int(os.getenv('REPLICA_READ_AFTER_WRITE_SECONDS', 10))
+    app.after_request(remember_write)
+
+    # Request timing and query instrumentation, exposed on /api/metrics (guarded by METRICS_TOKEN if set)
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', 200))
+    app.config['REQUEST_QUERY_WARNING'] = int(os.getenv('REQUEST_QUERY_WARNING', 50))
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    init_metrics(app)
+
+    # On-demand profiling: admins send an X-Profile header, or a fraction of requests (optionally only
+    # PROFILE_ENDPOINTS, comma-separated endpoint names) is sampled. Files land in PROFILE_DIR.
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_ENDPOINTS'] = [e for e in os.getenv('PROFILE_ENDPOINTS', '').split(',') if e]
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR')
+    app.config['PROFILE_MAX_KEPT'] = int(os.getenv('PROFILE_MAX_KEPT', 50))
+    app.config['PROFILE_SAMPLE_INTERVAL_MS'] = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))
+    app.config['PROFILE_TRACEMALLOC_FRAMES'] = int(os.getenv('PROFILE_TRACEMALLOC_FRAMES', 10))
+    app.config['PROFILE_TOP_ALLOCATIONS'] = int(os.getenv('PROFILE_TOP_ALLOCATIONS', 50))
+    init_profiling(app)
+
+    # Readiness (/api/health/ready) answers 503 once a database round trip exceeds HEALTH_DB_RTT_MS or a
+    # connection pool or work queue (async ingestion, password hashing) passes its saturation fraction
+    app.config['HEALTH_DB_RTT_MS'] = float(os.getenv('HEALTH_DB_RTT_MS', 250))
+    app.config['HEALTH_POOL_SATURATION'] = float(os.getenv('HEALTH_POOL_SATURATION', 0.9))
+    app.config['HEALTH_QUEUE_SATURATION'] = float(os.getenv('HEALTH_QUEUE_SATURATION', 0.8))
+    app.config['HEALTH_CACHE_SECONDS'] = float(os.getenv('HEALTH_CACHE_SECONDS', 2))
+
+    # Submission archival: rows older than the horizon move to gzip files under ARCHIVE_DIR
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.getenv('ARCHIVE_AFTER_DAYS', 365))
+    app.config['ARCHIVE_DIR'] = os.getenv('ARCHIVE_DIR')
+
+    # Spam/bot filtering for the public capture endpoint (rates are per minute, per worker process)
+    app.config['SPAM_MAX_SUBMISSION_BYTES'] = int(os.getenv('SPAM_MAX_SUBMISSION_BYTES', 64 * 1024))
+    app.config['SPAM_MAX_SUBMISSION_FIELDS'] = int(os.getenv('SPAM_MAX_SUBMISSION_FIELDS', 100))
+    app.config['SPAM_MAX_VALUE_LENGTH'] = int(os.getenv('SPAM_MAX_VALUE_LENGTH', 10000))
+    app.config['SPAM_MAX_BATCH_BYTES'] = int(os.getenv('SPAM_MAX_BATCH_BYTES', 256 * 1024))
+    app.config['MAX_BATCH_EVENTS'] = int(os.getenv('MAX_BATCH_EVENTS', 20))
+
+    # Public API origin baked into generated tracking scripts (defaults to the requesting host)
+    app.config['PUBLIC_API_URL'] = os.getenv('PUBLIC_API_URL')
+    app.config['SPAM_RATE_PER_IP'] = float(os.getenv('SPAM_RATE_PER_IP', 20))
+    app.config['SPAM_BURST_PER_IP'] = int(os.getenv('SPAM_BURST_PER_IP', 10))
+    app.config['SPAM_RATE_PER_CLIENT'] = float(os.getenv('SPAM_RATE_PER_CLIENT', 600))
+    app.config['SPAM_BURST_PER_CLIENT'] = int(os.getenv('SPAM_BURST_PER_CLIENT', 100))
+    app.config['DISPOSABLE_EMAIL_DOMAINS_FILE'] = os.getenv('DISPOSABLE_EMAIL_DOMAINS_FILE')
+    # Proxies in front of the app that append to X-Forwarded-For (1 behind Railway's or Heroku's router);
+    # the per-IP limit keys on the entry they added, or on the peer address when this is 0
+    app.config['TRUSTED_PROXY_HOPS'] = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+
+    # Idempotent capture: payload-hash dedup window and how long stored keys are kept
+    app.config['IDEMPOTENCY_WINDOW_SECONDS'] = int(os.getenv('IDEMPOTENCY_WINDOW_SECONDS', 60))
+    app.config['IDEMPOTENCY_KEY_TTL'] = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
+    # ASGI entry point (asgi.py): database worker threads for natively served captures, and how many
+    # captures may wait for one before new ones get 503
+    app.config['ASYNC_INGEST_WORKERS'] = int(os.getenv('ASYNC_INGEST_WORKERS', 4))
+    app.config['ASYNC_INGEST_QUEUE'] = int(os.getenv('ASYNC_INGEST_QUEUE', 5000))
+
+    # Webhook delivery (`flask deliver-webhooks --loop`): requests in flight overall and per destination
+    # host, submissions per POST, rows leased per shard and pass, and exponential backoff between attempts
+    # up to WEBHOOK_MAX_ATTEMPTS. Delivered outbox rows are kept WEBHOOK_KEEP_DELIVERED_DAYS.
+    app.config['WEBHOOK_CONCURRENCY'] = int(os.getenv('WEBHOOK_CONCURRENCY', 16))
+    app.config['WEBHOOK_PER_HOST'] = int(os.getenv('WEBHOOK_PER_HOST', 4))
+    app.config['WEBHOOK_TIMEOUT'] = float(os.getenv('WEBHOOK_TIMEOUT', 10))
+    app.config['WEBHOOK_BATCH_SIZE'] = int(os.getenv('WEBHOOK_BATCH_SIZE', 50))
+    app.config['WEBHOOK_CLAIM_SIZE'] = int(os.getenv('WEBHOOK_CLAIM_SIZE', 1000))
+    app.config['WEBHOOK_MAX_ATTEMPTS'] = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 12))
+    app.config['WEBHOOK_BACKOFF_SECONDS'] = float(os.getenv('WEBHOOK_BACKOFF_SECONDS', 30))
+    app.config['WEBHOOK_BACKOFF_MAX_SECONDS'] = float(os.getenv('WEBHOOK_BACKOFF_MAX_SECONDS', 6 * 3600))
+    app.config['WEBHOOK_POLL_SECONDS'] = float(os.getenv('WEBHOOK_POLL_SECONDS', 2))
+    app.config['WEBHOOK_KEEP_DELIVERED_DAYS'] = int(os.getenv('WEBHOOK_KEEP_DELIVERED_DAYS', 7))
+    # Webhook URLs must resolve to public addresses; only enable for local testing against a stub receiver
+    app.config['WEBHOOK_ALLOW_PRIVATE_TARGETS'] = os.getenv('WEBHOOK_ALLOW_PRIVATE_TARGETS', 'false').lower() == 'true'
+
+    # Columnar snapshot for cross-client reports, refreshed by `flask export-snapshot`
+    app.config['SNAPSHOT_DIR'] = os.getenv('SNAPSHOT_DIR')
+    
+    # Response compression for text bodies of at least COMPRESSION_MIN_BYTES, in server preference order
+    # (br and zstd only when the brotli / zstandard packages are installed), streamed as it is sent
+    app.config['COMPRESSION_ENCODINGS'] = [e for e in os.getenv('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',') if e]
+    app.config['COMPRESSION_MIN_BYTES'] = int(os.getenv('COMPRESSION_MIN_BYTES', 1400))
+    app.config['COMPRESSION_GZIP_LEVEL'] = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    app.config['COMPRESSION_BR_QUALITY'] = int(os.getenv('COMPRESSION_BR_QUALITY', 4))
+    app.config['COMPRESSION_ZSTD_LEVEL'] = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))
+    init_compression(app)
+    
+    # Dashboard files are indexed once at startup; compressible files without a .gz/.br from
+    # `flask compress-static` are gzipped in memory on first request if at least this large
+    app.config['STATIC_GZIP_MIN_BYTES'] = int(os.getenv('STATIC_GZIP_MIN_BYTES', 1024))
+    init_static_assets(app)
+    
+    with app.app_context():
+        init_read_replicas(app)
+    
+    register_blueprints(app)
+    register_commands(app)
+    register_routes(app)
+    
+    app.extensions['boot'] = {
+        'imports_seconds': round(app_started - BOOT_STARTED, 3),
+        'create_app_seconds': round(time.perf_counter() - app_started, 3),
+    }
+    return app
+
+def register_blueprints(app):
+    # Route modules pull in most of the services, so they are imported here rather than at module load
+    from routes.auth import auth_bp
+    from routes.users import users_bp
+    from routes.clients import clients_bp
+    from routes.forms import forms_bp
+    from routes.submissions import submissions_bp
+    from routes.reports import reports_bp
+    from routes.profiles import profiles_bp
+    
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(users_bp, url_prefix='/api/users')
+    app.register_blueprint(clients_bp, url_prefix='/api/clients')
+    app.register_blueprint(forms_bp, url_prefix='/api/forms')
+    app.register_blueprint(submissions_bp, url_prefix='/api/submissions')
+    app.register_blueprint(reports_bp, url_prefix='/api/reports')
+    app.register_blueprint(profiles_bp, url_prefix='/api/profiles')
+
+def init_db():
+    """Create tables, search indexes and the default admin user; safe to run on every deploy"""
     db.create_all()
+    init_search_index()
+    create_shard_tables()
     
     # Create default admin user if none exists
-    from werkzeug.security import generate_password_hash
+    from services.passwords import hash_password
     
     admin_user = User.query.filter_by(role='admin').first()
     if not admin_user:
         default_admin = User(
             username='admin',
             email='admin@leadlift.ai',
-            password_hash=generate_password_hash('admin123'),
+            password_hash=hash_password('admin123'),
             first_name='Admin',
             last_name='User',
             role='admin',
@@ -64,33 +224,117 @@ with app.app_context():
         db.session.commit()
         print("Created default admin user: admin / admin123")
 
-# Register blueprints AFTER database initialization
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(users_bp, url_prefix='/api/users')
-app.register_blueprint(clients_bp, url_prefix='/api/clients')
-app.register_blueprint(forms_bp, url_prefix='/api/forms')
-app.register_blueprint(submissions_bp, url_prefix='/api/submissions')
-
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    return {'status': 'healthy', 'message': 'LeadLift.ai API is running'}
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+def register_commands(app):
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the database schema and the default admin user (idempotent; the web start command runs it
+        in the same container, since a default SQLite file does not outlive a separate release container)"""
+        init_db()
+        print("Database initialized")
+    
+    @app.cli.command('compress-static')
+    def compress_static_command():
+        """Write .gz/.br variants of the dashboard files (run after building the frontend)"""
+        from services.static_assets import compress_static
+        written = compress_static(app.static_folder, app.config['STATIC_GZIP_MIN_BYTES'])
+        print(f"Wrote {written['gzip']} gzip and {written['br']} brotli files")
+    
+    @app.cli.command('archive-submissions')
+    def archive_submissions_command():
+        """Move submissions older than ARCHIVE_AFTER_DAYS into monthly archive files"""
+        from services.archive import archive_submissions, get_archive_dir
+        from services.attribution import attribution_cache
+        archived = archive_submissions(get_archive_dir(app), app.config['ARCHIVE_AFTER_DAYS'])
+        attribution_cache.clear()
+        print(f"Archived {archived} submissions")
+
+    @app.cli.command('export-snapshot')
+    def export_snapshot_command():
+        """Export submissions into the Parquet snapshot used by /api/reports"""
+        from services.columnar import export_snapshot
+        rows = export_snapshot(app)
+        print(f"Exported {rows} submissions to analytics snapshot")
+
+    @app.cli.command('prune-idempotency-keys')
+    def prune_idempotency_keys_command():
+        """Delete idempotency keys older than IDEMPOTENCY_KEY_TTL"""
+        from services.idempotency import prune_keys
+        deleted = prune_keys(app.config['IDEMPOTENCY_KEY_TTL'])
+        print(f"Deleted {deleted} idempotency keys")
+
+    @app.cli.command('deliver-webhooks')
+    @click.option('--loop', is_flag=True, help='Keep polling the outbox instead of making a single pass')
+    def deliver_webhooks_command(loop):
+        """Push queued submissions to client webhooks (run with --loop as a worker process)"""
+        from services.delivery import run_worker
+        run_worker(app.config['WEBHOOK_POLL_SECONDS'], once=not loop)
+
+    @app.cli.command('prune-deliveries')
+    def prune_deliveries_command():
+        """Delete delivered outbox rows older than WEBHOOK_KEEP_DELIVERED_DAYS"""
+        from services.delivery import prune_deliveries
+        deleted = prune_deliveries(app.config['WEBHOOK_KEEP_DELIVERED_DAYS'] * 24 * 3600)
+        print(f"Deleted {deleted} delivered webhook rows")
+
+    @app.cli.command('encode-utm')
+    def encode_utm_command():
+        """Migrate UTM string columns from older databases into utm_values ids"""
+        from services.utm_encoding import encode_legacy_utm_columns
+        updated = encode_legacy_utm_columns()
+        print(f"Encoded UTM values on {updated} submission columns")
+
+    @app.cli.command('build-form-catalog')
+    def build_form_catalog_command():
+        """Link submissions from older databases to the forms catalog by integer id"""
+        from services.form_catalog import link_legacy_submissions
+        linked = link_legacy_submissions()
+        print(f"Linked {linked} submissions to catalog forms")
+
+    @app.cli.command('rebalance-shards')
+    @click.option('--dry-run', is_flag=True, help='Only list the clients that would move')
+    def rebalance_shards_command(dry_run):
+        """Move clients whose submissions live on a shard other than the one the hash ring assigns"""
+        from services.sharding import misplaced_clients, move_client
+        for client_id, source, target in misplaced_clients():
+            if dry_run:
+                print(f"{client_id}: {source} -> {target}")
+                continue
+            moved = move_client(client_id, source, target)
+            print(f"Moved {moved} submissions for {client_id} from {source} to {target}")
+
+def register_routes(app):
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        return {'status': 'healthy', 'message': 'LeadLift.ai API is running'}
+
+    @app.route('/api/health/live', methods=['GET'])
+    def health_live():
+        return liveness()
+
+    @app.route('/api/health/ready', methods=['GET'])
+    def health_ready():
+        report, ready = readiness()
+        return report, 200 if ready else 503
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'success': False, 'error': 'Authentication required'}), 401
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        # Under uvicorn these requests are answered by StaticAssetApp (asgi.py) before reaching Flask
+        status, headers, body = get_manifest(app).respond(path, 'GET', request.headers)
+        return Response(body, status=status, headers=headers)
+
+app = create_app()
 
 if __name__ == '__main__':
+    # Local development: create the schema on start instead of a separate init-db step
+    with app.app_context():
+        init_db()
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port, debug=False)
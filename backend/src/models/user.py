@@ -1,8 +1,52 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
+from flask import current_app
+from sqlalchemy import event, inspect, Table
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.ddl import ExecutableDDLElement
+from sqlalchemy.orm import Session
 from datetime import datetime
 import json
 
-db = SQLAlchemy()
+# Per-client tables that live on the client's shard; everything else stays on the primary database
+SHARDED_TABLES = frozenset(['submissions', 'submission_fields', 'submission_keys', 'submission_rollups',
+                            'delivery_outbox'])
+
+def _sharded_table(mapper, clause):
+    if mapper is not None:
+        return inspect(mapper).local_table.name in SHARDED_TABLES
+    table = clause if isinstance(clause, Table) else getattr(clause, 'table', None)
+    return getattr(table, 'name', None) in SHARDED_TABLES
+
+class ShardRoutingSession(FlaskSession):
+    """Sends statements on sharded tables to the bind in session.info['shard'] (None is the primary),
+    and reads to that database's replica while session.info['read_replica'] is set"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        key = self.info.get('shard') if _sharded_table(mapper, clause) else None
+
+        if self.info.get('read_replica'):
+            if self._flushing or isinstance(clause, (UpdateBase, ExecutableDDLElement)):
+                # Once this session writes, the rest of its reads must see the write
+                self.info['read_replica'] = False
+            else:
+                replica = current_app.extensions.get('read_replicas', {}).get(key)
+                if replica is not None:
+                    return replica
+
+        if key is not None:
+            return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': ShardRoutingSession})
+
+ROLE_PERMISSIONS = {
+    'admin': frozenset(['create_users', 'delete_users', 'manage_clients', 'view_analytics', 'manage_settings']),
+    'manager': frozenset(['manage_clients', 'view_analytics', 'create_users']),
+    'user': frozenset(['view_analytics'])
+}
 
 class Client(db.Model):
     __tablename__ = 'clients'
@@ -17,7 +61,12 @@ class Client(db.Model):
     
     # Relationships
     forms = db.relationship('Form', backref='client', lazy=True, cascade='all, delete-orphan')
-    submissions = db.relationship('Submission', backref='client', lazy=True, cascade='all, delete-orphan')
+    # Submissions may live on another shard, so this is a plain join without a database foreign key
+    submissions = db.relationship('Submission', backref='client', lazy=True, cascade='all, delete-orphan',
+                                  foreign_keys='Submission.client_id',
+                                  primaryjoin='Client.client_id == Submission.client_id')
+    custom_fields = db.relationship('ClientField', backref='client', lazy=True, cascade='all, delete-orphan')
+    webhooks = db.relationship('Webhook', backref='client', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -32,36 +81,114 @@ class Client(db.Model):
         }
 
 class Form(db.Model):
+    """Catalog of a client's forms: added by hand or upserted the first time the tracking script reports one"""
     __tablename__ = 'forms'
     
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.String(50), db.ForeignKey('clients.client_id'), nullable=False)
-    form_name = db.Column(db.String(255), nullable=False)
+    form_name = db.Column(db.String(255), nullable=False)  # the tracking script's _form_id
     form_identifier = db.Column(db.String(255))  # CSS selector or form ID
+    form_type = db.Column(db.String(100))  # as first reported by the tracking script
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relationships
-    submissions = db.relationship('Submission', backref='form_ref', lazy=True, 
-                                foreign_keys='Submission.form_name',
-                                primaryjoin='Form.form_name == Submission.form_name')
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'form_name', name='uq_forms_client_name'),
+    )
     
-    def to_dict(self):
+    # Submissions may live on another shard, so this is a plain id join without a database foreign key
+    submissions = db.relationship('Submission', backref='form_ref', lazy=True, viewonly=True,
+                                  foreign_keys='Submission.form_ref_id',
+                                  primaryjoin='Form.id == Submission.form_ref_id')
+    
+    def to_dict(self, submissions_count=0):
         return {
             'id': self.id,
             'client_id': self.client_id,
             'form_name': self.form_name,
             'form_identifier': self.form_identifier,
+            'form_type': self.form_type,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'submissions_count': len(self.submissions)
+            'submissions_count': submissions_count
         }
 
+class UtmValue(db.Model):
+    """Dictionary of distinct UTM strings; submissions store the integer id"""
+    __tablename__ = 'utm_values'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.String(255), unique=True, nullable=False)
+
+UTM_FIELDS = [
+    'initial_utm_source', 'initial_utm_medium', 'initial_utm_campaign', 'initial_utm_term', 'initial_utm_content',
+    'recent_utm_source', 'recent_utm_medium', 'recent_utm_campaign', 'recent_utm_term', 'recent_utm_content'
+]
+
+# Process-wide intern cache. UTM values never change once stored, so entries never go stale;
+# ids interned inside a transaction are only published here after it commits.
+_utm_ids = {}
+_utm_values = {}
+
+def intern_utm(value):
+    """Id for a UTM string, inserting it into utm_values on first sight"""
+    if not value:
+        return None
+    value = str(value)[:255]
+    utm_id = _utm_ids.get(value)
+    if utm_id is not None:
+        return utm_id
+    
+    pending = db.session.info.setdefault('pending_utm_values', {})
+    if value in pending:
+        return pending[value]
+    
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    db.session.execute(insert(UtmValue).values(value=value).on_conflict_do_nothing(index_elements=['value']))
+    utm_id = db.session.execute(db.select(UtmValue.id).where(UtmValue.value == value)).scalar_one()
+    pending[value] = utm_id
+    return utm_id
+
+def utm_value(utm_id):
+    """UTM string for an id from utm_values"""
+    if utm_id is None:
+        return None
+    value = _utm_values.get(utm_id)
+    if value is None:
+        row = db.session.get(UtmValue, utm_id)
+        if row is None:
+            return None
+        value = _utm_values[utm_id] = row.value
+        _utm_ids[value] = utm_id
+    return value
+
+@event.listens_for(Session, 'after_commit')
+def _publish_interned_utm_values(session):
+    for value, utm_id in session.info.pop('pending_utm_values', {}).items():
+        _utm_ids[value] = utm_id
+        _utm_values[utm_id] = value
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_interned_utm_values(session):
+    session.info.pop('pending_utm_values', None)
+
+def utm_property(id_attribute):
+    def getter(self):
+        return utm_value(getattr(self, id_attribute))
+    def setter(self, value):
+        setattr(self, id_attribute, intern_utm(value))
+    return property(getter, setter)
+
 class Submission(db.Model):
     __tablename__ = 'submissions'
     
     id = db.Column(db.Integer, primary_key=True)
-    client_id = db.Column(db.String(50), db.ForeignKey('clients.client_id'), nullable=False)
+    client_id = db.Column(db.String(50), nullable=False)  # clients live on the primary database
     form_name = db.Column(db.String(255))  # Legacy field
     form_id = db.Column(db.String(255))  # Auto-detected form identifier
+    form_ref_id = db.Column(db.Integer)  # id in the forms catalog (which stays on the primary database)
     form_type = db.Column(db.String(100))  # contact, lead, signup, newsletter, etc.
     form_url = db.Column(db.String(500))  # Full URL where form was submitted
     form_path = db.Column(db.String(255))  # URL path
@@ -73,24 +200,37 @@ class Submission(db.Model):
     name = db.Column(db.String(255))
     phone = db.Column(db.String(50))
     
-    # Initial UTM Parameters (first-touch)
-    initial_utm_source = db.Column(db.String(255))
-    initial_utm_medium = db.Column(db.String(255))
-    initial_utm_campaign = db.Column(db.String(255))
-    initial_utm_term = db.Column(db.String(255))
-    initial_utm_content = db.Column(db.String(255))
+    # Initial UTM Parameters (first-touch), stored as ids into utm_values (on the primary, so no foreign key)
+    initial_utm_source_id = db.Column(db.Integer)
+    initial_utm_medium_id = db.Column(db.Integer)
+    initial_utm_campaign_id = db.Column(db.Integer)
+    initial_utm_term_id = db.Column(db.Integer)
+    initial_utm_content_id = db.Column(db.Integer)
+    
+    # Recent UTM Parameters (latest session), stored as ids into utm_values (on the primary, so no foreign key)
+    recent_utm_source_id = db.Column(db.Integer)
+    recent_utm_medium_id = db.Column(db.Integer)
+    recent_utm_campaign_id = db.Column(db.Integer)
+    recent_utm_term_id = db.Column(db.Integer)
+    recent_utm_content_id = db.Column(db.Integer)
     
-    # Recent UTM Parameters (latest session)
-    recent_utm_source = db.Column(db.String(255))
-    recent_utm_medium = db.Column(db.String(255))
-    recent_utm_campaign = db.Column(db.String(255))
-    recent_utm_term = db.Column(db.String(255))
-    recent_utm_content = db.Column(db.String(255))
+    # String views of the encoded columns, read and written like the old String columns
+    initial_utm_source = utm_property('initial_utm_source_id')
+    initial_utm_medium = utm_property('initial_utm_medium_id')
+    initial_utm_campaign = utm_property('initial_utm_campaign_id')
+    initial_utm_term = utm_property('initial_utm_term_id')
+    initial_utm_content = utm_property('initial_utm_content_id')
+    recent_utm_source = utm_property('recent_utm_source_id')
+    recent_utm_medium = utm_property('recent_utm_medium_id')
+    recent_utm_campaign = utm_property('recent_utm_campaign_id')
+    recent_utm_term = utm_property('recent_utm_term_id')
+    recent_utm_content = utm_property('recent_utm_content_id')
     
     # Engagement Metrics
     engaged_session_duration_seconds = db.Column(db.Integer)
     page_journey = db.Column(db.Text)
     session_count = db.Column(db.Integer)
+    pages_visited = db.Column(db.Integer)
     
     # Lead Scoring
     lead_quality_score = db.Column(db.Numeric(5, 2))
@@ -98,6 +238,14 @@ class Submission(db.Model):
     # Additional Form Data (JSON for flexibility)
     additional_data = db.Column(db.Text)  # JSON string for custom form fields
     
+    # Indexed copies of configured custom fields (see ClientField)
+    extracted_fields = db.relationship('SubmissionField', backref='submission', lazy=True, cascade='all, delete-orphan')
+    
+    # Covers form listings and per-form stats, so they never read the submission rows themselves
+    __table_args__ = (
+        db.Index('ix_submissions_client_form', 'client_id', 'form_ref_id', 'submission_date', 'lead_quality_score'),
+    )
+    
     def to_dict(self):
         additional_data_parsed = None
         if self.additional_data:
@@ -127,10 +275,148 @@ class Submission(db.Model):
             'engaged_session_duration_seconds': self.engaged_session_duration_seconds,
             'page_journey': self.page_journey,
             'session_count': self.session_count,
+            'pages_visited': self.pages_visited,
             'lead_quality_score': float(self.lead_quality_score) if self.lead_quality_score else None,
             'additional_data': additional_data_parsed
         }
 
+class ClientField(db.Model):
+    """Custom form field a client wants extracted out of the submission JSON"""
+    __tablename__ = 'client_fields'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.String(50), db.ForeignKey('clients.client_id'), nullable=False)
+    field_key = db.Column(db.String(100), nullable=False)  # Name used in filters, e.g. 'budget'
+    field_type = db.Column(db.String(20), default='text')  # 'text' or 'number'
+    source_keys = db.Column(db.Text)  # JSON list of form field names to read from
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'field_key', name='uq_client_fields_client_key'),
+    )
+    
+    def get_source_keys(self):
+        if self.source_keys:
+            try:
+                return json.loads(self.source_keys)
+            except json.JSONDecodeError:
+                pass
+        return [self.field_key]
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'client_id': self.client_id,
+            'field_key': self.field_key,
+            'field_type': self.field_type,
+            'source_keys': self.get_source_keys(),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class SubmissionField(db.Model):
+    """Extracted value of a configured custom field, one row per submission and field"""
+    __tablename__ = 'submission_fields'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id'), nullable=False, index=True)
+    client_id = db.Column(db.String(50), nullable=False)
+    field_key = db.Column(db.String(100), nullable=False)
+    value_text = db.Column(db.String(255))
+    value_number = db.Column(db.Float)
+    
+    __table_args__ = (
+        db.Index('ix_submission_fields_text', 'client_id', 'field_key', 'value_text'),
+        db.Index('ix_submission_fields_number', 'client_id', 'field_key', 'value_number'),
+    )
+
+class SubmissionRollup(db.Model):
+    """Daily aggregates of archived submissions, so analytics stay correct after archival"""
+    __tablename__ = 'submission_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    form_id = db.Column(db.String(255))
+    form_type = db.Column(db.String(100))
+    source = db.Column(db.String(255))  # initial_utm_source or recent_utm_source or 'Direct'
+    submissions = db.Column(db.Integer, default=0)
+    score_total = db.Column(db.Float, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_submission_rollups_client_day', 'client_id', 'day'),
+    )
+
+class SubmissionKey(db.Model):
+    """Recently seen idempotency keys, so retried captures return the original submission"""
+    __tablename__ = 'submission_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.String(50), nullable=False)
+    idempotency_key = db.Column(db.String(128), nullable=False)
+    submission_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'idempotency_key', name='uq_submission_keys_client_key'),
+    )
+
+class Webhook(db.Model):
+    """URL a client's new submissions are pushed to (a CRM endpoint or Zapier-style hook)"""
+    __tablename__ = 'webhooks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.String(50), db.ForeignKey('clients.client_id'), nullable=False, index=True)
+    url = db.Column(db.String(2048), nullable=False)
+    secret = db.Column(db.String(128), nullable=False)  # HMAC key for the X-LeadLift-Signature header
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self, include_secret=False):
+        data = {
+            'id': self.id,
+            'client_id': self.client_id,
+            'url': self.url,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+        if include_secret:
+            data['secret'] = self.secret
+        return data
+
+class DeliveryOutbox(db.Model):
+    """One submission waiting to be (or already) pushed to one webhook; written with the submission"""
+    __tablename__ = 'delivery_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.String(50), nullable=False)
+    webhook_id = db.Column(db.Integer, nullable=False)  # webhooks live on the primary database
+    submission_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'delivered', 'failed'
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claim = db.Column(db.String(32))  # set by the worker that leased the row
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_delivery_outbox_due', 'status', 'next_attempt_at'),
+        db.Index('ix_delivery_outbox_client', 'client_id', 'status'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'webhook_id': self.webhook_id,
+            'submission_id': self.submission_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'delivered_at': self.delivered_at.isoformat() if self.delivered_at else None
+        }
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -170,14 +456,13 @@ class User(db.Model):
             
         return data
     
+    def get_permissions(self):
+        """Permissions granted by the user's role"""
+        return ROLE_PERMISSIONS.get(self.role, frozenset())
+    
     def has_permission(self, permission):
         """Check if user has specific permission based on role"""
-        permissions = {
-            'admin': ['create_users', 'delete_users', 'manage_clients', 'view_analytics', 'manage_settings'],
-            'manager': ['manage_clients', 'view_analytics', 'create_users'],
-            'user': ['view_analytics']
-        }
-        return permission in permissions.get(self.role, [])
+        return permission in self.get_permissions()
     
     def can_access_client(self, client_id):
         """Check if user can access specific client data"""
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, session
 from models.user import db, User
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.principal import get_current_principal, load_principal
+from services.tokens import REFRESH, issue_tokens, verify_token, password_fingerprint
+from services.passwords import HashingBusy, hash_password, verify_password, needs_rehash
 from datetime import datetime
 import re
 
@@ -23,6 +25,25 @@ def validate_password(password):
         return False, "Password must contain at least one number"
     return True, "Password is valid"
 
+def authenticate(username, password):
+    """Return the active user matching username/email and password, or None"""
+    # Find user by username or email
+    user = User.query.filter(
+        (User.username == username) | (User.email == username)
+    ).first()
+    
+    if not user or not user.is_active:
+        return None
+    
+    if not verify_password(user.password_hash, password):
+        return None
+    
+    # Upgrade hashes made with older parameters; the caller's commit persists it
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+    
+    return user
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """User login"""
@@ -31,15 +52,8 @@ def login():
         if not data or not data.get('username') or not data.get('password'):
             return jsonify({'success': False, 'error': 'Username and password are required'}), 400
         
-        # Find user by username or email
-        user = User.query.filter(
-            (User.username == data['username']) | (User.email == data['username'])
-        ).first()
-        
-        if not user or not user.is_active:
-            return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
-        
-        if not check_password_hash(user.password_hash, data['password']):
+        user = authenticate(data['username'], data['password'])
+        if not user:
             return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
         
         # Update last login
@@ -57,6 +71,9 @@ def login():
             'message': 'Login successful'
         })
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -76,17 +93,21 @@ def logout():
 def get_current_user():
     """Get current logged-in user"""
     try:
-        if 'user_id' not in session:
+        principal = get_current_principal()
+        if not principal:
             return jsonify({'success': False, 'error': 'Not authenticated'}), 401
         
-        user = User.query.get(session['user_id'])
-        if not user or not user.is_active:
+        # Token principals carry claims only; the full profile comes from the principal cache
+        if principal.user_data is None:
+            principal = load_principal(principal.id)
+        
+        if not principal or not principal.is_active:
             session.clear()
             return jsonify({'success': False, 'error': 'User not found or inactive'}), 401
         
         return jsonify({
             'success': True,
-            'user': user.to_dict()
+            'user': principal.user_data
         })
         
     except Exception as e:
@@ -96,19 +117,20 @@ def get_current_user():
 def change_password():
     """Change user password"""
     try:
-        if 'user_id' not in session:
+        principal = get_current_principal()
+        if not principal:
             return jsonify({'success': False, 'error': 'Not authenticated'}), 401
         
         data = request.get_json()
         if not data or not data.get('current_password') or not data.get('new_password'):
             return jsonify({'success': False, 'error': 'Current password and new password are required'}), 400
         
-        user = User.query.get(session['user_id'])
+        user = User.query.get(principal.id)
         if not user:
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
         # Verify current password
-        if not check_password_hash(user.password_hash, data['current_password']):
+        if not verify_password(user.password_hash, data['current_password']):
             return jsonify({'success': False, 'error': 'Current password is incorrect'}), 400
         
         # Validate new password
@@ -117,7 +139,7 @@ def change_password():
             return jsonify({'success': False, 'error': message}), 400
         
         # Update password
-        user.password_hash = generate_password_hash(data['new_password'])
+        user.password_hash = hash_password(data['new_password'])
         user.updated_at = datetime.utcnow()
         db.session.commit()
         
@@ -126,7 +148,57 @@ def change_password():
             'message': 'Password changed successfully'
         })
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@auth_bp.route('/token', methods=['POST'])
+def create_token():
+    """Issue a signed access/refresh token pair for API and integration clients"""
+    try:
+        data = request.get_json()
+        if not data or not data.get('username') or not data.get('password'):
+            return jsonify({'success': False, 'error': 'Username and password are required'}), 400
+        
+        user = authenticate(data['username'], data['password'])
+        if not user:
+            return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
+        
+        user.last_login = datetime.utcnow()
+        db.session.commit()
+        
+        return jsonify({'success': True, **issue_tokens(user)})
+        
+    except HashingBusy as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@auth_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    """Exchange a refresh token for a new token pair with current role and status"""
+    try:
+        data = request.get_json()
+        if not data or not data.get('refresh_token'):
+            return jsonify({'success': False, 'error': 'Refresh token is required'}), 400
+        
+        claims = verify_token(data['refresh_token'], REFRESH)
+        if not claims:
+            return jsonify({'success': False, 'error': 'Invalid or expired refresh token'}), 401
+        
+        # Refreshing is the one place token auth reads the user, so role and
+        # deactivation changes apply within one access token lifetime
+        user = User.query.get(claims['uid'])
+        if not user or not user.is_active or password_fingerprint(user) != claims.get('pwd'):
+            return jsonify({'success': False, 'error': 'Invalid or expired refresh token'}), 401
+        
+        return jsonify({'success': True, **issue_tokens(user)})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,13 +1,40 @@
-from flask import Blueprint, request, jsonify
-from models.user import Client, db
+from flask import Blueprint, current_app, request, jsonify
+from models.user import Client, ClientField, DeliveryOutbox, Submission, SubmissionField, Webhook, db
+from services.custom_fields import FIELD_KEY_PATTERN, FIELD_TYPES, backfill_field
+from services.delivery import delivery_summary, invalidate_webhooks, retry_failed
+from services.form_catalog import form_counts
+from services.http_pool import BlockedAddress, public_addresses
+from services.spam_filter import HONEYPOT_FIELD
+from services.sharding import fan_out
+from services.replicas import route_reads_to_replica
+from routes.users import require_permission
+from urllib.parse import urlsplit
 import secrets
+import json
 
 clients_bp = Blueprint('clients', __name__)
 
+# Dashboard reads are served from the read replica when one is configured
+clients_bp.before_request(route_reads_to_replica)
+
+def submission_counts(client_ids):
+    """Live submission count per client, summed across every shard"""
+    if not client_ids:
+        return {}
+    query = db.session.query(Submission.client_id, db.func.count(Submission.id)).filter(
+        Submission.client_id.in_(client_ids)
+    ).group_by(Submission.client_id)
+    counts = {}
+    for client_id, count in fan_out(query):
+        counts[client_id] = counts.get(client_id, 0) + count
+    return counts
+
 @clients_bp.route('', methods=['GET'])
 def get_clients():
     try:
         clients = Client.query.all()
+        counts = submission_counts([client.client_id for client in clients])
+        forms = form_counts([client.client_id for client in clients])
         clients_data = []
         
         for client in clients:
@@ -18,8 +45,8 @@ def get_clients():
                 'industry': client.industry,
                 'client_id': client.client_id,
                 'created_at': client.created_at.isoformat(),
-                'forms_count': 0,  # TODO: Count actual forms
-                'submissions_count': 0  # TODO: Count actual submissions
+                'forms_count': forms.get(client.client_id, 0),
+                'submissions_count': counts.get(client.client_id, 0)
             })
         
         return jsonify({'success': True, 'clients': clients_data})
@@ -60,7 +87,7 @@ def create_client():
                 'industry': client.industry,
                 'client_id': client.client_id,
                 'created_at': client.created_at.isoformat(),
-                'forms_count': 0,
+                'forms_count': 0,  # a new client has no catalog forms yet
                 'submissions_count': 0
             }
         })
@@ -74,13 +101,23 @@ def get_tracking_script(client_id):
         if not client:
             return jsonify({'success': False, 'error': 'Client not found'}), 404
         
+        api_base = (current_app.config.get('PUBLIC_API_URL') or request.host_url).rstrip('/')
+        max_batch = current_app.config['MAX_BATCH_EVENTS']
+        
         # Generate enhanced tracking script with automatic form detection
         script = f"""
 <!-- LeadLift.ai Tracking Script for {client.name} -->
 <script>
 (function() {{
     const CLIENT_ID = '{client.client_id}';
-    const API_ENDPOINT = 'http://localhost:5000/api/submit/' + CLIENT_ID;
+    const API_ENDPOINT = '{api_base}/api/submissions/' + CLIENT_ID;
+    const BATCH_ENDPOINT = API_ENDPOINT + '/batch';
+    const QUEUE_KEY = 'leadlift_queue_' + CLIENT_ID;
+    const MAX_QUEUE = 50;
+    const MAX_BATCH = {max_batch};
+    const HONEYPOT = '{HONEYPOT_FIELD}';
+    let flushing = false;
+    let retryDelay = 2000;
     
     // Function to get form identifier
     function getFormIdentifier(form) {{
@@ -134,6 +171,9 @@ def get_tracking_script(client_id):
             data[key] = value;
         }}
         
+        // Only a filled-in honeypot is sent; the API drops those submissions as bots
+        if (!data[HONEYPOT]) delete data[HONEYPOT];
+        
         // Add form metadata
         data._form_id = getFormIdentifier(form);
         data._form_url = window.location.href;
@@ -142,7 +182,7 @@ def get_tracking_script(client_id):
         data._timestamp = new Date().toISOString();
         
         // Count form fields for complexity scoring
-        const inputs = form.querySelectorAll('input:not([type="hidden"]), textarea, select');
+        const inputs = form.querySelectorAll('input:not([type="hidden"]):not([name="' + HONEYPOT + '"]), textarea, select');
         data._form_field_count = inputs.length;
         
         // Detect form type for better categorization
@@ -189,15 +229,139 @@ def get_tracking_script(client_id):
             form_complexity: formData._form_field_count || 1
         }};
         
-        fetch(API_ENDPOINT, {{
-            method: 'POST',
-            headers: {{
-                'Content-Type': 'application/json',
-            }},
-            body: JSON.stringify(formData)
-        }}).catch(err => console.log('LeadLift tracking error:', err));
+        enqueue(formData);
+    }}
+    
+    // Queued events live in localStorage until the API confirms them, so a
+    // navigation or network error never loses a lead. Each event carries an
+    // idempotency key, which makes re-sending after an unknown outcome safe.
+    function loadQueue() {{
+        try {{
+            return JSON.parse(localStorage.getItem(QUEUE_KEY)) || [];
+        }} catch (err) {{
+            return [];
+        }}
+    }}
+    
+    function saveQueue(queue) {{
+        try {{
+            localStorage.setItem(QUEUE_KEY, JSON.stringify(queue.slice(-MAX_QUEUE)));
+        }} catch (err) {{
+            console.log('LeadLift queue error:', err);
+        }}
+    }}
+    
+    function newEventKey() {{
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    }}
+    
+    function enqueue(event) {{
+        event._idempotency_key = newEventKey();
+        const queue = loadQueue();
+        queue.push(event);
+        saveQueue(queue);
+        // The page is probably about to unload, so send right away
+        flush(true);
+    }}
+    
+    function removeFromQueue(keys) {{
+        saveQueue(loadQueue().filter(event => keys.indexOf(event._idempotency_key) === -1));
+    }}
+    
+    // Compact wire format (v2): positional arrays instead of repeated keys; the
+    // API derives lead score factors from the session values itself
+    const META_KEYS = ['_form_id', '_form_type', '_form_url', '_form_path', '_form_title', '_timestamp', '_form_field_count'];
+    const UTM_KEYS = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+                      'utm_source_initial', 'utm_medium_initial', 'utm_campaign_initial'];
+    const SESSION_KEYS = ['session_count', 'engaged_duration', 'pages_visited', 'page_journey'];
+    const SKIP_KEYS = META_KEYS.concat(UTM_KEYS, SESSION_KEYS, ['_idempotency_key', '_lead_score_factors']);
+    
+    function toCompact(event) {{
+        const fields = {{}};
+        for (const key in event) {{
+            if (SKIP_KEYS.indexOf(key) === -1) fields[key] = event[key];
+        }}
+        const compact = META_KEYS.map(key => event[key] === undefined ? '' : event[key]);
+        compact.push(UTM_KEYS.map(key => event[key] || ''));
+        compact.push([
+            parseInt(event.session_count) || 1,
+            parseInt(event.engaged_duration) || 0,
+            parseInt(event.pages_visited) || 1,
+            event.page_journey || ''
+        ]);
+        compact.push(event._idempotency_key, fields);
+        return compact;
+    }}
+    
+    function gzip(body) {{
+        if (!window.CompressionStream || body.length < 1024) return Promise.resolve(null);
+        const stream = new Blob([body]).stream().pipeThrough(new CompressionStream('gzip'));
+        return new Response(stream).blob();
+    }}
+    
+    function flush(urgent) {{
+        const batch = loadQueue().slice(0, MAX_BATCH);
+        if (!batch.length || (flushing && !urgent)) return;
+        
+        const keys = batch.map(event => event._idempotency_key);
+        const body = JSON.stringify({{ v: 2, e: batch.map(toCompact) }});
+        
+        // text/plain keeps this a simple request: no CORS preflight, and usable by sendBeacon
+        if (urgent) {{
+            send(BATCH_ENDPOINT, new Blob([body], {{ type: 'text/plain' }}), keys);
+            return;
+        }}
+        
+        flushing = true;
+        gzip(body).then(compressed => {{
+            if (compressed) {{
+                send(BATCH_ENDPOINT + '?enc=gzip', compressed, keys);
+            }} else {{
+                send(BATCH_ENDPOINT, new Blob([body], {{ type: 'text/plain' }}), keys);
+            }}
+        }}).catch(() => {{
+            send(BATCH_ENDPOINT, new Blob([body], {{ type: 'text/plain' }}), keys);
+        }});
     }}
     
+    function send(url, blob, keys) {{
+        if (!window.fetch) {{
+            // Delivery can't be confirmed; the events stay queued and are deduplicated on re-send
+            if (navigator.sendBeacon) navigator.sendBeacon(url, blob);
+            flushing = false;
+            return;
+        }}
+        
+        fetch(url, {{ method: 'POST', body: blob, keepalive: true, credentials: 'omit' }})
+            .then(response => {{
+                flushing = false;
+                if (response.ok || response.status === 400 || response.status === 413) {{
+                    // Stored, duplicate or permanently rejected: stop retrying these events
+                    removeFromQueue(keys);
+                    retryDelay = 2000;
+                    if (loadQueue().length) flush(false);
+                }} else {{
+                    scheduleRetry();
+                }}
+            }})
+            .catch(err => {{
+                flushing = false;
+                if (navigator.sendBeacon) navigator.sendBeacon(url, blob);
+                scheduleRetry();
+                console.log('LeadLift tracking error:', err);
+            }});
+    }}
+    
+    function scheduleRetry() {{
+        setTimeout(() => flush(false), retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 60000);
+    }}
+    
+    // Send anything left over from earlier pages, and whatever is queued when the page is hidden
+    setTimeout(() => flush(false), 1000);
+    window.addEventListener('pagehide', () => flush(true));
+    
     // Auto-register all existing forms
     function registerForms() {{
         const forms = document.querySelectorAll('form');
@@ -205,6 +369,18 @@ def get_tracking_script(client_id):
             // Skip if already registered
             if (form.dataset.leadliftRegistered) return;
             
+            // Honeypot: off-screen and skipped by keyboard and autofill, so only bots fill it in
+            if (!form.querySelector('[name="' + HONEYPOT + '"]')) {{
+                const trap = document.createElement('input');
+                trap.type = 'text';
+                trap.name = HONEYPOT;
+                trap.tabIndex = -1;
+                trap.autocomplete = 'off';
+                trap.setAttribute('aria-hidden', 'true');
+                trap.style.cssText = 'position:absolute;left:-10000px;width:1px;height:1px;opacity:0;';
+                form.appendChild(trap);
+            }}
+            
             form.addEventListener('submit', function(e) {{
                 try {{
                     const formData = extractFormData(form);
@@ -268,6 +444,8 @@ def get_clients_by_industry(industry):
     """Get clients filtered by industry"""
     try:
         clients = Client.query.filter_by(industry=industry).all()
+        counts = submission_counts([client.client_id for client in clients])
+        forms = form_counts([client.client_id for client in clients])
         clients_data = []
         
         for client in clients:
@@ -278,11 +456,215 @@ def get_clients_by_industry(industry):
                 'industry': client.industry,
                 'client_id': client.client_id,
                 'created_at': client.created_at.isoformat(),
-                'forms_count': 0,  # TODO: Count actual forms
-                'submissions_count': 0  # TODO: Count actual submissions
+                'forms_count': forms.get(client.client_id, 0),
+                'submissions_count': counts.get(client.client_id, 0)
             })
         
         return jsonify({'success': True, 'clients': clients_data})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+
+@clients_bp.route('/<client_id>/fields', methods=['GET'])
+def get_client_fields(client_id):
+    """Get custom fields extracted for filtering"""
+    try:
+        client = Client.query.filter_by(client_id=client_id).first()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        fields = ClientField.query.filter_by(client_id=client_id).all()
+        return jsonify({'success': True, 'fields': [field.to_dict() for field in fields]})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@clients_bp.route('/<client_id>/fields', methods=['POST'])
+def create_client_field(client_id):
+    """Configure a custom form field to extract into the submission index"""
+    try:
+        client = Client.query.filter_by(client_id=client_id).first()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        data = request.get_json()
+        if not data or not data.get('field_key'):
+            return jsonify({'success': False, 'error': 'Field key is required'}), 400
+        if not isinstance(data['field_key'], str) or not FIELD_KEY_PATTERN.match(data['field_key']):
+            return jsonify({'success': False, 'error': 'Field key may only use letters, digits, _ and - (max 100)'}), 400
+        
+        field_type = data.get('field_type', 'text')
+        if field_type not in FIELD_TYPES:
+            return jsonify({'success': False, 'error': 'Invalid field type'}), 400
+        
+        source_keys = data.get('source_keys') or [data['field_key']]
+        if not isinstance(source_keys, list) or not all(isinstance(key, str) and key for key in source_keys):
+            return jsonify({'success': False, 'error': 'source_keys must be a list of non-empty strings'}), 400
+        
+        if ClientField.query.filter_by(client_id=client_id, field_key=data['field_key']).first():
+            return jsonify({'success': False, 'error': 'Field already exists'}), 400
+        
+        field = ClientField(
+            client_id=client_id,
+            field_key=data['field_key'],
+            field_type=field_type,
+            source_keys=json.dumps(source_keys)
+        )
+        db.session.add(field)
+        
+        # Index submissions captured before the field was configured, committed with the field
+        # so a failed backfill never leaves it partly indexed
+        backfilled = backfill_field(field) if data.get('backfill', True) else 0
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'field': field.to_dict(),
+            'backfilled': backfilled
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@clients_bp.route('/<client_id>/fields/<field_key>', methods=['DELETE'])
+def delete_client_field(client_id, field_key):
+    """Stop extracting a custom field and drop its indexed values"""
+    try:
+        field = ClientField.query.filter_by(client_id=client_id, field_key=field_key).first()
+        if not field:
+            return jsonify({'success': False, 'error': 'Field not found'}), 404
+        
+        SubmissionField.query.filter_by(client_id=client_id, field_key=field_key).delete()
+        db.session.delete(field)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Field deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def is_webhook_url(url):
+    """http(s) URL whose host resolves to public addresses only (the worker checks again when it connects)"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return False
+    if current_app.config['WEBHOOK_ALLOW_PRIVATE_TARGETS']:
+        return True
+    try:
+        public_addresses(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+    except (BlockedAddress, OSError, UnicodeError):
+        return False
+    return True
+
+@clients_bp.route('/<client_id>/webhooks', methods=['GET'])
+@require_permission('manage_clients')
+def get_client_webhooks(client_id):
+    """List the URLs new submissions are pushed to"""
+    try:
+        client = Client.query.filter_by(client_id=client_id).first()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        webhooks = Webhook.query.filter_by(client_id=client_id).all()
+        return jsonify({'success': True, 'webhooks': [webhook.to_dict() for webhook in webhooks]})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@clients_bp.route('/<client_id>/webhooks', methods=['POST'])
+@require_permission('manage_clients')
+def create_client_webhook(client_id):
+    """Push the client's new submissions to a URL; the signing secret is only returned here"""
+    try:
+        client = Client.query.filter_by(client_id=client_id).first()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        data = request.get_json() or {}
+        url = str(data.get('url', '')).strip()
+        if not is_webhook_url(url):
+            return jsonify({'success': False, 'error': 'A public http(s) URL is required'}), 400
+        
+        webhook = Webhook(
+            client_id=client_id,
+            url=url,
+            secret=data.get('secret') or secrets.token_hex(32),
+            is_active=bool(data.get('is_active', True))
+        )
+        db.session.add(webhook)
+        db.session.commit()
+        invalidate_webhooks(client_id)
+        
+        return jsonify({'success': True, 'webhook': webhook.to_dict(include_secret=True)}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@clients_bp.route('/<client_id>/webhooks/<int:webhook_id>', methods=['PUT'])
+@require_permission('manage_clients')
+def update_client_webhook(client_id, webhook_id):
+    """Pause or resume a webhook, or point it at a new URL"""
+    try:
+        webhook = Webhook.query.filter_by(client_id=client_id, id=webhook_id).first()
+        if not webhook:
+            return jsonify({'success': False, 'error': 'Webhook not found'}), 404
+        
+        data = request.get_json() or {}
+        if 'url' in data:
+            url = str(data['url']).strip()
+            if not is_webhook_url(url):
+                return jsonify({'success': False, 'error': 'A public http(s) URL is required'}), 400
+            webhook.url = url
+        if 'is_active' in data:
+            webhook.is_active = bool(data['is_active'])
+        db.session.commit()
+        invalidate_webhooks(client_id)
+        
+        return jsonify({'success': True, 'webhook': webhook.to_dict()})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@clients_bp.route('/<client_id>/webhooks/<int:webhook_id>', methods=['DELETE'])
+@require_permission('manage_clients')
+def delete_client_webhook(client_id, webhook_id):
+    """Remove a webhook and drop its undelivered submissions"""
+    try:
+        webhook = Webhook.query.filter_by(client_id=client_id, id=webhook_id).first()
+        if not webhook:
+            return jsonify({'success': False, 'error': 'Webhook not found'}), 404
+        
+        DeliveryOutbox.query.filter_by(client_id=client_id, webhook_id=webhook_id).delete()
+        db.session.delete(webhook)
+        db.session.commit()
+        invalidate_webhooks(client_id)
+        
+        return jsonify({'success': True, 'message': 'Webhook deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@clients_bp.route('/<client_id>/webhooks/deliveries', methods=['GET'])
+@require_permission('manage_clients')
+def get_webhook_deliveries(client_id):
+    """Delivery counts per webhook and the latest failures"""
+    try:
+        client = Client.query.filter_by(client_id=client_id).first()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        return jsonify({'success': True, **delivery_summary(client_id)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@clients_bp.route('/<client_id>/webhooks/deliveries/retry', methods=['POST'])
+@require_permission('manage_clients')
+def retry_webhook_deliveries(client_id):
+    """Requeue failed deliveries, optionally only those of one webhook"""
+    try:
+        webhook_id = (request.get_json(silent=True) or {}).get('webhook_id')
+        requeued = retry_failed(client_id, webhook_id)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'requeued': requeued})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
-from models.user import db, Client, Form, Submission
+from models.user import db, Client, Form
+from services.form_catalog import form_stats, invalidate_catalog, unlink_form
+from services.sharding import pin_shard
 import json
 from datetime import datetime
 
@@ -14,9 +16,10 @@ def get_client_forms(client_id):
             return jsonify({'success': False, 'error': 'Client not found'}), 404
         
         forms = Form.query.filter_by(client_id=client_id).all()
+        stats = form_stats(client_id)
         return jsonify({
             'success': True,
-            'forms': [form.to_dict() for form in forms]
+            'forms': [form.to_dict(stats.get(form.id, {}).get('submission_count', 0)) for form in forms]
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -33,6 +36,9 @@ def create_form(client_id):
         if not data or not data.get('form_name'):
             return jsonify({'success': False, 'error': 'Form name is required'}), 400
         
+        if Form.query.filter_by(client_id=client_id, form_name=data['form_name']).first():
+            return jsonify({'success': False, 'error': 'Form already exists'}), 400
+        
         form = Form(
             client_id=client_id,
             form_name=data['form_name'],
@@ -41,6 +47,7 @@ def create_form(client_id):
         
         db.session.add(form)
         db.session.commit()
+        invalidate_catalog(client_id)
         
         return jsonify({
             'success': True,
@@ -63,16 +70,22 @@ def update_form(form_id):
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
-        if 'form_name' in data:
+        if 'form_name' in data and data['form_name'] != form.form_name:
+            # Captures are matched to catalog forms by this name
+            if Form.query.filter_by(client_id=form.client_id, form_name=data['form_name']).first():
+                return jsonify({'success': False, 'error': 'Form already exists'}), 400
             form.form_name = data['form_name']
         if 'form_identifier' in data:
             form.form_identifier = data['form_identifier']
         
         db.session.commit()
+        invalidate_catalog(form.client_id)
         
+        pin_shard(form.client_id)
+        stats = form_stats(form.client_id, [form.id])
         return jsonify({
             'success': True,
-            'form': form.to_dict()
+            'form': form.to_dict(stats.get(form.id, {}).get('submission_count', 0))
         })
         
     except Exception as e:
@@ -87,8 +100,13 @@ def delete_form(form_id):
         if not form:
             return jsonify({'success': False, 'error': 'Form not found'}), 404
         
+        # Its submissions stay, unlinked; a later capture of the same form adds it back to the catalog
+        client_id = form.client_id
+        pin_shard(client_id)
+        unlink_form(form)
         db.session.delete(form)
         db.session.commit()
+        invalidate_catalog(client_id)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,53 @@
+from flask import Blueprint, current_app, request, jsonify, send_from_directory
+from routes.users import require_permission
+from services.profiling import PROFILE_KINDS, PROFILE_NAME, get_profile_dir, get_settings, list_profiles
+
+profiles_bp = Blueprint('profiles', __name__)
+
+@profiles_bp.route('', methods=['GET'])
+@require_permission('manage_settings')
+def get_profiles():
+    """List stored request profiles, newest first"""
+    try:
+        return jsonify({
+            'success': True,
+            'kinds': PROFILE_KINDS,
+            'profiles': list_profiles(get_profile_dir(current_app))
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@profiles_bp.route('/<profile_id>/<kind>', methods=['GET'])
+@require_permission('manage_settings')
+def download_profile(profile_id, kind):
+    """Download one file of a stored profile"""
+    if kind not in PROFILE_KINDS or not PROFILE_NAME.match(profile_id):
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return send_from_directory(get_profile_dir(current_app), f'{profile_id}.{kind}', as_attachment=True)
+
+@profiles_bp.route('/settings', methods=['GET', 'PUT'])
+@require_permission('manage_settings')
+def profile_settings():
+    """Read or change request sampling for this worker process"""
+    try:
+        settings = get_settings(current_app)
+        
+        if request.method == 'PUT':
+            data = request.get_json() or {}
+            if 'sample_rate' in data:
+                sample_rate = float(data['sample_rate'])
+                if not 0 <= sample_rate <= 1:
+                    return jsonify({'success': False, 'error': 'sample_rate must be between 0 and 1'}), 400
+                settings['sample_rate'] = sample_rate
+            if 'endpoints' in data:
+                settings['endpoints'] = set(data['endpoints'] or [])
+        
+        return jsonify({
+            'success': True,
+            'sample_rate': settings['sample_rate'],
+            'endpoints': sorted(settings['endpoints'])
+        })
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,55 @@
+from flask import Blueprint, request, jsonify, current_app
+from services.columnar import source_report, industry_report, snapshot_generated_at
+from datetime import datetime
+
+reports_bp = Blueprint('reports', __name__)
+
+SOURCE_DIMENSIONS = ['source', 'initial_utm_source', 'recent_utm_source',
+                     'initial_utm_medium', 'initial_utm_campaign', 'form_type']
+
+def get_date_range():
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    return (
+        datetime.fromisoformat(date_from) if date_from else None,
+        datetime.fromisoformat(date_to) if date_to else None
+    )
+
+@reports_bp.route('/sources', methods=['GET'])
+def get_source_report():
+    """Agency-wide source attribution from the columnar snapshot"""
+    try:
+        dimension = request.args.get('dimension', 'source')
+        if dimension not in SOURCE_DIMENSIONS:
+            return jsonify({'success': False, 'error': 'Invalid dimension'}), 400
+        
+        date_from, date_to = get_date_range()
+        rows = source_report(current_app, date_from, date_to,
+                             industry=request.args.get('industry'), dimension=dimension)
+        
+        return jsonify({
+            'success': True,
+            'snapshot_at': snapshot_generated_at(current_app),
+            'sources': rows
+        })
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@reports_bp.route('/industries', methods=['GET'])
+def get_industry_report():
+    """Compare lead volume and quality across industries"""
+    try:
+        date_from, date_to = get_date_range()
+        rows = industry_report(current_app, date_from, date_to)
+        
+        return jsonify({
+            'success': True,
+            'snapshot_at': snapshot_generated_at(current_app),
+            'industries': rows
+        })
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
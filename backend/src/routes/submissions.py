@@ -1,89 +1,241 @@
-from flask import Blueprint, request, jsonify
-from models.user import Submission, Client, db
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from flask_cors import cross_origin
+from models.user import Submission, Client, Form, db, utm_value
+from services.custom_fields import get_client_fields, extract_fields, apply_field_filters
+from services.search import search_submission_ids
+from services.attribution import DIMENSIONS, archived_coverage, get_attribution, invalidate_client
+from services.idempotency import candidate_keys, find_duplicate, record_key, remember_key
+from services.delivery import enqueue
+from services.form_catalog import client_catalog, form_ref, form_stats, forms_by_id
+from services.spam_filter import get_spam_filter, count_rejection, rejections
+from services.beacon import BatchError, read_body, parse_batch
+from services.archive import export_dict, get_archive_dir, get_rollups, iter_archived_submissions
+from services.replicas import route_reads_to_replica
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 import json
 
 submissions_bp = Blueprint('submissions', __name__)
 
+# Dashboard reads are served from the read replica when one is configured
+submissions_bp.before_request(route_reads_to_replica)
+
 @submissions_bp.route('/<client_id>', methods=['POST'])
+@cross_origin(origins='*', supports_credentials=False)
 def capture_submission(client_id):
     """Capture form submission from tracking script"""
     try:
-        # Verify client exists
-        client = Client.query.filter_by(client_id=client_id).first()
-        if not client:
-            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        # Reject floods and oversized bodies before parsing or touching the database
+        spam_filter = get_spam_filter()
+        rejection = spam_filter.check_request(client_id)
+        if rejection:
+            return reject_submission(*rejection)
         
-        data = request.get_json()
-        if not data:
-            return jsonify({'success': False, 'error': 'No data provided'}), 400
-        
-        # Extract form metadata
-        form_id = data.get('_form_id', 'unknown-form')
-        form_type = data.get('_form_type', 'other')
-        form_url = data.get('_form_url', '')
-        form_path = data.get('_form_path', '')
-        page_title = data.get('_form_title', '')
-        
-        # Extract contact information
-        email = data.get('email') or data.get('Email') or data.get('EMAIL')
-        name = (data.get('name') or data.get('Name') or data.get('first_name') or 
-                data.get('firstName') or data.get('full_name') or data.get('fullName'))
-        phone = (data.get('phone') or data.get('Phone') or data.get('telephone') or 
-                 data.get('mobile') or data.get('cell'))
-        
-        # Calculate lead score
-        lead_score_factors = data.get('_lead_score_factors', {})
-        lead_score = calculate_lead_score(lead_score_factors, data)
-        
-        # Create submission record
-        submission = Submission(
-            client_id=client_id,
-            form_name=form_id,  # Legacy compatibility
-            form_id=form_id,
-            form_type=form_type,
-            form_url=form_url,
-            form_path=form_path,
-            page_title=page_title,
-            email=email,
-            name=name,
-            phone=phone,
-            
-            # UTM Parameters
-            initial_utm_source=data.get('utm_source_initial') or data.get('utm_source'),
-            initial_utm_medium=data.get('utm_medium_initial') or data.get('utm_medium'),
-            initial_utm_campaign=data.get('utm_campaign_initial') or data.get('utm_campaign'),
-            initial_utm_term=data.get('utm_term_initial') or data.get('utm_term'),
-            initial_utm_content=data.get('utm_content_initial') or data.get('utm_content'),
-            
-            recent_utm_source=data.get('utm_source'),
-            recent_utm_medium=data.get('utm_medium'),
-            recent_utm_campaign=data.get('utm_campaign'),
-            recent_utm_term=data.get('utm_term'),
-            recent_utm_content=data.get('utm_content'),
-            
-            # Engagement metrics
-            session_count=int(data.get('session_count', 1)),
-            engaged_session_duration=int(data.get('engaged_duration', 0)),
-            pages_visited=int(data.get('pages_visited', 1)),
-            page_journey=data.get('page_journey', ''),
-            
-            # Lead scoring
-            lead_quality_score=lead_score,
-            
-            # Store all form data as JSON
-            form_data=json.dumps({k: v for k, v in data.items() if not k.startswith('_')})
-        )
+        body, status = store_submission(client_id, request.get_json(silent=True),
+                                        request.headers.get('Idempotency-Key'), spam_filter)
+        return jsonify(body), status
         
-        db.session.add(submission)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def store_submission(client_id, data, header_key, spam_filter):
+    """Validate and store one tracking payload; returns (response body, status)
+
+    Shared by the Flask route and the async ingestion app.
+    """
+    if not data:
+        return {'success': False, 'error': 'No data provided'}, 400
+    
+    rejection = spam_filter.check_payload(data)
+    if rejection:
+        return rejection_body(*rejection)
+    
+    # Verify client exists
+    client = Client.query.filter_by(client_id=client_id).first()
+    if not client:
+        return {'success': False, 'error': 'Client not found'}, 404
+    
+    # Retries and double submits are answered from the recent-keys store without a second write
+    idempotency_keys = candidate_keys(client_id, data, header_key)
+    duplicate_id = find_duplicate(client_id, idempotency_keys)
+    if duplicate_id is not None:
+        return {'success': True, 'submission_id': duplicate_id, 'duplicate': True}, 200
+    
+    submission = build_submission(client_id, data)
+    
+    db.session.add(submission)
+    record_key(client_id, idempotency_keys[0], submission)
+    enqueue(client_id, submission)
+    try:
         db.session.commit()
+    except IntegrityError:
+        # A concurrent retry stored the same key first
+        db.session.rollback()
+        duplicate_id = find_duplicate(client_id, idempotency_keys[:1])
+        if duplicate_id is None:
+            raise
+        return {'success': True, 'submission_id': duplicate_id, 'duplicate': True}, 200
+    remember_key(client_id, idempotency_keys[0], submission.id)
+    invalidate_client(client_id)
+    
+    return {'success': True, 'submission_id': submission.id}, 200
+
+@submissions_bp.route('/<client_id>/batch', methods=['POST'])
+@cross_origin(origins='*', supports_credentials=False)
+def capture_batch(client_id):
+    """Capture queued submissions sent together by the tracking script (fetch keepalive or sendBeacon)"""
+    try:
+        spam_filter = get_spam_filter()
+        rejection = spam_filter.check_request(client_id, max_bytes=spam_filter.max_batch_bytes)
+        if rejection:
+            return reject_submission(*rejection)
         
-        return jsonify({'success': True, 'submission_id': submission.id})
+        # Beacons arrive as text/plain (no CORS preflight), optionally gzipped
+        try:
+            body = read_body(request, spam_filter.max_batch_bytes)
+            events = parse_batch(body, current_app.config['MAX_BATCH_EVENTS'])
+        except BatchError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        body, status = store_batch(client_id, events, spam_filter)
+        return jsonify(body), status
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def store_batch(client_id, events, spam_filter):
+    """Store parsed batch events for a client; returns (response body, status)"""
+    client = Client.query.filter_by(client_id=client_id).first()
+    if not client:
+        return {'success': False, 'error': 'Client not found'}, 404
+    
+    try:
+        results, stored = ingest_batch(client_id, events, spam_filter)
+    except IntegrityError:
+        # A concurrent retry stored one of the keys first; the second pass sees it as a duplicate
+        db.session.rollback()
+        results, stored = ingest_batch(client_id, events, spam_filter)
+    
+    if stored:
+        invalidate_client(client_id)
+    
+    return {'success': True, 'accepted': stored, 'results': results}, 200
+
+def ingest_batch(client_id, events, spam_filter):
+    """Store a batch of events in one transaction; returns per-event results and the stored count"""
+    results = []
+    pending = []
+    batch_keys = {}
+    
+    for data in events:
+        rejection = spam_filter.check_payload(data)
+        if rejection:
+            count_rejection(rejection[0])
+            results.append({'status': 'rejected'})
+            continue
+        
+        idempotency_keys = candidate_keys(client_id, data)
+        if idempotency_keys[0] in batch_keys:
+            results.append({'status': 'duplicate', 'index': batch_keys[idempotency_keys[0]]})
+            continue
+        
+        duplicate_id = find_duplicate(client_id, idempotency_keys)
+        if duplicate_id is not None:
+            results.append({'status': 'duplicate', 'submission_id': duplicate_id})
+            continue
+        
+        submission = build_submission(client_id, data)
+        db.session.add(submission)
+        record_key(client_id, idempotency_keys[0], submission)
+        enqueue(client_id, submission)
+        batch_keys[idempotency_keys[0]] = len(results)
+        pending.append((idempotency_keys[0], submission))
+        results.append({'status': 'stored', 'submission_id': submission.id})
+    
+    db.session.commit()
+    for key, submission in pending:
+        remember_key(client_id, key, submission.id)
+    
+    return results, len(pending)
+
+def build_submission(client_id, data):
+    """Create (but don't add) a Submission from a tracking script payload"""
+    # Extract form metadata
+    form_id = data.get('_form_id', 'unknown-form')
+    form_type = data.get('_form_type', 'other')
+    form_url = data.get('_form_url', '')
+    form_path = data.get('_form_path', '')
+    page_title = data.get('_form_title', '')
+    
+    # Extract contact information
+    email = data.get('email') or data.get('Email') or data.get('EMAIL')
+    name = (data.get('name') or data.get('Name') or data.get('first_name') or 
+            data.get('firstName') or data.get('full_name') or data.get('fullName'))
+    phone = (data.get('phone') or data.get('Phone') or data.get('telephone') or 
+             data.get('mobile') or data.get('cell'))
+    
+    # Calculate lead score
+    lead_score_factors = data.get('_lead_score_factors', {})
+    lead_score = calculate_lead_score(lead_score_factors, data)
+    
+    # Create submission record
+    submission = Submission(
+        client_id=client_id,
+        form_name=form_id,  # Legacy compatibility
+        form_id=form_id,
+        form_ref_id=form_ref(client_id, form_id, form_type),
+        form_type=form_type,
+        form_url=form_url,
+        form_path=form_path,
+        page_title=page_title,
+        email=email,
+        name=name,
+        phone=phone,
+        
+        # UTM Parameters
+        initial_utm_source=data.get('utm_source_initial') or data.get('utm_source'),
+        initial_utm_medium=data.get('utm_medium_initial') or data.get('utm_medium'),
+        initial_utm_campaign=data.get('utm_campaign_initial') or data.get('utm_campaign'),
+        initial_utm_term=data.get('utm_term_initial') or data.get('utm_term'),
+        initial_utm_content=data.get('utm_content_initial') or data.get('utm_content'),
+        
+        recent_utm_source=data.get('utm_source'),
+        recent_utm_medium=data.get('utm_medium'),
+        recent_utm_campaign=data.get('utm_campaign'),
+        recent_utm_term=data.get('utm_term'),
+        recent_utm_content=data.get('utm_content'),
+        
+        # Engagement metrics
+        session_count=int(data.get('session_count', 1)),
+        engaged_session_duration_seconds=int(data.get('engaged_duration', 0)),
+        pages_visited=int(data.get('pages_visited', 1)),
+        page_journey=data.get('page_journey', ''),
+        
+        # Lead scoring
+        lead_quality_score=lead_score,
+        
+        # Store all form data as JSON
+        additional_data=json.dumps({k: v for k, v in data.items() if not k.startswith('_')})
+    )
+    
+    # Copy configured custom fields into the indexed side table
+    submission.extracted_fields = extract_fields(get_client_fields(client_id), data)
+    
+    return submission
+
+def rejection_body(reason, status):
+    """Count a filtered submission and build its answer; bot-only signals get a normal-looking success"""
+    count_rejection(reason)
+    if status == 200:
+        return {'success': True}, 200
+    return {'success': False, 'error': 'Submission rejected'}, status
+
+def reject_submission(reason, status):
+    body, status = rejection_body(reason, status)
+    return jsonify(body), status
+
 def calculate_lead_score(factors, data):
     """Calculate lead quality score based on engagement and form data"""
     score = 0
@@ -147,6 +299,36 @@ def calculate_lead_score(factors, data):
     # Cap at 100
     return min(score, 100)
 
+def submission_to_row(submission):
+    """Serialize a submission for the dashboard submissions table"""
+    return {
+        'id': submission.id,
+        'form_id': submission.form_id,
+        'form_ref_id': submission.form_ref_id,
+        'form_type': submission.form_type,
+        'form_url': submission.form_url,
+        'form_path': submission.form_path,
+        'page_title': submission.page_title,
+        'submission_date': submission.submission_date.isoformat(),
+        'email': submission.email,
+        'name': submission.name,
+        'phone': submission.phone,
+        'initial_utm_source': submission.initial_utm_source,
+        'initial_utm_medium': submission.initial_utm_medium,
+        'recent_utm_source': submission.recent_utm_source,
+        'recent_utm_medium': submission.recent_utm_medium,
+        'lead_quality_score': submission.lead_quality_score,
+        'session_count': submission.session_count,
+        'engaged_session_duration': submission.engaged_session_duration_seconds,
+        'pages_visited': submission.pages_visited,
+        'form_data': json.loads(submission.additional_data) if submission.additional_data else {}
+    }
+
+@submissions_bp.route('/spam-stats', methods=['GET'])
+def get_spam_stats():
+    """Submissions rejected by the pre-persistence filter, by reason"""
+    return jsonify({'success': True, 'rejected': dict(rejections), 'total_rejected': sum(rejections.values())})
+
 @submissions_bp.route('/client/<client_id>', methods=['GET'])
 def get_client_submissions(client_id):
     """Get all submissions for a specific client"""
@@ -167,7 +349,11 @@ def get_client_submissions(client_id):
         query = Submission.query.filter_by(client_id=client_id)
         
         if form_id:
-            query = query.filter_by(form_id=form_id)
+            # Filtered on the catalog id, which is indexed together with client_id
+            entry = client_catalog(client_id).get(form_id)
+            if entry is None:
+                return jsonify({'success': True, 'submissions': []})
+            query = query.filter_by(form_ref_id=entry[0])
         if form_type:
             query = query.filter_by(form_type=form_type)
         if date_from:
@@ -175,37 +361,94 @@ def get_client_submissions(client_id):
         if date_to:
             query = query.filter(Submission.submission_date <= datetime.fromisoformat(date_to))
         
+        # Custom field filters (field.<key>, field.<key>.min, field.<key>.max)
+        try:
+            query = apply_field_filters(query, client_id, request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
         submissions = query.order_by(Submission.submission_date.desc()).limit(limit).all()
         
-        submissions_data = []
-        for submission in submissions:
-            submissions_data.append({
-                'id': submission.id,
-                'form_id': submission.form_id,
-                'form_type': submission.form_type,
-                'form_url': submission.form_url,
-                'form_path': submission.form_path,
-                'page_title': submission.page_title,
-                'submission_date': submission.submission_date.isoformat(),
-                'email': submission.email,
-                'name': submission.name,
-                'phone': submission.phone,
-                'initial_utm_source': submission.initial_utm_source,
-                'initial_utm_medium': submission.initial_utm_medium,
-                'recent_utm_source': submission.recent_utm_source,
-                'recent_utm_medium': submission.recent_utm_medium,
-                'lead_quality_score': submission.lead_quality_score,
-                'session_count': submission.session_count,
-                'engaged_session_duration': submission.engaged_session_duration,
-                'pages_visited': submission.pages_visited,
-                'form_data': json.loads(submission.form_data) if submission.form_data else {}
-            })
+        submissions_data = [submission_to_row(submission) for submission in submissions]
         
         return jsonify({'success': True, 'submissions': submissions_data})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@submissions_bp.route('/client/<client_id>/search', methods=['GET'])
+def search_client_submissions(client_id):
+    """Full-text search over a client's submissions with prefix matching"""
+    try:
+        client = Client.query.filter_by(client_id=client_id).first()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': 'Search query is required'}), 400
+        
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 25)), 1), 100)
+        sort = request.args.get('sort', 'recent')
+        if sort not in ['recent', 'relevance']:
+            return jsonify({'success': False, 'error': 'Invalid sort'}), 400
+        
+        # Fetch one extra id to know whether another page exists without counting
+        ids = search_submission_ids(client_id, query, limit=per_page + 1,
+                                    offset=(page - 1) * per_page, sort=sort)
+        has_more = len(ids) > per_page
+        ids = ids[:per_page]
+        
+        submissions_by_id = {s.id: s for s in Submission.query.filter(Submission.id.in_(ids)).all()} if ids else {}
+        submissions_data = [submission_to_row(submissions_by_id[i]) for i in ids if i in submissions_by_id]
+        
+        return jsonify({
+            'success': True,
+            'submissions': submissions_data,
+            'page': page,
+            'per_page': per_page,
+            'has_more': has_more
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@submissions_bp.route('/client/<client_id>/export', methods=['GET'])
+def export_client_submissions(client_id):
+    """Export submissions as JSON lines, rehydrating archived months on demand"""
+    try:
+        client = Client.query.filter_by(client_id=client_id).first()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        date_from = datetime.fromisoformat(date_from) if date_from else None
+        date_to = datetime.fromisoformat(date_to) if date_to else None
+        include_archived = request.args.get('include_archived', 'true').lower() == 'true'
+        archive_dir = get_archive_dir(current_app)
+        
+        query = Submission.query.filter_by(client_id=client_id)
+        if date_from:
+            query = query.filter(Submission.submission_date >= date_from)
+        if date_to:
+            query = query.filter(Submission.submission_date <= date_to)
+        
+        def generate():
+            if include_archived:
+                for data in iter_archived_submissions(archive_dir, client_id, date_from, date_to):
+                    yield json.dumps(data) + '\n'
+            for submission in query.order_by(Submission.id).yield_per(500):
+                yield json.dumps(export_dict(submission)) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+            'Content-Disposition': f'attachment; filename=submissions-{client_id}.jsonl'
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @submissions_bp.route('/client/<client_id>/forms', methods=['GET'])
 def get_client_forms(client_id):
     """Get list of all forms detected for a client"""
@@ -215,26 +458,17 @@ def get_client_forms(client_id):
         if not client:
             return jsonify({'success': False, 'error': 'Client not found'}), 404
         
-        # Get unique forms with submission counts
-        forms_query = db.session.query(
-            Submission.form_id,
-            Submission.form_type,
-            db.func.count(Submission.id).label('submission_count'),
-            db.func.max(Submission.submission_date).label('last_submission'),
-            db.func.avg(Submission.lead_quality_score).label('avg_lead_score')
-        ).filter_by(client_id=client_id).group_by(
-            Submission.form_id, Submission.form_type
-        ).all()
-        
+        # Catalog forms with submission stats grouped on the integer form id, archived rollups included
+        stats = form_stats(client_id)
+        no_submissions = {'submission_count': 0, 'last_submission': None, 'avg_lead_score': 0}
         forms_data = []
-        for form in forms_query:
-            forms_data.append({
-                'form_id': form.form_id,
-                'form_type': form.form_type,
-                'submission_count': form.submission_count,
-                'last_submission': form.last_submission.isoformat() if form.last_submission else None,
-                'avg_lead_score': round(form.avg_lead_score, 1) if form.avg_lead_score else 0
-            })
+        for form in Form.query.filter_by(client_id=client_id).order_by(Form.id):
+            forms_data.append(dict(
+                stats.get(form.id, no_submissions),
+                id=form.id,
+                form_id=form.form_name,
+                form_type=form.form_type
+            ))
         
         return jsonify({'success': True, 'forms': forms_data})
         
@@ -262,43 +496,72 @@ def get_client_analytics(client_id):
         
         submissions = query.all()
         
+        # Archived submissions only survive as daily rollups (see services/archive.py)
+        rollups = get_rollups(
+            client_id,
+            datetime.fromisoformat(date_from) if date_from else None,
+            datetime.fromisoformat(date_to) if date_to else None
+        )
+        
         # Calculate analytics
-        total_submissions = len(submissions)
-        avg_lead_score = sum(s.lead_quality_score or 0 for s in submissions) / total_submissions if total_submissions > 0 else 0
+        total_submissions = len(submissions) + sum(r.submissions for r in rollups)
+        score_total = sum(float(s.lead_quality_score or 0) for s in submissions) + sum(r.score_total for r in rollups)
+        avg_lead_score = score_total / total_submissions if total_submissions > 0 else 0
         
         # Group by form
         form_analytics = {}
-        for submission in submissions:
-            form_id = submission.form_id or 'unknown'
+        def add_form(form_id, form_type, count, score):
             if form_id not in form_analytics:
                 form_analytics[form_id] = {
                     'form_id': form_id,
-                    'form_type': submission.form_type,
+                    'form_type': form_type,
                     'submissions': 0,
                     'avg_score': 0,
-                    'scores': []
+                    'score_total': 0
                 }
-            form_analytics[form_id]['submissions'] += 1
-            form_analytics[form_id]['scores'].append(submission.lead_quality_score or 0)
+            form_analytics[form_id]['submissions'] += count
+            form_analytics[form_id]['score_total'] += score
+        
+        # Bucket live rows on the catalog id; names are resolved once per bucket
+        form_buckets = {}
+        for submission in submissions:
+            count, score = form_buckets.get(submission.form_ref_id, (0, 0.0))
+            form_buckets[submission.form_ref_id] = (count + 1, score + float(submission.lead_quality_score or 0))
+        catalog = forms_by_id(client_id, form_buckets)
+        for form_ref_id, (count, score) in form_buckets.items():
+            form_name, form_type = catalog.get(form_ref_id, ('unknown', None))
+            add_form(form_name, form_type, count, score)
+        for rollup in rollups:
+            add_form(rollup.form_id or 'unknown', rollup.form_type, rollup.submissions, rollup.score_total)
         
         # Calculate averages
         for form_data in form_analytics.values():
-            form_data['avg_score'] = sum(form_data['scores']) / len(form_data['scores']) if form_data['scores'] else 0
-            del form_data['scores']  # Remove raw scores from response
+            form_data['avg_score'] = form_data['score_total'] / form_data['submissions'] if form_data['submissions'] else 0
+            del form_data['score_total']  # Remove running totals from response
         
         # Group by UTM source
         source_analytics = {}
-        for submission in submissions:
-            source = submission.initial_utm_source or submission.recent_utm_source or 'Direct'
+        def add_source(source, count, score):
             if source not in source_analytics:
-                source_analytics[source] = {'source': source, 'submissions': 0, 'avg_score': 0, 'scores': []}
-            source_analytics[source]['submissions'] += 1
-            source_analytics[source]['scores'].append(submission.lead_quality_score or 0)
+                source_analytics[source] = {'source': source, 'submissions': 0, 'avg_score': 0, 'score_total': 0}
+            source_analytics[source]['submissions'] += count
+            source_analytics[source]['score_total'] += score
+        
+        # Bucket live rows on the integer UTM ids; names are resolved once per bucket
+        source_ids = {}
+        for submission in submissions:
+            source_id = submission.initial_utm_source_id or submission.recent_utm_source_id
+            count, score = source_ids.get(source_id, (0, 0.0))
+            source_ids[source_id] = (count + 1, score + float(submission.lead_quality_score or 0))
+        for source_id, (count, score) in source_ids.items():
+            add_source(utm_value(source_id) or 'Direct', count, score)
+        for rollup in rollups:
+            add_source(rollup.source, rollup.submissions, rollup.score_total)
         
         # Calculate source averages
         for source_data in source_analytics.values():
-            source_data['avg_score'] = sum(source_data['scores']) / len(source_data['scores']) if source_data['scores'] else 0
-            del source_data['scores']
+            source_data['avg_score'] = source_data['score_total'] / source_data['submissions'] if source_data['submissions'] else 0
+            del source_data['score_total']
         
         return jsonify({
             'success': True,
@@ -313,3 +576,33 @@ def get_client_analytics(client_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+
+@submissions_bp.route('/analytics/<client_id>/attribution', methods=['GET'])
+def get_client_attribution(client_id):
+    """First-touch, last-touch, linear and position-based credit per UTM value for live submissions,
+    with the number of archived leads in the range that are not credited"""
+    try:
+        client = Client.query.filter_by(client_id=client_id).first()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        dimension = request.args.get('dimension', 'source')
+        if dimension not in DIMENSIONS:
+            return jsonify({'success': False, 'error': 'Invalid dimension'}), 400
+        
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        date_from = datetime.fromisoformat(date_from) if date_from else None
+        date_to = datetime.fromisoformat(date_to) if date_to else None
+        attribution = get_attribution(client_id, dimension, date_from, date_to)
+        
+        # Credit covers live submissions only; archived leads before archived_before are counted, not credited
+        return jsonify({
+            'success': True,
+            'dimension': dimension,
+            'attribution': attribution,
+            'archived': archived_coverage(client_id, date_from, date_to)
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify
 from models.user import db, User, Client
-from werkzeug.security import generate_password_hash
+from services.principal import get_current_principal, load_principal
+from services.passwords import HashingBusy, hash_password
 from datetime import datetime
 import re
 
@@ -9,7 +10,8 @@ users_bp = Blueprint('users', __name__)
 def require_auth(f):
     """Decorator to require authentication"""
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        principal = get_current_principal()
+        if not principal or not principal.is_active:
             return jsonify({'success': False, 'error': 'Authentication required'}), 401
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
@@ -19,11 +21,12 @@ def require_permission(permission):
     """Decorator to require specific permission"""
     def decorator(f):
         def decorated_function(*args, **kwargs):
-            if 'user_id' not in session:
+            # Served from the request/process principal cache or a signed token, no query on the hot path
+            principal = get_current_principal()
+            if not principal:
                 return jsonify({'success': False, 'error': 'Authentication required'}), 401
             
-            user = User.query.get(session['user_id'])
-            if not user or not user.has_permission(permission):
+            if not principal.is_active or not principal.has_permission(permission):
                 return jsonify({'success': False, 'error': 'Insufficient permissions'}), 403
             
             return f(*args, **kwargs)
@@ -98,7 +101,7 @@ def create_user():
             return jsonify({'success': False, 'error': 'Invalid role'}), 400
         
         # Only admins can create other admins
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_principal()
         if role == 'admin' and current_user.role != 'admin':
             return jsonify({'success': False, 'error': 'Only admins can create admin users'}), 403
         
@@ -106,11 +109,11 @@ def create_user():
         user = User(
             username=data['username'],
             email=data['email'],
-            password_hash=generate_password_hash(data['password']),
+            password_hash=hash_password(data['password']),
             first_name=data['first_name'],
             last_name=data['last_name'],
             role=role,
-            created_by=session['user_id']
+            created_by=current_user.id
         )
         
         db.session.add(user)
@@ -122,6 +125,9 @@ def create_user():
             'message': 'User created successfully'
         }), 201
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -131,12 +137,19 @@ def create_user():
 def get_user(user_id):
     """Get a specific user"""
     try:
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_principal()
         
         # Users can only view their own profile unless they're admin/manager
         if user_id != current_user.id and not current_user.has_permission('create_users'):
             return jsonify({'success': False, 'error': 'Insufficient permissions'}), 403
         
+        # Own profile comes from the principal cache; token principals carry no profile, so load it
+        if user_id == current_user.id:
+            principal = current_user if current_user.user_data is not None else load_principal(user_id)
+            if principal is None:
+                return jsonify({'success': False, 'error': 'User not found'}), 404
+            return jsonify({'success': True, 'user': principal.user_data})
+        
         user = User.query.get(user_id)
         if not user:
             return jsonify({'success': False, 'error': 'User not found'}), 404
@@ -153,7 +166,7 @@ def get_user(user_id):
 def update_user(user_id):
     """Update a user"""
     try:
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_principal()
         target_user = User.query.get(user_id)
         
         if not target_user:
@@ -213,7 +226,7 @@ def update_user(user_id):
 def delete_user(user_id):
     """Delete a user (admin only)"""
     try:
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_principal()
         target_user = User.query.get(user_id)
         
         if not target_user:
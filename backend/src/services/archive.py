@@ -0,0 +1,184 @@
+from models.user import db, Submission, SubmissionField, SubmissionKey, SubmissionRollup
+from services.attribution import invalidate_client
+from services.sharding import each_shard
+from datetime import datetime, timedelta
+import gzip
+import json
+import os
+import shutil
+
+def get_archive_dir(app):
+    return app.config.get('ARCHIVE_DIR') or os.path.join(app.instance_path, 'archive')
+
+def archive_path(archive_dir, client_id, month):
+    """Archives are gzip JSON-lines files, one per client and month (YYYY-MM)"""
+    return os.path.join(archive_dir, client_id, f'{month}.jsonl.gz')
+
+def rollup_source(submission):
+    """Same source bucketing as get_client_analytics"""
+    return submission.initial_utm_source or submission.recent_utm_source or 'Direct'
+
+def export_dict(submission):
+    """Full submission record as written to archives and exports"""
+    data = submission.to_dict()
+    data['form_id'] = submission.form_id
+    data['form_type'] = submission.form_type
+    data['form_url'] = submission.form_url
+    data['form_path'] = submission.form_path
+    data['page_title'] = submission.page_title
+    return data
+
+def add_to_rollups(submissions):
+    """Fold archived submissions into the daily rollup table"""
+    buckets = {}
+    for submission in submissions:
+        key = (
+            submission.client_id,
+            submission.submission_date.date(),
+            submission.form_id or 'unknown',
+            submission.form_type,
+            rollup_source(submission)
+        )
+        count, total = buckets.get(key, (0, 0.0))
+        buckets[key] = (count + 1, total + float(submission.lead_quality_score or 0))
+
+    for (client_id, day, form_id, form_type, source), (count, total) in buckets.items():
+        rollup = SubmissionRollup.query.filter_by(
+            client_id=client_id, day=day, form_id=form_id, form_type=form_type, source=source
+        ).first()
+        if not rollup:
+            rollup = SubmissionRollup(
+                client_id=client_id, day=day, form_id=form_id, form_type=form_type,
+                source=source, submissions=0, score_total=0
+            )
+            db.session.add(rollup)
+        rollup.submissions += count
+        rollup.score_total += total
+
+def pending_path(archive_dir, shard, client_id, month):
+    """Batch written out but not yet known to be committed; published into the monthly file after the commit"""
+    return os.path.join(archive_dir, '.pending', shard, client_id, f'{month}.jsonl.gz')
+
+def publish(staged, path):
+    # Each publish adds a gzip member; gzip readers handle concatenated members
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(staged, 'rb') as source, open(path, 'ab') as target:
+        shutil.copyfileobj(source, target)
+        target.flush()
+        os.fsync(target.fileno())
+    os.remove(staged)
+
+def recover_pending(archive_dir, shard):
+    """Finish batches an interrupted run left staged for the current shard: publish those whose delete
+    committed, drop those that rolled back (their rows are still live and get archived again)"""
+    root = os.path.join(archive_dir, '.pending', shard)
+    if not os.path.isdir(root):
+        return
+    for client_id in os.listdir(root):
+        for name in os.listdir(os.path.join(root, client_id)):
+            staged = os.path.join(root, client_id, name)
+            try:
+                with gzip.open(staged, 'rt', encoding='utf-8') as f:
+                    ids = [json.loads(line)['id'] for line in f]
+            except (OSError, EOFError, ValueError):
+                # Cut off while being written, so before the commit
+                os.remove(staged)
+                continue
+            if Submission.query.filter(Submission.client_id == client_id, Submission.id.in_(ids)).count():
+                os.remove(staged)
+            else:
+                publish(staged, archive_path(archive_dir, client_id, name[:-len('.jsonl.gz')]))
+
+def archive_submissions(archive_dir, older_than_days, batch_size=1000):
+    """Move submissions older than the horizon out of the live table
+
+    Each batch is staged under .pending, deleted along with its idempotency keys in one
+    transaction, and only then appended to the monthly archive file. A batch whose commit fails
+    is never published, so re-running does not write its rows twice.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+
+    for shard in each_shard():
+        recover_pending(archive_dir, shard)
+        while True:
+            batch = Submission.query.filter(
+                Submission.submission_date < cutoff
+            ).order_by(Submission.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            by_file = {}
+            for submission in batch:
+                month = submission.submission_date.strftime('%Y-%m')
+                by_file.setdefault((submission.client_id, month), []).append(submission)
+
+            staged = []
+            for (client_id, month), submissions in by_file.items():
+                path = pending_path(archive_dir, shard, client_id, month)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path, 'wt', encoding='utf-8') as f:
+                    for submission in submissions:
+                        f.write(json.dumps(export_dict(submission)) + '\n')
+                staged.append((path, archive_path(archive_dir, client_id, month)))
+
+            add_to_rollups(batch)
+
+            ids = [submission.id for submission in batch]
+            # Retried captures must not get back the id of a submission that is no longer live
+            SubmissionKey.query.filter(SubmissionKey.submission_id.in_(ids)).delete(synchronize_session=False)
+            SubmissionField.query.filter(SubmissionField.submission_id.in_(ids)).delete(synchronize_session=False)
+            Submission.query.filter(Submission.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            db.session.expunge_all()
+            for path, target in staged:
+                publish(path, target)
+            for client_id in {client_id for client_id, _ in by_file}:
+                invalidate_client(client_id)
+            archived += len(ids)
+
+    return archived
+
+def archived_months(archive_dir, client_id, date_from=None, date_to=None):
+    """Archive months for a client overlapping the date range, oldest first"""
+    client_dir = os.path.join(archive_dir, client_id)
+    if not os.path.isdir(client_dir):
+        return []
+
+    months = sorted(name[:-len('.jsonl.gz')] for name in os.listdir(client_dir) if name.endswith('.jsonl.gz'))
+    if date_from:
+        months = [m for m in months if m >= date_from.strftime('%Y-%m')]
+    if date_to:
+        months = [m for m in months if m <= date_to.strftime('%Y-%m')]
+    return months
+
+def iter_archived_submissions(archive_dir, client_id, date_from=None, date_to=None):
+    """Rehydrate archived submissions for a client as dicts, filtered by date"""
+    seen = set()
+    for month in archived_months(archive_dir, client_id, date_from, date_to):
+        with gzip.open(archive_path(archive_dir, client_id, month), 'rt', encoding='utf-8') as f:
+            for line in f:
+                data = json.loads(line)
+                # Ids are per shard, so a client moved between shards can reuse one; the date tells them apart
+                row_key = (data['id'], data.get('submission_date'))
+                if row_key in seen:
+                    continue
+                seen.add(row_key)
+
+                submitted = datetime.fromisoformat(data['submission_date']) if data.get('submission_date') else None
+                if date_from and (submitted is None or submitted < date_from):
+                    continue
+                if date_to and (submitted is None or submitted > date_to):
+                    continue
+
+                data['archived'] = True
+                yield data
+
+def get_rollups(client_id, date_from=None, date_to=None):
+    """Daily rollups of archived submissions within the date range"""
+    query = SubmissionRollup.query.filter_by(client_id=client_id)
+    if date_from:
+        query = query.filter(SubmissionRollup.day >= date_from.date())
+    if date_to:
+        query = query.filter(SubmissionRollup.day <= date_to.date())
+    return query.all()
@@ -0,0 +1,194 @@
+from models.user import db
+from routes.submissions import rejection_body, store_batch, store_submission
+from services.sharding import pin_shard
+from services.spam_filter import get_spam_filter, count_rejection
+from services.beacon import BatchError, decode_body, parse_batch
+from services.metrics import observe_request, start_request_timer
+from flask import g
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+import asyncio
+import json
+import re
+import time
+
+# Only the public capture endpoints are served natively; everything else goes to the Flask app
+CAPTURE_PATH = re.compile(r'^/api/submissions/(?P<client_id>[^/]+)(?P<batch>/batch)?/?$')
+
+class IngestQueueFull(Exception):
+    """Too many captures are already waiting for a database worker"""
+
+class AsyncIngestor:
+    """Hands parsed captures from the event loop to a few database worker threads
+
+    Waiting connections cost a coroutine each instead of a thread, so one process
+    can hold thousands of slow tracking requests while `workers` threads write.
+    """
+
+    def __init__(self, app, workers, queue_limit):
+        self.app = app
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+
+    async def submit(self, func, client_id, *args):
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self.pending >= self.queue_limit:
+            raise IngestQueueFull()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._run, func, client_id, args
+            )
+        finally:
+            self.pending -= 1
+
+    def _run(self, func, client_id, args):
+        with self.app.app_context():
+            pin_shard(client_id)
+            start_request_timer()
+            try:
+                result = func(client_id, *args)
+            except Exception as e:
+                db.session.rollback()
+                result = {'success': False, 'error': str(e)}, 500
+            return result, g._query_count, g._query_seconds
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+async def read_request_body(receive, limit):
+    """Request body, or None once it grows past `limit` bytes"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def send_json(send, body, status, extra_headers=()):
+    payload = json.dumps(body).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+            (b'access-control-allow-origin', b'*'),
+        ] + list(extra_headers),
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+class IngestApp:
+    """ASGI app answering tracking captures itself and passing other requests to `fallback`"""
+
+    def __init__(self, flask_app, fallback):
+        self.flask_app = flask_app
+        self.fallback = fallback
+        self.ingestor = AsyncIngestor(
+            flask_app,
+            flask_app.config['ASYNC_INGEST_WORKERS'],
+            flask_app.config['ASYNC_INGEST_QUEUE'],
+        )
+        with flask_app.app_context():
+            self.spam_filter = get_spam_filter()
+        flask_app.extensions['async_ingestor'] = self.ingestor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        match = CAPTURE_PATH.match(scope.get('path', '')) if scope['type'] == 'http' else None
+        if match is None or scope['method'] not in ('POST', 'OPTIONS'):
+            return await self.fallback(scope, receive, send)
+
+        if scope['method'] == 'OPTIONS':
+            return await self.preflight(scope, send)
+
+        started = time.perf_counter()
+        batch = bool(match.group('batch'))
+        body, status, extra_headers, queries, db_seconds = await self.capture(
+            scope, receive, match.group('client_id'), batch
+        )
+        await send_json(send, body, status, extra_headers)
+        observe_request('async.capture_batch' if batch else 'async.capture_submission', 'POST', status,
+                        time.perf_counter() - started, queries, db_seconds)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Let captures already handed to a worker finish writing
+                await asyncio.get_running_loop().run_in_executor(None, self.ingestor.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def preflight(self, scope, send):
+        headers = dict(scope['headers'])
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'access-control-allow-origin', b'*'),
+                (b'access-control-allow-methods', b'POST, OPTIONS'),
+                (b'access-control-allow-headers', headers.get(b'access-control-request-headers', b'Content-Type')),
+                (b'access-control-max-age', b'86400'),
+                (b'content-length', b'0'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def capture(self, scope, receive, client_id, batch):
+        """(body, status, extra headers, queries, db seconds) for a capture request"""
+        # Same checks, limits and responses as the Flask capture routes
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        spam_filter = self.spam_filter
+        limit = spam_filter.max_batch_bytes if batch else spam_filter.max_bytes
+
+        ip = spam_filter.client_ip(headers.get('x-forwarded-for'), (scope.get('client') or ('',))[0])
+        length = headers.get('content-length')
+        content_length = int(length) if length and length.isdigit() else None
+
+        rejection = spam_filter.check_limits(client_id, ip, content_length, limit)
+        if rejection:
+            return rejection_body(*rejection) + ((), 0, 0.0)
+
+        body = await read_request_body(receive, limit)
+        if body is None:
+            count_rejection('payload_too_large')
+            return {'success': False, 'error': 'Submission rejected'}, 413, (), 0, 0.0
+
+        try:
+            if batch:
+                query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+                encoding = (query.get('enc') or [headers.get('content-encoding', '')])[0]
+                try:
+                    events = parse_batch(decode_body(body, encoding, limit),
+                                         self.flask_app.config['MAX_BATCH_EVENTS'])
+                except BatchError as e:
+                    return {'success': False, 'error': str(e)}, 400, (), 0, 0.0
+                result, queries, db_seconds = await self.ingestor.submit(store_batch, client_id, events, spam_filter)
+            else:
+                # Like request.get_json(silent=True): only JSON bodies count
+                data = None
+                if 'json' in headers.get('content-type', ''):
+                    try:
+                        data = json.loads(body)
+                    except ValueError:
+                        data = None
+                result, queries, db_seconds = await self.ingestor.submit(
+                    store_submission, client_id, data, headers.get('idempotency-key'), spam_filter
+                )
+        except IngestQueueFull:
+            return {'success': False, 'error': 'Ingestion is busy, retry shortly'}, 503, [(b'retry-after', b'1')], 0, 0.0
+
+        return result + ((), queries, db_seconds)
@@ -0,0 +1,122 @@
+from models.user import db, Submission, SubmissionRollup, utm_value
+from services.cache import TTLCache
+from datetime import timedelta
+
+MODELS = ['first_touch', 'last_touch', 'linear', 'position_based']
+DIMENSIONS = ['source', 'medium', 'campaign']
+
+# Position-based (U-shaped) credit: 40% first, 40% last, 20% spread over middle touches
+POSITION_FIRST = 0.4
+POSITION_LAST = 0.4
+
+# Results per (client, dimension, date range); dropped whenever the client gets a new submission.
+# The TTL bounds staleness for other worker processes that don't see the invalidation.
+attribution_cache = TTLCache('attribution', ttl=300, max_entries=2048)
+
+# Credit is computed on the integer ids from utm_values and translated to strings at the end
+TOUCH_COLUMNS = {
+    'source': (Submission.initial_utm_source_id, Submission.recent_utm_source_id),
+    'medium': (Submission.initial_utm_medium_id, Submission.recent_utm_medium_id),
+    'campaign': (Submission.initial_utm_campaign_id, Submission.recent_utm_campaign_id),
+}
+
+EMPTY_VALUES = {'source': 'Direct', 'medium': '(none)', 'campaign': '(none)'}
+
+def touch_weights(touch_count):
+    """Credit weights per model for a journey with touch_count touches"""
+    if touch_count == 1:
+        return {model: [1.0] for model in MODELS}
+
+    linear = [1.0 / touch_count] * touch_count
+    if touch_count == 2:
+        position = [0.5, 0.5]
+    else:
+        middle = (1.0 - POSITION_FIRST - POSITION_LAST) / (touch_count - 2)
+        position = [POSITION_FIRST] + [middle] * (touch_count - 2) + [POSITION_LAST]
+
+    first = [1.0] + [0.0] * (touch_count - 1)
+    last = [0.0] * (touch_count - 1) + [1.0]
+    return {'first_touch': first, 'last_touch': last, 'linear': linear, 'position_based': position}
+
+def compute_attribution(rows, empty_value):
+    """Credit every model in one pass over (first_touch, last_touch, score) rows
+
+    Only first and last touch are stored per lead, so journeys have one touch
+    (when both agree or one is missing) or two; with two touches linear and
+    position-based credit coincide at 50/50.
+    """
+    weights_by_count = {1: touch_weights(1), 2: touch_weights(2)}
+    totals = {}
+
+    for first, last, score in rows:
+        first = first or last or empty_value
+        last = last or first
+        touches = [first] if first == last else [first, last]
+        weights = weights_by_count[len(touches)]
+        score = float(score or 0)
+
+        for index, value in enumerate(touches):
+            bucket = totals.get(value)
+            if bucket is None:
+                bucket = totals[value] = {model: 0.0 for model in MODELS}
+                bucket['leads'] = 0
+                bucket['score_total'] = 0.0
+            for model in MODELS:
+                bucket[model] += weights[model][index]
+            bucket['leads'] += 1
+            bucket['score_total'] += score
+
+    return totals
+
+def get_attribution(client_id, dimension='source', date_from=None, date_to=None):
+    """Attribution credit per source/medium/campaign for a client's live submissions"""
+    cache_key = (client_id, dimension, date_from, date_to)
+    cached = attribution_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    first_column, last_column = TOUCH_COLUMNS[dimension]
+    query = db.session.query(first_column, last_column, Submission.lead_quality_score).filter(
+        Submission.client_id == client_id
+    )
+    if date_from:
+        query = query.filter(Submission.submission_date >= date_from)
+    if date_to:
+        query = query.filter(Submission.submission_date <= date_to)
+
+    totals = compute_attribution(query.yield_per(5000), None)
+
+    results = []
+    for utm_id, bucket in totals.items():
+        row = {dimension: utm_value(utm_id) or EMPTY_VALUES[dimension], 'leads': bucket['leads']}
+        for model in MODELS:
+            row[model] = round(bucket[model], 2)
+        row['avg_score'] = round(bucket['score_total'] / bucket['leads'], 1) if bucket['leads'] else 0
+        results.append(row)
+    results.sort(key=lambda r: r['linear'], reverse=True)
+
+    attribution_cache.set(cache_key, results)
+    return results
+
+def archived_coverage(client_id, date_from=None, date_to=None):
+    """What get_attribution leaves out: archived leads in the date range and the day archival reached
+
+    Rollups keep one source per day and form, not the first and last touch of each dimension, so
+    archived leads can't be credited; callers report them alongside the live attribution instead.
+    """
+    query = db.session.query(db.func.max(SubmissionRollup.day), db.func.sum(SubmissionRollup.submissions)).filter(
+        SubmissionRollup.client_id == client_id
+    )
+    if date_from:
+        query = query.filter(SubmissionRollup.day >= date_from.date())
+    if date_to:
+        query = query.filter(SubmissionRollup.day <= date_to.date())
+    last_day, leads = query.one()
+    return {
+        'archived_before': (last_day + timedelta(days=1)).isoformat() if last_day else None,
+        'archived_leads': int(leads or 0)
+    }
+
+def invalidate_client(client_id):
+    """Drop cached attribution for a client after its submissions change"""
+    attribution_cache.delete_where(lambda key: key[0] == client_id)
@@ -0,0 +1,109 @@
+import json
+import zlib
+
+class BatchError(ValueError):
+    """Malformed or oversized beacon batch"""
+
+def read_body(request, limit):
+    """Raw request body, gunzipped when sent with ?enc=gzip or Content-Encoding: gzip
+
+    Decompression stops at `limit` bytes so a small compressed body can't expand
+    into an unbounded one.
+    """
+    body = request.get_data(cache=False)
+    encoding = request.args.get('enc') or request.headers.get('Content-Encoding', '')
+    return decode_body(body, encoding, limit)
+
+def decode_body(body, encoding, limit):
+    """Gunzip a raw body when encoding is gzip, stopping at `limit` bytes"""
+    if encoding.lower() != 'gzip':
+        return body
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, limit + 1)
+    except zlib.error:
+        raise BatchError('Invalid gzip body')
+    if len(data) > limit or decompressor.unconsumed_tail:
+        raise BatchError('Batch too large')
+    return data
+
+# Compact (v2) events are positional arrays instead of objects with repeated keys:
+#   [form_id, form_type, url, path, title, timestamp, field_count,
+#    [utm_source, utm_medium, utm_campaign, utm_term, utm_content,
+#     utm_source_initial, utm_medium_initial, utm_campaign_initial],
+#    [session_count, engaged_duration, pages_visited, page_journey],
+#    idempotency_key, {custom form fields}]
+# Trailing entries may be omitted. Lead score factors are derived server-side.
+COMPACT_META_KEYS = ('_form_id', '_form_type', '_form_url', '_form_path', '_form_title',
+                     '_timestamp', '_form_field_count')
+COMPACT_UTM_KEYS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+                    'utm_source_initial', 'utm_medium_initial', 'utm_campaign_initial')
+COMPACT_SESSION_KEYS = ('session_count', 'engaged_duration', 'pages_visited', 'page_journey')
+
+def _int(value, default):
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def decode_compact_event(event):
+    """Expand a v2 positional event into the dict shape the v1 script sends"""
+    if type(event) is not list:
+        raise BatchError('Compact events must be arrays')
+
+    length = len(event)
+    data = dict(event[10]) if length > 10 and type(event[10]) is dict else {}
+
+    # zip stops at the shorter side, so omitted trailing entries are simply skipped
+    for key, value in zip(COMPACT_META_KEYS, event):
+        if value or value == 0:
+            data[key] = value
+
+    utm = event[7] if length > 7 and type(event[7]) is list else ()
+    for key, value in zip(COMPACT_UTM_KEYS, utm):
+        if value:
+            data[key] = value
+
+    session = event[8] if length > 8 and type(event[8]) is list else ()
+    for key, value in zip(COMPACT_SESSION_KEYS, session):
+        if value or value == 0:
+            data[key] = value
+
+    if length > 9 and event[9]:
+        data['_idempotency_key'] = event[9]
+
+    data['_lead_score_factors'] = {
+        'session_count': _int(data.get('session_count'), 1),
+        'engaged_duration': _int(data.get('engaged_duration'), 0),
+        'pages_visited': _int(data.get('pages_visited'), 1),
+        'has_utm_source': 'utm_source' in data,
+        'form_complexity': _int(data.get('_form_field_count'), 1)
+    }
+    return data
+
+def parse_batch(body, max_events):
+    """Events from a verbose {"v": 1, "events": [...]} or compact {"v": 2, "e": [...]} batch body"""
+    try:
+        payload = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        raise BatchError('Invalid JSON')
+
+    version = payload.get('v') if isinstance(payload, dict) else None
+    if version == 1:
+        events = payload.get('events')
+    elif version == 2:
+        events = payload.get('e')
+    else:
+        raise BatchError('Unsupported batch version')
+
+    if not isinstance(events, list) or not events:
+        raise BatchError('No events provided')
+    if len(events) > max_events:
+        raise BatchError('Too many events in batch')
+
+    if version == 2:
+        return [decode_compact_event(event) for event in events]
+    return events
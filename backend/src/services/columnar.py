@@ -0,0 +1,173 @@
+from models.user import db, Client, Submission, UTM_FIELDS, utm_value
+from services.archive import get_archive_dir, iter_archived_submissions
+from services.sharding import each_shard
+from datetime import datetime
+import os
+
+SNAPSHOT_FILE = 'submissions.parquet'
+ROW_GROUP_SIZE = 50000
+
+def require_pyarrow():
+    """(pyarrow, pyarrow.parquet), imported on first use so workers don't pay for it at boot"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # Reports are unavailable without pyarrow, the rest of the API still works
+        raise RuntimeError('Columnar reports require pyarrow (pip install pyarrow)')
+    return pa, pq
+
+def snapshot_schema():
+    pa, _ = require_pyarrow()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('client_id', pa.string()),
+        ('industry', pa.string()),
+        ('submission_date', pa.timestamp('us')),
+        ('form_id', pa.string()),
+        ('form_type', pa.string()),
+        ('source', pa.string()),  # Same bucketing as get_client_analytics
+        ('initial_utm_source', pa.string()),
+        ('initial_utm_medium', pa.string()),
+        ('initial_utm_campaign', pa.string()),
+        ('recent_utm_source', pa.string()),
+        ('recent_utm_medium', pa.string()),
+        ('recent_utm_campaign', pa.string()),
+        ('lead_quality_score', pa.float64()),
+        ('session_count', pa.int64()),
+        ('engaged_session_duration_seconds', pa.int64()),
+    ])
+
+def get_snapshot_path(app):
+    snapshot_dir = app.config.get('SNAPSHOT_DIR') or os.path.join(app.instance_path, 'snapshots')
+    return os.path.join(snapshot_dir, SNAPSHOT_FILE)
+
+def _row(data, industry):
+    source = data.get('initial_utm_source') or data.get('recent_utm_source') or 'Direct'
+    submitted = data.get('submission_date')
+    if isinstance(submitted, str):
+        submitted = datetime.fromisoformat(submitted)
+    score = data.get('lead_quality_score')
+    return {
+        'id': data.get('id'),
+        'client_id': data.get('client_id'),
+        'industry': industry,
+        'submission_date': submitted,
+        'form_id': data.get('form_id') or 'unknown',
+        'form_type': data.get('form_type'),
+        'source': source,
+        'initial_utm_source': data.get('initial_utm_source'),
+        'initial_utm_medium': data.get('initial_utm_medium'),
+        'initial_utm_campaign': data.get('initial_utm_campaign'),
+        'recent_utm_source': data.get('recent_utm_source'),
+        'recent_utm_medium': data.get('recent_utm_medium'),
+        'recent_utm_campaign': data.get('recent_utm_campaign'),
+        'lead_quality_score': float(score) if score is not None else None,
+        'session_count': data.get('session_count'),
+        'engaged_session_duration_seconds': data.get('engaged_session_duration_seconds'),
+    }
+
+def export_snapshot(app):
+    """Write all live and archived submissions to a Parquet snapshot, replacing the old one atomically"""
+    pa, pq = require_pyarrow()
+    schema = snapshot_schema()
+    path = get_snapshot_path(app)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+
+    industries = dict(db.session.query(Client.client_id, Client.industry).all())
+    # UTM columns are read as their integer ids and decoded through the intern cache
+    columns = [Submission.id]
+    for name in schema.names:
+        if name in ('id', 'industry', 'source'):
+            continue
+        if name in UTM_FIELDS:
+            columns.append(getattr(Submission, name + '_id').label(name))
+        else:
+            columns.append(getattr(Submission, name))
+    query = db.session.query(*columns).execution_options(yield_per=ROW_GROUP_SIZE)
+    utm_columns = [name for name in schema.names if name in UTM_FIELDS]
+
+    def archived_rows():
+        archive_dir = get_archive_dir(app)
+        for client_id in industries:
+            for data in iter_archived_submissions(archive_dir, client_id):
+                yield data
+
+    rows_written = 0
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        batch = []
+        for data in archived_rows():
+            batch.append(_row(data, industries.get(data.get('client_id'))))
+            if len(batch) >= ROW_GROUP_SIZE:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                rows_written += len(batch)
+                batch = []
+        for _ in each_shard():
+            for row in query:
+                data = row._asdict()
+                for name in utm_columns:
+                    data[name] = utm_value(data[name])
+                batch.append(_row(data, industries.get(data['client_id'])))
+                if len(batch) >= ROW_GROUP_SIZE:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    rows_written += len(batch)
+                    batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            rows_written += len(batch)
+
+    os.replace(tmp_path, path)
+    return rows_written
+
+def load_snapshot(app, columns, date_from=None, date_to=None, industry=None):
+    """Read only the requested columns, with date/industry predicates pushed into the Parquet scan"""
+    _, pq = require_pyarrow()
+    path = get_snapshot_path(app)
+    if not os.path.exists(path):
+        raise FileNotFoundError('No analytics snapshot yet; run "flask export-snapshot"')
+
+    filters = []
+    if date_from:
+        filters.append(('submission_date', '>=', date_from))
+    if date_to:
+        filters.append(('submission_date', '<=', date_to))
+    if industry:
+        filters.append(('industry', '==', industry))
+
+    return pq.read_table(path, columns=columns, filters=filters or None)
+
+def snapshot_generated_at(app):
+    path = get_snapshot_path(app)
+    if not os.path.exists(path):
+        return None
+    return datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat()
+
+def _grouped(table, keys):
+    grouped = table.group_by(keys).aggregate([
+        ('id', 'count'),
+        ('lead_quality_score', 'mean'),
+        ('client_id', 'count_distinct'),
+    ])
+    results = []
+    for row in grouped.to_pylist():
+        result = {key: row[key] for key in keys}
+        result['submissions'] = row['id_count']
+        result['avg_score'] = round(row['lead_quality_score_mean'] or 0, 1)
+        result['clients'] = row['client_id_count_distinct']
+        results.append(result)
+    return sorted(results, key=lambda r: r['submissions'], reverse=True)
+
+def source_report(app, date_from=None, date_to=None, industry=None, dimension='source'):
+    """Agency-wide source attribution, optionally within one industry"""
+    table = load_snapshot(app, ['id', 'client_id', 'lead_quality_score', dimension],
+                          date_from, date_to, industry)
+    return _grouped(table, [dimension])
+
+def industry_report(app, date_from=None, date_to=None):
+    """Compare lead volume and quality across industries"""
+    table = load_snapshot(app, ['id', 'client_id', 'industry', 'lead_quality_score'], date_from, date_to)
+    table = table.set_column(
+        table.schema.get_field_index('industry'), 'industry',
+        table.column('industry').fill_null('Unassigned')
+    )
+    return _grouped(table, ['industry'])
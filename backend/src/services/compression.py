@@ -0,0 +1,126 @@
+from flask import current_app, request
+import importlib.util
+import re
+import threading
+import time
+import zlib
+
+# Text responses worth compressing; images and archives are already compressed
+COMPRESSIBLE = re.compile(r'^(text/|application/(json|x-ndjson|javascript|xml|csv))')
+CHUNK_BYTES = 64 * 1024
+
+# encoding -> module that must be importable for it to be offered
+OPTIONAL_MODULES = {'br': 'brotli', 'zstd': 'zstandard'}
+
+def gzip_compressor(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+def brotli_compressor(level):
+    import brotli
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.finish
+
+def zstd_compressor(level):
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return compressor.compress, compressor.flush
+
+COMPRESSORS = {'gzip': gzip_compressor, 'br': brotli_compressor, 'zstd': zstd_compressor}
+
+# Per worker process, rendered on /api/metrics: encoding -> [responses, bytes in, bytes out, CPU seconds]
+_lock = threading.Lock()
+compression_totals = {}
+
+def available_encodings(preference):
+    """The preferred encodings whose compression library is installed, without importing it yet"""
+    return [
+        encoding for encoding in preference
+        if encoding in COMPRESSORS
+        and (encoding not in OPTIONAL_MODULES or importlib.util.find_spec(OPTIONAL_MODULES[encoding]))
+    ]
+
+def choose_encoding(accept, encodings):
+    """Client's highest-weighted encoding; ties go to the server's preference order"""
+    best = max(encodings, key=lambda encoding: accept[encoding], default=None)
+    return best if best is not None and accept[best] else None
+
+def record(encoding, bytes_in, bytes_out, seconds):
+    with _lock:
+        totals = compression_totals.setdefault(encoding, [0, 0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += bytes_in
+        totals[2] += bytes_out
+        totals[3] += seconds
+
+def compress_stream(chunks, encoding, level):
+    """Compress an iterable of byte chunks as it is consumed, so the response body is never held twice"""
+    compress, flush = COMPRESSORS[encoding](level)
+    bytes_in = bytes_out = 0
+    cpu = 0.0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            bytes_in += len(chunk)
+            started = time.thread_time()
+            data = compress(chunk)
+            cpu += time.thread_time() - started
+            if data:
+                bytes_out += len(data)
+                yield data
+        started = time.thread_time()
+        data = flush()
+        cpu += time.thread_time() - started
+        bytes_out += len(data)
+        yield data
+    finally:
+        record(encoding, bytes_in, bytes_out, cpu)
+
+def _slices(data):
+    for start in range(0, len(data), CHUNK_BYTES):
+        yield data[start:start + CHUNK_BYTES]
+
+def compress_response(response):
+    """after_request hook: compress text responses over COMPRESSION_MIN_BYTES for clients that accept it"""
+    if (request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or not COMPRESSIBLE.match(response.mimetype or '')):
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return response
+
+    settings = current_app.extensions['compression']
+    encoding = choose_encoding(request.accept_encodings, settings['encodings'])
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        chunks = response.iter_encoded()
+    else:
+        data = response.get_data()
+        if len(data) < settings['min_bytes']:
+            return response
+        chunks = _slices(data)
+
+    response.response = compress_stream(chunks, encoding, settings['levels'][encoding])
+    response.headers['Content-Encoding'] = encoding
+    response.headers.pop('Content-Length', None)
+    tag, weak = response.get_etag()
+    if tag:
+        response.set_etag(f'{tag}-{encoding}', weak)
+    return response
+
+def init_compression(app):
+    """Register response compression; encodings and levels come from COMPRESSION_* settings"""
+    app.extensions['compression'] = {
+        'encodings': available_encodings(app.config['COMPRESSION_ENCODINGS']),
+        'min_bytes': app.config['COMPRESSION_MIN_BYTES'],
+        'levels': {
+            'gzip': app.config['COMPRESSION_GZIP_LEVEL'],
+            'br': app.config['COMPRESSION_BR_QUALITY'],
+            'zstd': app.config['COMPRESSION_ZSTD_LEVEL'],
+        },
+    }
+    app.after_request(compress_response)
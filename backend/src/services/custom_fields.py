@@ -0,0 +1,140 @@
+from models.user import db, ClientField, Submission, SubmissionField
+import json
+import re
+
+FIELD_TYPES = ['text', 'number']
+
+# Query string filters look like field.budget=5000, field.budget.min=1000, field.budget.max=9000
+FILTER_PATTERN = re.compile(r'^field\.([A-Za-z0-9_\-]+)(?:\.(min|max))?$')
+
+# Field keys must be usable in those filters
+FIELD_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_\-]{1,100}$')
+
+def normalize_text(value):
+    """Turn a raw form value into the string stored in the index"""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        value = ', '.join(str(v) for v in value)
+    value = str(value).strip()
+    return value[:255] if value else None
+
+def parse_number(value):
+    """Parse numbers like '5000', '$5,000' or '12.5'; returns None when not numeric"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = re.sub(r'[^0-9.\-]', '', str(value))
+    try:
+        return float(cleaned) if cleaned else None
+    except ValueError:
+        return None
+
+def get_client_fields(client_id):
+    """Get configured custom fields for a client"""
+    return ClientField.query.filter_by(client_id=client_id).all()
+
+def extract_fields(client_fields, data):
+    """Build SubmissionField rows for every configured field present in the form data"""
+    extracted = []
+    for field in client_fields:
+        raw_value = None
+        for key in field.get_source_keys():
+            # Rows saved before source_keys were validated may hold lists or numbers
+            if not isinstance(key, str):
+                continue
+            if data.get(key) not in (None, ''):
+                raw_value = data[key]
+                break
+
+        value_text = normalize_text(raw_value)
+        if value_text is None:
+            continue
+
+        extracted.append(SubmissionField(
+            client_id=field.client_id,
+            field_key=field.field_key,
+            value_text=value_text,
+            value_number=parse_number(raw_value) if field.field_type == 'number' else None
+        ))
+    return extracted
+
+def backfill_field(field, batch_size=500):
+    """Extract a newly configured field for submissions that were stored before it existed
+
+    Rows are flushed per batch but not committed, so the caller commits them with the field.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        batch = Submission.query.filter(
+            Submission.client_id == field.client_id,
+            Submission.id > last_id
+        ).order_by(Submission.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        for submission in batch:
+            last_id = submission.id
+            if not submission.additional_data:
+                continue
+            try:
+                data = json.loads(submission.additional_data)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(data, dict):
+                continue
+            for row in extract_fields([field], data):
+                row.submission_id = submission.id
+                db.session.add(row)
+                processed += 1
+
+        db.session.flush()
+    return processed
+
+def apply_field_filters(query, client_id, args):
+    """Push field.* query string filters down into SQL joins on submission_fields
+
+    Raises ValueError for unknown fields or invalid numeric bounds.
+    """
+    filters = {}
+    for arg, value in args.items():
+        match = FILTER_PATTERN.match(arg)
+        if match:
+            filters.setdefault(match.group(1), []).append((match.group(2), value))
+
+    if not filters:
+        return query
+
+    fields = {f.field_key: f for f in get_client_fields(client_id)}
+    for field_key, conditions in filters.items():
+        field = fields.get(field_key)
+        if not field:
+            raise ValueError(f'Unknown custom field: {field_key}')
+
+        alias = db.aliased(SubmissionField)
+        query = query.join(alias, db.and_(
+            alias.submission_id == Submission.id,
+            alias.client_id == client_id,
+            alias.field_key == field_key
+        ))
+
+        for operator, value in conditions:
+            if operator is None and field.field_type != 'number':
+                query = query.filter(alias.value_text == value)
+                continue
+            if field.field_type != 'number':
+                raise ValueError(f'Range filters require a number field: {field_key}')
+
+            number = parse_number(value)
+            if number is None:
+                raise ValueError(f'Invalid numeric value for field {field_key}: {value}')
+            if operator == 'min':
+                query = query.filter(alias.value_number >= number)
+            elif operator == 'max':
+                query = query.filter(alias.value_number <= number)
+            else:
+                query = query.filter(alias.value_number == number)
+
+    return query
@@ -0,0 +1,282 @@
+from flask import current_app
+from models.user import db, DeliveryOutbox, Submission, Webhook
+from services.archive import export_dict
+from services.cache import TTLCache
+from services.http_pool import ConnectionPool
+from services.sharding import each_shard
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import hashlib
+import hmac
+import json
+import random
+import secrets
+import threading
+import time
+
+# Rows a worker has leased stay invisible to other workers this long, then count as abandoned
+LEASE_SECONDS = 300
+
+# Timeouts, throttling and conflicts are worth retrying; any other 4xx won't change on its own
+RETRYABLE_4XX = frozenset([408, 409, 425, 429])
+
+MAX_ERROR_LENGTH = 500
+
+# Active webhook ids per client, looked up on every capture; most clients have none
+webhook_cache = TTLCache('webhooks', ttl=60, max_entries=10000)
+
+def active_webhook_ids(client_id):
+    ids = webhook_cache.get(client_id)
+    if ids is None:
+        ids = [row.id for row in Webhook.query.filter_by(client_id=client_id, is_active=True).all()]
+        webhook_cache.set(client_id, ids)
+    return ids
+
+def invalidate_webhooks(client_id):
+    webhook_cache.delete(client_id)
+
+def enqueue(client_id, submission):
+    """Queue the submission for every active webhook of the client, in the submission's transaction
+
+    The submission must already be flushed so it has an id (record_key does this).
+    """
+    for webhook_id in active_webhook_ids(client_id):
+        db.session.add(DeliveryOutbox(client_id=client_id, webhook_id=webhook_id, submission_id=submission.id))
+
+def sign(secret, timestamp, body):
+    """HMAC-SHA256 over '<timestamp>.<body>', as sent in X-LeadLift-Signature"""
+    message = f'{timestamp}.'.encode('utf-8') + body
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+def retry_after_seconds(headers):
+    """Seconds from a Retry-After header (delta or HTTP date), or None"""
+    value = next((v for k, v in headers.items() if k.lower() == 'retry-after'), None)
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        return max(0, (parsedate_to_datetime(value).timestamp() - time.time()))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_seconds(attempts, base, maximum, retry_after=None):
+    """Exponential backoff with jitter after the given number of failed attempts; Retry-After wins if longer"""
+    delay = min(base * 2 ** (attempts - 1), maximum)
+    # Jitter spreads retries of a batch that failed together (e.g. a CRM outage)
+    delay *= 0.5 + random.random() / 2
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, maximum))
+    return delay
+
+class WebhookDeliverer:
+    """Pushes outbox rows to webhook URLs: `concurrency` requests in flight, batches of `batch_size` submissions"""
+
+    def __init__(self, concurrency, per_host, timeout, batch_size, claim_size, max_attempts,
+                 backoff_base, backoff_max, allow_private=False):
+        # Private targets are refused again at connect time, in case DNS changed since the URL was saved
+        self.pool = ConnectionPool(max_per_host=per_host, timeout=timeout, allow_private=allow_private)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='webhook')
+        self.batch_size = batch_size
+        self.claim_size = claim_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def post(self, webhook, body):
+        """(ok, permanent failure, error, retry-after seconds) for one batch request"""
+        timestamp = str(int(time.time()))
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'LeadLift-Webhooks/1.0',
+            'X-LeadLift-Event': 'submissions.created',
+            'X-LeadLift-Timestamp': timestamp,
+            'X-LeadLift-Signature': sign(webhook['secret'], timestamp, body),
+        }
+        try:
+            status, response_headers, _ = self.pool.request('POST', webhook['url'], body, headers)
+        except ValueError as e:
+            return False, True, str(e), None
+        except Exception as e:
+            return False, False, f'{type(e).__name__}: {e}', None
+        if 200 <= status < 300:
+            return True, False, None, None
+        permanent = 400 <= status < 500 and status not in RETRYABLE_4XX
+        return False, permanent, f'HTTP {status}', retry_after_seconds(response_headers)
+
+    def claim(self):
+        """Lease up to claim_size due rows on the current shard; other workers skip them until the lease ends"""
+        now = datetime.utcnow()
+        due = [row_id for (row_id,) in db.session.query(DeliveryOutbox.id).filter(
+            DeliveryOutbox.status == 'pending',
+            DeliveryOutbox.next_attempt_at <= now
+        ).order_by(DeliveryOutbox.next_attempt_at).limit(self.claim_size)]
+        if not due:
+            return []
+
+        token = secrets.token_hex(8)
+        DeliveryOutbox.query.filter(
+            DeliveryOutbox.id.in_(due),
+            DeliveryOutbox.status == 'pending',
+            DeliveryOutbox.next_attempt_at <= now
+        ).update({'claim': token, 'next_attempt_at': now + timedelta(seconds=LEASE_SECONDS)},
+                 synchronize_session=False)
+        db.session.commit()
+        return DeliveryOutbox.query.filter(DeliveryOutbox.id.in_(due), DeliveryOutbox.claim == token).all()
+
+    def deliver_claimed(self, rows):
+        """Send leased rows grouped by webhook and record each outcome; returns {status: rows}"""
+        webhooks = {
+            webhook.id: {'url': webhook.url, 'secret': webhook.secret}
+            for webhook in Webhook.query.filter(
+                Webhook.id.in_({row.webhook_id for row in rows}),
+                Webhook.is_active.is_(True)
+            )
+        }
+        # Ids are only unique per shard and can be reused after deletes, so the client must match too
+        submissions = {
+            (submission.client_id, submission.id): submission
+            for submission in Submission.query.filter(
+                Submission.id.in_({row.submission_id for row in rows}),
+                Submission.client_id.in_({row.client_id for row in rows})
+            )
+        }
+
+        outcomes = []
+        by_webhook = {}
+        for row in rows:
+            if row.webhook_id not in webhooks:
+                outcomes.append((row, (False, True, 'Webhook removed or disabled', None)))
+            elif (row.client_id, row.submission_id) not in submissions:
+                outcomes.append((row, (False, True, 'Submission no longer exists', None)))
+            else:
+                by_webhook.setdefault(row.webhook_id, []).append(row)
+
+        # Payloads are built here, on the thread that owns the session; the pool threads only do HTTP
+        futures = []
+        for webhook_id, webhook_rows in by_webhook.items():
+            for start in range(0, len(webhook_rows), self.batch_size):
+                batch = webhook_rows[start:start + self.batch_size]
+                body = json.dumps({
+                    'event': 'submissions.created',
+                    'client_id': batch[0].client_id,
+                    'submissions': [
+                        dict(export_dict(submissions[(row.client_id, row.submission_id)]), delivery_id=row.id)
+                        for row in batch
+                    ],
+                }).encode('utf-8')
+                futures.append((batch, self._executor.submit(self.post, webhooks[webhook_id], body)))
+
+        for batch, future in futures:
+            outcome = future.result()
+            outcomes.extend((row, outcome) for row in batch)
+
+        counts = {'delivered': 0, 'retrying': 0, 'failed': 0}
+        now = datetime.utcnow()
+        for row, (ok, permanent, error, retry_after) in outcomes:
+            row.attempts = (row.attempts or 0) + 1
+            row.claim = None
+            if ok:
+                row.status = 'delivered'
+                row.delivered_at = now
+                row.last_error = None
+                counts['delivered'] += 1
+            elif permanent or row.attempts >= self.max_attempts:
+                row.status = 'failed'
+                row.last_error = error[:MAX_ERROR_LENGTH]
+                counts['failed'] += 1
+            else:
+                delay = backoff_seconds(row.attempts, self.backoff_base, self.backoff_max, retry_after)
+                row.next_attempt_at = now + timedelta(seconds=delay)
+                row.last_error = error[:MAX_ERROR_LENGTH]
+                counts['retrying'] += 1
+        db.session.commit()
+        return counts
+
+    def deliver_pending(self):
+        """One pass over every shard; returns {status: rows} including how many were claimed"""
+        totals = {'claimed': 0, 'delivered': 0, 'retrying': 0, 'failed': 0}
+        for _ in each_shard():
+            rows = self.claim()
+            if not rows:
+                continue
+            totals['claimed'] += len(rows)
+            for status, count in self.deliver_claimed(rows).items():
+                totals[status] += count
+        return totals
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+_deliverer = None
+_deliverer_lock = threading.Lock()
+
+def get_deliverer():
+    global _deliverer
+    if _deliverer is None:
+        with _deliverer_lock:
+            if _deliverer is None:
+                config = current_app.config
+                _deliverer = WebhookDeliverer(
+                    config['WEBHOOK_CONCURRENCY'],
+                    config['WEBHOOK_PER_HOST'],
+                    config['WEBHOOK_TIMEOUT'],
+                    config['WEBHOOK_BATCH_SIZE'],
+                    config['WEBHOOK_CLAIM_SIZE'],
+                    config['WEBHOOK_MAX_ATTEMPTS'],
+                    config['WEBHOOK_BACKOFF_SECONDS'],
+                    config['WEBHOOK_BACKOFF_MAX_SECONDS'],
+                    config['WEBHOOK_ALLOW_PRIVATE_TARGETS']
+                )
+    return _deliverer
+
+def run_worker(poll_seconds, once=False):
+    """Deliver until stopped, sleeping poll_seconds whenever a pass finds nothing due"""
+    deliverer = get_deliverer()
+    while True:
+        totals = deliverer.deliver_pending()
+        if totals['claimed']:
+            print(f"Delivered {totals['delivered']}, retrying {totals['retrying']}, failed {totals['failed']}")
+        if once:
+            return totals
+        if totals['claimed'] < deliverer.claim_size:
+            time.sleep(poll_seconds)
+
+def retry_failed(client_id, webhook_id=None):
+    """Put a client's failed deliveries back in the queue (after fixing the endpoint); returns the row count"""
+    query = DeliveryOutbox.query.filter_by(client_id=client_id, status='failed')
+    if webhook_id is not None:
+        query = query.filter_by(webhook_id=webhook_id)
+    return query.update({'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.utcnow(), 'claim': None},
+                        synchronize_session=False)
+
+def delivery_summary(client_id, recent_failures=20):
+    """Row counts by webhook and status plus the latest failures, for the dashboard"""
+    counts = db.session.query(
+        DeliveryOutbox.webhook_id, DeliveryOutbox.status, db.func.count(DeliveryOutbox.id)
+    ).filter(DeliveryOutbox.client_id == client_id).group_by(DeliveryOutbox.webhook_id, DeliveryOutbox.status)
+    by_webhook = {}
+    for webhook_id, status, count in counts:
+        by_webhook.setdefault(webhook_id, {'pending': 0, 'delivered': 0, 'failed': 0})[status] = count
+
+    failures = DeliveryOutbox.query.filter_by(client_id=client_id, status='failed').order_by(
+        DeliveryOutbox.id.desc()
+    ).limit(recent_failures).all()
+    return {
+        'webhooks': [dict(counts, webhook_id=webhook_id) for webhook_id, counts in sorted(by_webhook.items())],
+        'recent_failures': [row.to_dict() for row in failures]
+    }
+
+def prune_deliveries(max_age_seconds):
+    """Delete delivered rows older than the retention period; failed rows stay until retried"""
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    deleted = 0
+    for _ in each_shard():
+        deleted += DeliveryOutbox.query.filter(
+            DeliveryOutbox.status == 'delivered',
+            DeliveryOutbox.delivered_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return deleted
@@ -0,0 +1,203 @@
+from models.user import db, Form, Submission, SubmissionRollup
+from services.cache import TTLCache
+from services.sharding import each_shard, engine_for, shard_names
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+# {form_name: (form id, form_type)} per client. Forms created by ingestion are published into the
+# cached dict once their transaction commits; edits through the forms API drop the client's entry.
+catalog_cache = TTLCache('form_catalog', ttl=3600, max_entries=20000)
+
+def client_catalog(client_id):
+    """The client's forms by name, loaded with one query per client and cache lifetime"""
+    catalog = catalog_cache.get(client_id)
+    if catalog is None:
+        rows = db.session.query(Form.id, Form.form_name, Form.form_type).filter(Form.client_id == client_id)
+        catalog = {form_name: (form_id, form_type) for form_id, form_name, form_type in rows}
+        catalog_cache.set(client_id, catalog)
+    return catalog
+
+def invalidate_catalog(client_id):
+    catalog_cache.delete(client_id)
+
+def forms_by_id(client_id, form_ids=()):
+    """{form id: (form_name, form_type)} for resolving grouped submission rows
+
+    Another worker process may have added forms since the catalog was cached; it is reloaded
+    when any of `form_ids` is missing from it.
+    """
+    catalog = client_catalog(client_id)
+    by_id = {form_id: (form_name, form_type) for form_name, (form_id, form_type) in catalog.items()}
+    if any(form_id is not None and form_id not in by_id for form_id in form_ids):
+        invalidate_catalog(client_id)
+        return forms_by_id(client_id)
+    return by_id
+
+def form_ref(client_id, form_name, form_type=None):
+    """Catalog id for a form reported by the tracking script, inserting it on first sight"""
+    form_name = str(form_name or 'unknown-form')[:255]
+    entry = client_catalog(client_id).get(form_name)
+    if entry is not None:
+        return entry[0]
+
+    pending = db.session.info.setdefault('pending_forms', {})
+    key = (client_id, form_name)
+    if key in pending:
+        return pending[key][0]
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    db.session.execute(insert(Form).values(
+        client_id=client_id, form_name=form_name, form_identifier=form_name, form_type=form_type,
+        created_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=['client_id', 'form_name']))
+    row = db.session.execute(
+        db.select(Form.id, Form.form_type).where(Form.client_id == client_id, Form.form_name == form_name)
+    ).one()
+    pending[key] = (row.id, row.form_type)
+    return row.id
+
+@event.listens_for(Session, 'after_commit')
+def _publish_new_forms(session):
+    for (client_id, form_name), entry in session.info.pop('pending_forms', {}).items():
+        catalog = catalog_cache.get(client_id)
+        if catalog is not None:
+            # Copied rather than updated in place, since other threads may be iterating the cached dict
+            catalog = dict(catalog)
+            catalog[form_name] = entry
+            catalog_cache.set(client_id, catalog)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_new_forms(session):
+    session.info.pop('pending_forms', None)
+
+def form_stats(client_id, form_ids=None):
+    """{form id: submission_count, last_submission, avg_lead_score} for the client's submissions
+
+    Live rows are read from the ix_submissions_client_form covering index on the client's shard;
+    archived ones from the daily rollups, which name the form rather than carry its id.
+    """
+    query = db.session.query(
+        Submission.form_ref_id,
+        db.func.count().label('submission_count'),
+        db.func.max(Submission.submission_date).label('last_submission'),
+        db.func.sum(Submission.lead_quality_score).label('score_total')
+    ).filter(Submission.client_id == client_id)
+    if form_ids is not None:
+        query = query.filter(Submission.form_ref_id.in_(form_ids))
+    totals = {row.form_ref_id: (row.submission_count, row.last_submission, float(row.score_total or 0))
+              for row in query.group_by(Submission.form_ref_id)}
+
+    catalog = client_catalog(client_id)
+    rollups = db.session.query(
+        SubmissionRollup.form_id,
+        db.func.sum(SubmissionRollup.submissions),
+        db.func.max(SubmissionRollup.day),
+        db.func.sum(SubmissionRollup.score_total)
+    ).filter(SubmissionRollup.client_id == client_id).group_by(SubmissionRollup.form_id)
+    for form_name, count, day, score_total in rollups:
+        entry = catalog.get(form_name)
+        if entry is None or (form_ids is not None and entry[0] not in form_ids):
+            continue
+        live_count, last_submission, live_score = totals.get(entry[0], (0, None, 0.0))
+        # Archived rows only keep their day
+        archived_last = datetime.combine(day, datetime.min.time()) if day else None
+        if last_submission is None or (archived_last and archived_last > last_submission):
+            last_submission = archived_last
+        totals[entry[0]] = (live_count + int(count or 0), last_submission, live_score + float(score_total or 0))
+
+    stats = {}
+    for form_id, (count, last_submission, score_total) in totals.items():
+        stats[form_id] = {
+            'submission_count': count,
+            'last_submission': last_submission.isoformat() if last_submission else None,
+            'avg_lead_score': round(score_total / count, 1) if count else 0
+        }
+    return stats
+
+def form_counts(client_ids):
+    """{client_id: number of catalog forms} for the clients list"""
+    rows = db.session.query(Form.client_id, db.func.count(Form.id)).filter(
+        Form.client_id.in_(client_ids)
+    ).group_by(Form.client_id)
+    return dict(rows.all())
+
+def unlink_form(form):
+    """Clear the form's id from the client's submissions (they keep their form_id string)"""
+    return Submission.query.filter_by(client_id=form.client_id, form_ref_id=form.id).update(
+        {'form_ref_id': None}, synchronize_session=False
+    )
+
+def merge_duplicate_forms():
+    """Fold forms sharing a (client_id, form_name) into the oldest one, repointing submissions on every
+    shard first; returns the number of forms removed. Needed before the unique index can be created."""
+    groups = db.session.query(Form.client_id, Form.form_name, db.func.min(Form.id)).group_by(
+        Form.client_id, Form.form_name
+    ).having(db.func.count(Form.id) > 1).all()
+    if not groups:
+        return 0
+
+    merges = []
+    for client_id, form_name, survivor in groups:
+        duplicates = [form_id for (form_id,) in db.session.query(Form.id).filter(
+            Form.client_id == client_id, Form.form_name == form_name, Form.id != survivor
+        )]
+        merges.append((client_id, survivor, duplicates))
+
+    for _ in each_shard():
+        for client_id, survivor, duplicates in merges:
+            Submission.query.filter(
+                Submission.client_id == client_id, Submission.form_ref_id.in_(duplicates)
+            ).update({'form_ref_id': survivor}, synchronize_session=False)
+        db.session.commit()
+
+    removed = 0
+    for client_id, survivor, duplicates in merges:
+        removed += Form.query.filter(Form.id.in_(duplicates)).delete(synchronize_session=False)
+        invalidate_catalog(client_id)
+    db.session.commit()
+    return removed
+
+def link_legacy_submissions():
+    """Add the catalog columns to databases created before it and link their submissions; returns rows linked"""
+    primary = db.engine
+    if 'form_type' not in {column['name'] for column in inspect(primary).get_columns('forms')}:
+        with primary.begin() as connection:
+            connection.execute(text('ALTER TABLE forms ADD COLUMN form_type VARCHAR(100)'))
+
+    index = next(index for index in Submission.__table__.indexes if index.name == 'ix_submissions_client_form')
+    for shard in shard_names():
+        engine = engine_for(shard)
+        if 'form_ref_id' not in {column['name'] for column in inspect(engine).get_columns('submissions')}:
+            with engine.begin() as connection:
+                connection.execute(text('ALTER TABLE submissions ADD COLUMN form_ref_id INTEGER'))
+        index.create(engine, checkfirst=True)
+
+    # Forms added by hand before the catalog could repeat a name, which the unique index refuses
+    merge_duplicate_forms()
+    with primary.begin() as connection:
+        connection.execute(text(
+            'CREATE UNIQUE INDEX IF NOT EXISTS uq_forms_client_name ON forms (client_id, form_name)'
+        ))
+
+    linked = 0
+    for _ in each_shard():
+        forms = db.session.query(
+            Submission.client_id, Submission.form_id, db.func.min(Submission.form_type)
+        ).filter(Submission.form_ref_id.is_(None)).group_by(Submission.client_id, Submission.form_id).all()
+        refs = [(client_id, form_id, form_ref(client_id, form_id, form_type)) for client_id, form_id, form_type in forms]
+        db.session.commit()
+
+        for client_id, form_id, ref in refs:
+            query = Submission.query.filter(Submission.client_id == client_id, Submission.form_ref_id.is_(None))
+            if form_id is None:
+                query = query.filter(Submission.form_id.is_(None))
+            else:
+                query = query.filter(Submission.form_id == form_id)
+            linked += query.update({'form_ref_id': ref}, synchronize_session=False)
+        db.session.commit()
+    return linked
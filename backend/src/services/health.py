@@ -0,0 +1,111 @@
+from flask import current_app
+from services.cache import CACHES, TTLCache
+from services.sharding import shard_names, engine_for, bind_key
+from services.passwords import get_hasher
+import os
+import time
+
+STARTED = time.time()
+
+# Load balancers probe every few seconds per worker; one probe result is shared for HEALTH_CACHE_SECONDS
+_reports = TTLCache('health', ttl=2, max_entries=1)
+
+def liveness():
+    """The process is up and serving requests; never touches the database"""
+    return {
+        'status': 'alive',
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - STARTED, 1),
+        'boot': current_app.extensions.get('boot'),
+    }
+
+def pool_stats(engine):
+    """Checked-out connections against what the pool allows, or None for pools without a limit"""
+    pool = engine.pool
+    if not hasattr(pool, 'checkedout') or not hasattr(pool, 'size'):
+        return None
+    # QueuePool has no public accessor for max_overflow; -1 means unlimited
+    max_overflow = getattr(pool, '_max_overflow', 0)
+    if max_overflow < 0:
+        return None
+    capacity = pool.size() + max_overflow
+    checked_out = pool.checkedout()
+    return {
+        'checked_out': checked_out,
+        'capacity': capacity,
+        'saturation': round(checked_out / capacity, 3) if capacity else 0.0,
+    }
+
+def probe_engine(engine, max_rtt_ms, max_saturation):
+    """Round trip of SELECT 1 plus pool usage; skips the query when the pool is already saturated"""
+    pool = pool_stats(engine)
+    check = {'pool': pool}
+    if pool is not None and pool['saturation'] >= max_saturation:
+        # Checking out a connection now would block for the pool timeout
+        check.update(ok=False, reason='pool_saturated')
+        return check
+
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql('SELECT 1')
+    except Exception as e:
+        check.update(ok=False, reason='unreachable', error=str(e))
+        return check
+    rtt_ms = (time.perf_counter() - started) * 1000
+    check['rtt_ms'] = round(rtt_ms, 2)
+    check['ok'] = rtt_ms <= max_rtt_ms
+    if not check['ok']:
+        check['reason'] = 'slow'
+    return check
+
+def queue_check(pending, capacity, max_saturation):
+    saturation = pending / capacity if capacity else 0.0
+    return {
+        'pending': pending,
+        'capacity': capacity,
+        'saturation': round(saturation, 3),
+        'ok': saturation < max_saturation,
+    }
+
+def readiness():
+    """(report, ready) for the database, replica, queue and cache checks; thresholds come from HEALTH_*"""
+    report = _reports.get('readiness')
+    if report is not None:
+        return report, report['status'] == 'ready'
+
+    config = current_app.config
+    max_rtt_ms = config['HEALTH_DB_RTT_MS']
+    max_pool = config['HEALTH_POOL_SATURATION']
+    max_queue = config['HEALTH_QUEUE_SATURATION']
+
+    databases = {shard: probe_engine(engine_for(shard), max_rtt_ms, max_pool) for shard in shard_names()}
+    replica_engines = current_app.extensions.get('read_replicas', {})
+    replicas = {
+        shard: probe_engine(replica_engines[bind_key(shard)], max_rtt_ms, max_pool)
+        for shard in shard_names() if bind_key(shard) in replica_engines
+    }
+
+    queues = {}
+    ingestor = current_app.extensions.get('async_ingestor')
+    if ingestor is not None:
+        queues['async_ingest'] = queue_check(ingestor.pending, ingestor.queue_limit, max_queue)
+    hasher = get_hasher()
+    queues['password_hashing'] = queue_check(hasher.pending, hasher.capacity, max_queue)
+
+    failing = [f'database:{name}' for name, check in databases.items() if not check['ok']]
+    failing += [f'replica:{name}' for name, check in replicas.items() if not check['ok']]
+    failing += [f'queue:{name}' for name, check in queues.items() if not check['ok']]
+
+    report = {
+        'status': 'unavailable' if failing else 'ready',
+        'failing': failing,
+        'databases': databases,
+        'replicas': replicas,
+        'queues': queues,
+        # Reported for dashboards only; a cold cache is slower but still serves correctly
+        'caches': {name: cache.stats() for name, cache in sorted(CACHES.items()) if name != 'health'},
+        'checked_at': round(time.time(), 3),
+    }
+    _reports.set('readiness', report, ttl=config['HEALTH_CACHE_SECONDS'])
+    return report, not failing
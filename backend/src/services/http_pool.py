@@ -0,0 +1,142 @@
+from http.client import HTTPConnection, HTTPSConnection, HTTPException, RemoteDisconnected
+from urllib.parse import urlsplit
+import ipaddress
+import socket
+import threading
+
+# A kept-alive connection the server has since closed fails on first use with one of these
+STALE_ERRORS = (RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+class BlockedAddress(ValueError):
+    """The URL's host resolves to a loopback, private, link-local or otherwise non-public address"""
+
+def is_public_ip(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+def public_addresses(host, port):
+    """getaddrinfo results for host, raising BlockedAddress if any of them is not a public address
+
+    Resolution failures are left as socket.gaierror (an OSError), since they are usually temporary.
+    """
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    if not infos or not all(is_public_ip(info[4][0]) for info in infos):
+        raise BlockedAddress(f'{host} does not resolve to a public address')
+    return infos
+
+def _public_create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """socket.create_connection that only connects to the addresses it has just checked, so a DNS
+    answer that changes between the check and the connect can't reach an internal host"""
+    host, port = address
+    error = None
+    for family, type_, proto, _, sockaddr in public_addresses(host, port):
+        sock = socket.socket(family, type_, proto)
+        try:
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as e:
+            sock.close()
+            error = e
+    raise error
+
+class HostPool:
+    """Idle keep-alive connections to one origin plus a semaphore capping requests in flight to it"""
+
+    def __init__(self, scheme, host, port, max_connections, timeout, allow_private):
+        self.connection_class = HTTPSConnection if scheme == 'https' else HTTPConnection
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def checkout(self):
+        """(connection, reused) — the most recently used idle connection, or a new one"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+        if not self.allow_private:
+            # Both HTTPConnection.connect and HTTPSConnection.connect open their socket through this hook
+            connection._create_connection = _public_create_connection
+        return connection, False
+
+    def checkin(self, connection):
+        with self._lock:
+            self._idle.append(connection)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+class ConnectionPool:
+    """Minimal pooled HTTP/1.1 client: connections are reused per origin and at most
+    `max_per_host` requests run against one origin at a time, so a slow CRM can't take every worker.
+    Unless `allow_private` is set, connections are only made to public addresses."""
+
+    def __init__(self, max_per_host=4, timeout=10, allow_private=False):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_pool(self, parts):
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        with self._lock:
+            pool = self._hosts.get(key)
+            if pool is None:
+                pool = self._hosts[key] = HostPool(scheme, parts.hostname, port, self.max_per_host, self.timeout,
+                                                   self.allow_private)
+        return pool
+
+    def request(self, method, url, body=None, headers=None):
+        """(status, response headers, response body); raises OSError/HTTPException when no response arrives
+        and BlockedAddress (a ValueError) for hosts that are not public"""
+        parts = urlsplit(url)
+        if parts.scheme.lower() not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f'Unsupported URL: {url}')
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+
+        pool = self._host_pool(parts)
+        with pool.slots:
+            while True:
+                connection, reused = pool.checkout()
+                try:
+                    connection.request(method, target, body=body, headers=headers or {})
+                    response = connection.getresponse()
+                    data = response.read()
+                except STALE_ERRORS:
+                    connection.close()
+                    if reused:
+                        # The server dropped the idle connection; the request never reached it
+                        continue
+                    raise
+                except (OSError, HTTPException):
+                    connection.close()
+                    raise
+                if response.will_close:
+                    connection.close()
+                else:
+                    pool.checkin(connection)
+                return response.status, dict(response.getheaders()), data
+
+    def close(self):
+        with self._lock:
+            hosts, self._hosts = list(self._hosts.values()), {}
+        for pool in hosts:
+            pool.close()
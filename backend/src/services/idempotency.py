@@ -0,0 +1,70 @@
+from flask import current_app
+from models.user import db, SubmissionKey
+from services.cache import TTLCache
+from services.sharding import each_shard
+from datetime import datetime, timedelta
+import hashlib
+import json
+import time
+
+# Keys that change between otherwise identical submits (e.g. a double click)
+VOLATILE_KEYS = frozenset(['_timestamp', '_idempotency_key'])
+
+MAX_KEY_LENGTH = 128
+
+# Hot keys stay in memory; the submission_keys table covers other workers and restarts
+recent_keys = TTLCache('idempotency_keys', ttl=600, max_entries=50000)
+
+def payload_digest(client_id, data):
+    payload = {k: v for k, v in data.items() if k not in VOLATILE_KEYS}
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f'{client_id}:{canonical}'.encode('utf-8')).hexdigest()
+
+def candidate_keys(client_id, data, header_key=None):
+    """Keys to check for a submission, the first being the one to store
+
+    An explicit Idempotency-Key header or _idempotency_key field wins. Otherwise
+    the key is the payload hash within a time window; the previous window is
+    checked too so a retry straddling a window boundary is still caught.
+    """
+    explicit = header_key or data.get('_idempotency_key')
+    if explicit:
+        return [f'k:{str(explicit)[:MAX_KEY_LENGTH - 2]}']
+
+    window = current_app.config['IDEMPOTENCY_WINDOW_SECONDS']
+    bucket = int(time.time() // window)
+    digest = payload_digest(client_id, data)
+    return [f'h:{bucket}:{digest}'[:MAX_KEY_LENGTH], f'h:{bucket - 1}:{digest}'[:MAX_KEY_LENGTH]]
+
+def find_duplicate(client_id, keys):
+    """Submission id already stored for any of the keys, or None"""
+    for key in keys:
+        submission_id = recent_keys.get((client_id, key))
+        if submission_id is not None:
+            return submission_id
+
+    row = SubmissionKey.query.filter(
+        SubmissionKey.client_id == client_id,
+        SubmissionKey.idempotency_key.in_(keys)
+    ).first()
+    if row:
+        recent_keys.set((client_id, row.idempotency_key), row.submission_id)
+        return row.submission_id
+    return None
+
+def record_key(client_id, key, submission):
+    """Store the key in the same transaction as the submission (flushes to get its id)"""
+    db.session.flush()
+    db.session.add(SubmissionKey(client_id=client_id, idempotency_key=key, submission_id=submission.id))
+
+def remember_key(client_id, key, submission_id):
+    recent_keys.set((client_id, key), submission_id)
+
+def prune_keys(max_age_seconds):
+    """Delete stored keys older than the retention period"""
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    deleted = 0
+    for _ in each_shard():
+        deleted += SubmissionKey.query.filter(SubmissionKey.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+    return deleted
@@ -0,0 +1,170 @@
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from services.cache import CACHES
+from services.spam_filter import rejections
+from services.compression import compression_totals
+import bisect
+import logging
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+slow_query_log = logging.getLogger('leadlift.slow_query')
+query_count_log = logging.getLogger('leadlift.query_count')
+
+class Histogram:
+    """Prometheus-style cumulative histogram per label set"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            base = _labels(label_names, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{base}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base.rstrip(",")}}} {total}')
+            lines.append(f'{self.name}_count{{{base.rstrip(",")}}} {count}')
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values):
+    return ''.join(f'{name}="{_escape(value)}",' for name, value in zip(names, values))
+
+def _metric(name, metric_type, help_text, samples):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        lines.append(f'{name}{{{labels.rstrip(",")}}} {value}' if labels else f'{name} {value}')
+    return lines
+
+# Per worker process, like the caches; Prometheus sums across workers
+_lock = threading.Lock()
+request_latency = Histogram('leadlift_http_request_duration_seconds', 'Request latency by endpoint', LATENCY_BUCKETS)
+request_queries = Histogram('leadlift_http_request_db_queries', 'Database queries per request by endpoint',
+                            QUERY_COUNT_BUCKETS)
+request_db_seconds = {}
+db_totals = {'queries': 0, 'seconds': 0.0, 'slow': 0}
+
+_settings = {'slow_query_seconds': 0.2, 'request_query_warning': 50}
+
+def truncate_params(parameters, limit=500):
+    text = repr(parameters)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    with _lock:
+        db_totals['queries'] += 1
+        db_totals['seconds'] += elapsed
+        if elapsed >= _settings['slow_query_seconds']:
+            db_totals['slow'] += 1
+    if has_app_context():
+        g._query_count = g.get('_query_count', 0) + 1
+        g._query_seconds = g.get('_query_seconds', 0.0) + elapsed
+
+    if elapsed >= _settings['slow_query_seconds']:
+        slow_query_log.warning('Slow query (%.1f ms): %s | params: %s',
+                               elapsed * 1000, statement, truncate_params(parameters))
+
+def observe_request(endpoint, method, status, duration, queries, db_seconds):
+    """Record one finished request; also used by the ASGI capture path"""
+    with _lock:
+        request_latency.observe((endpoint, method, str(status)), duration)
+        request_queries.observe((endpoint,), queries)
+        request_db_seconds[endpoint] = request_db_seconds.get(endpoint, 0.0) + db_seconds
+    if queries >= _settings['request_query_warning']:
+        query_count_log.warning('%s %s ran %d queries (%.1f ms in the database)',
+                                method, endpoint, queries, db_seconds * 1000)
+
+def start_request_timer():
+    g._request_started = time.perf_counter()
+    g._query_count = 0
+    g._query_seconds = 0.0
+
+def record_request(response):
+    started = g.get('_request_started')
+    if started is not None:
+        observe_request(request.endpoint or 'unmatched', request.method, response.status_code,
+                        time.perf_counter() - started, g.get('_query_count', 0), g.get('_query_seconds', 0.0))
+    return response
+
+def init_metrics(app):
+    """Time every request and count its queries; thresholds come from SLOW_QUERY_MS / REQUEST_QUERY_WARNING"""
+    _settings['slow_query_seconds'] = app.config['SLOW_QUERY_MS'] / 1000.0
+    _settings['request_query_warning'] = app.config['REQUEST_QUERY_WARNING']
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        lines = request_latency.render(('endpoint', 'method', 'status'))
+        lines += request_queries.render(('endpoint',))
+        lines += _metric('leadlift_http_request_db_seconds_total', 'counter', 'Time spent in database queries by endpoint',
+                         [(_labels(('endpoint',), (endpoint,)), seconds)
+                          for endpoint, seconds in sorted(request_db_seconds.items())])
+        lines += _metric('leadlift_db_queries_total', 'counter', 'Database queries executed', [('', db_totals['queries'])])
+        lines += _metric('leadlift_db_query_seconds_total', 'counter', 'Time spent in database queries',
+                         [('', db_totals['seconds'])])
+        lines += _metric('leadlift_db_slow_queries_total', 'counter', 'Queries slower than SLOW_QUERY_MS',
+                         [('', db_totals['slow'])])
+
+    caches = sorted(CACHES.items())
+    lines += _metric('leadlift_cache_hits_total', 'counter', 'Cache hits',
+                     [(_labels(('cache',), (name,)), cache.hits) for name, cache in caches])
+    lines += _metric('leadlift_cache_misses_total', 'counter', 'Cache misses',
+                     [(_labels(('cache',), (name,)), cache.misses) for name, cache in caches])
+    lines += _metric('leadlift_cache_entries', 'gauge', 'Entries currently cached',
+                     [(_labels(('cache',), (name,)), cache.stats()['entries']) for name, cache in caches])
+    lines += _metric('leadlift_submissions_rejected_total', 'counter', 'Captures rejected by the spam filter',
+                     [(_labels(('reason',), (reason,)), count) for reason, count in sorted(rejections.items())])
+
+    compression = sorted(compression_totals.items())
+    lines += _metric('leadlift_response_compression_total', 'counter', 'Responses compressed by encoding',
+                     [(_labels(('encoding',), (encoding,)), totals[0]) for encoding, totals in compression])
+    lines += _metric('leadlift_response_compression_bytes_in_total', 'counter', 'Response bytes before compression',
+                     [(_labels(('encoding',), (encoding,)), totals[1]) for encoding, totals in compression])
+    lines += _metric('leadlift_response_compression_bytes_out_total', 'counter', 'Response bytes after compression',
+                     [(_labels(('encoding',), (encoding,)), totals[2]) for encoding, totals in compression])
+    lines += _metric('leadlift_response_compression_cpu_seconds_total', 'counter', 'Thread CPU time spent compressing',
+                     [(_labels(('encoding',), (encoding,)), totals[3]) for encoding, totals in compression])
+
+    boot = current_app.extensions.get('boot') or {}
+    lines += _metric('leadlift_boot_seconds', 'gauge', 'Worker start-up time by phase',
+                     [(_labels(('phase',), (phase.replace('_seconds', ''),)), seconds)
+                      for phase, seconds in sorted(boot.items())])
+
+    ingestor = current_app.extensions.get('async_ingestor')
+    if ingestor is not None:
+        lines += _metric('leadlift_async_ingest_pending', 'gauge', 'Captures waiting for a database worker',
+                         [('', ingestor.pending)])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,86 @@
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import threading
+
+class HashingBusy(Exception):
+    """Raised when too many password hashes are already queued; callers should answer 503"""
+
+class PasswordHasher:
+    """Runs password KDFs on a bounded worker pool
+
+    hashlib's scrypt/pbkdf2 release the GIL, so a few workers use all cores while
+    the queue limit stops a login burst from tying up every request thread.
+    """
+
+    def __init__(self, method, workers, queue_limit, timeout):
+        self.method = method
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.capacity = workers + queue_limit
+        self.pending = 0
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._pending_lock = threading.Lock()
+        # Werkzeug stores fully expanded parameters (e.g. 'scrypt:32768:8:1'), so expand ours once
+        self.method_prefix = generate_password_hash('', method).split('$', 1)[0]
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy('Too many concurrent password operations')
+        self._track(1)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued behind slow hashes: drop it; one already running finishes and frees its slot
+            future.cancel()
+            raise HashingBusy('Password operation timed out')
+
+    def _track(self, delta):
+        with self._pending_lock:
+            self.pending += delta
+
+    def _release(self):
+        self._track(-1)
+        self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash was made with different parameters than configured"""
+        return password_hash.split('$', 1)[0] != self.method_prefix
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+def get_hasher():
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                config = current_app.config
+                _hasher = PasswordHasher(
+                    config['PASSWORD_HASH_METHOD'],
+                    config['PASSWORD_HASH_WORKERS'],
+                    config['PASSWORD_HASH_QUEUE'],
+                    config['PASSWORD_HASH_TIMEOUT']
+                )
+    return _hasher
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+def verify_password(password_hash, password):
+    return get_hasher().verify(password_hash, password)
+
+def needs_rehash(password_hash):
+    return get_hasher().needs_rehash(password_hash)
@@ -0,0 +1,87 @@
+from flask import g, session
+from sqlalchemy import event
+from models.user import db, User, ROLE_PERMISSIONS
+from services.cache import TTLCache
+from services.tokens import ACCESS, get_bearer_token, verify_token
+import os
+
+# Authenticated users are cached per process for a short time, and per request in flask.g.
+# Local changes invalidate immediately; the TTL bounds staleness across worker processes.
+principal_cache = TTLCache('principals', ttl=int(os.getenv('AUTH_CACHE_TTL', 30)), max_entries=4096)
+
+class Principal:
+    """Read-only snapshot of an authenticated user and its compiled permissions"""
+
+    __slots__ = ('id', 'username', 'role', 'is_active', 'permissions', 'user_data')
+
+    def __init__(self, id, username, role, is_active, user_data=None):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.is_active = is_active
+        self.permissions = ROLE_PERMISSIONS.get(role, frozenset())
+        self.user_data = user_data  # User.to_dict() at load time; None for token principals
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.role, bool(user.is_active), user.to_dict())
+
+    def has_permission(self, permission):
+        return permission in self.permissions
+
+def load_principal(user_id):
+    """Principal for a user id, from the request, then the process cache, then the database"""
+    cached = getattr(g, '_principals', None)
+    if cached is None:
+        cached = g._principals = {}
+    if user_id in cached:
+        return cached[user_id]
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = db.session.get(User, user_id)
+        principal = Principal.from_user(user) if user else None
+        if principal:
+            principal_cache.set(user_id, principal)
+
+    cached[user_id] = principal
+    return principal
+
+def get_current_principal():
+    """Principal for the bearer token or the logged-in session user, or None
+
+    Bearer tokens are verified in-process from their signed claims without
+    touching the database; sessions go through load_principal.
+    """
+    if '_current_principal' in g:
+        return g._current_principal
+
+    token = get_bearer_token()
+    if token:
+        claims = verify_token(token, ACCESS)
+        principal = Principal(claims['uid'], claims['usr'], claims['role'], claims['act']) if claims else None
+    elif 'user_id' in session:
+        principal = load_principal(session['user_id'])
+    else:
+        principal = None
+
+    g._current_principal = principal
+    return principal
+
+def invalidate_principal(user_id):
+    principal_cache.delete(user_id)
+    try:
+        cached = getattr(g, '_principals', None)
+        current = g.get('_current_principal')
+    except RuntimeError:  # Outside an app context (scripts, CLI)
+        cached = current = None
+    if cached:
+        cached.pop(user_id, None)
+    if current is not None and current.id == user_id:
+        g.pop('_current_principal')
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_change(mapper, connection, target):
+    """Role, is_active or profile changes must never be served from a stale cache"""
+    invalidate_principal(target.id)
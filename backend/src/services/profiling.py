@@ -0,0 +1,171 @@
+from flask import current_app, g, request
+from services.principal import get_current_principal
+from datetime import datetime
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_KINDS = {
+    'prof': 'cProfile stats (pstats, snakeviz, gprof2dot)',
+    'collapsed': 'Sampled stacks in collapsed format (flamegraph.pl, speedscope)',
+    'memory': 'Top allocations by line from tracemalloc',
+}
+PROFILE_NAME = re.compile(r'^[\w.-]+$')
+
+# cProfile and tracemalloc are process-wide, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+def get_profile_dir(app):
+    return app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+
+def get_settings(app):
+    return app.extensions.setdefault('profiling', {
+        'sample_rate': app.config['PROFILE_SAMPLE_RATE'],
+        'endpoints': set(app.config['PROFILE_ENDPOINTS']),
+    })
+
+def should_profile():
+    """Admins ask with the X-Profile header; otherwise a configured fraction of requests is sampled"""
+    if request.headers.get(PROFILE_HEADER):
+        principal = get_current_principal()
+        return principal is not None and principal.is_active and principal.has_permission('manage_settings')
+
+    settings = get_settings(current_app)
+    if not settings['sample_rate']:
+        return False
+    if settings['endpoints'] and request.endpoint not in settings['endpoints']:
+        return False
+    return random.random() < settings['sample_rate']
+
+def start_profile():
+    """before_request hook; costs one header lookup per request while sampling is off"""
+    if not should_profile() or not _profile_lock.acquire(blocking=False):
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(current_app.config['PROFILE_TRACEMALLOC_FRAMES'])
+    else:
+        tracemalloc.reset_peak()
+
+    sampler = StackSampler(threading.get_ident(), current_app.config['PROFILE_SAMPLE_INTERVAL_MS'] / 1000.0)
+    profiler = cProfile.Profile()
+    g._profile = {
+        'profiler': profiler,
+        'sampler': sampler,
+        'started_tracing': started_tracing,
+        'started': time.perf_counter(),
+        'memory_before': tracemalloc.take_snapshot(),
+    }
+    sampler.start()
+    profiler.enable()
+
+def finish_profile(response):
+    """after_request hook: stop profiling and write the profile files"""
+    state = g.pop('_profile', None)
+    if state is None:
+        return response
+
+    try:
+        state['profiler'].disable()
+        state['sampler'].stop()
+        duration = time.perf_counter() - state['started']
+        memory_after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if state['started_tracing']:
+            tracemalloc.stop()
+
+        profile_id = '{}-{}-{}'.format(
+            datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'),
+            re.sub(r'[^\w.-]', '_', request.endpoint or 'unmatched'),
+            response.status_code
+        )
+        write_profile(current_app, profile_id, state, memory_after, duration, peak)
+        response.headers['X-Profile-Id'] = profile_id
+    finally:
+        _profile_lock.release()
+    return response
+
+def write_profile(app, profile_id, state, memory_after, duration, peak):
+    profile_dir = get_profile_dir(app)
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, profile_id)
+
+    state['profiler'].dump_stats(base + '.prof')
+
+    with open(base + '.collapsed', 'w') as f:
+        for stack, count in sorted(state['sampler'].counts.items()):
+            f.write(f'{stack} {count}\n')
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    stats = memory_after.filter_traces(ignore).compare_to(state['memory_before'].filter_traces(ignore), 'lineno')
+    with open(base + '.memory', 'w') as f:
+        f.write(f'# {request.method} {request.full_path} took {duration * 1000:.1f} ms, '
+                f'traced memory peak {peak / 1024:.1f} KiB\n')
+        for stat in stats[:app.config['PROFILE_TOP_ALLOCATIONS']]:
+            f.write(f'{stat}\n')
+
+    prune_profiles(profile_dir, app.config['PROFILE_MAX_KEPT'])
+
+def prune_profiles(profile_dir, keep):
+    """Delete the oldest profiles beyond the most recent `keep`"""
+    profile_ids = list_profiles(profile_dir)
+    for profile_id in profile_ids[keep:]:
+        for kind in PROFILE_KINDS:
+            path = os.path.join(profile_dir, f'{profile_id}.{kind}')
+            if os.path.exists(path):
+                os.remove(path)
+
+def list_profiles(profile_dir):
+    """Profile ids, newest first"""
+    if not os.path.isdir(profile_dir):
+        return []
+    return sorted({name.rsplit('.', 1)[0] for name in os.listdir(profile_dir) if name.endswith('.prof')}, reverse=True)
+
+def abandon_profile(exc):
+    """teardown_request hook: release the profiler if the request failed before after_request ran"""
+    state = g.pop('_profile', None)
+    if state is None:
+        return
+    state['profiler'].disable()
+    state['sampler'].stop()
+    if state['started_tracing']:
+        tracemalloc.stop()
+    _profile_lock.release()
+
+def init_profiling(app):
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(abandon_profile)
@@ -0,0 +1,84 @@
+from flask import current_app, request, session
+from models.user import db
+from services.cache import TTLCache
+from services.principal import get_current_principal
+from services.sharding import DEFAULT_SHARD, bind_key
+from sqlalchemy import create_engine
+import time
+
+# READ_REPLICAS value that opens each SQLite database read-only next to its writer (WAL mode)
+AUTO = 'auto'
+SQLITE_READONLY = 'sqlite-readonly'
+
+# Principal ids that wrote within the lag window. Bearer clients carry no session cookie, so this is
+# what pins them to the primary; it is per process, which the session cookie covers for browsers.
+recent_writers = TTLCache('recent_writers', max_entries=10000)
+
+def parse_replicas(value):
+    """{shard: url} from 'default=postgresql://replica/...,eu1=...', or every bind when value is 'auto'"""
+    value = value.strip()
+    if value == AUTO:
+        return AUTO
+    replicas = {}
+    for entry in value.split(','):
+        if not entry.strip():
+            continue
+        shard, _, url = entry.partition('=')
+        if not shard.strip() or not url:
+            raise ValueError(f'Invalid replica entry: {entry!r}')
+        replicas[shard.strip()] = url.strip()
+    return replicas
+
+def _sqlite_readonly_engine(engine):
+    # WAL lets the read-only connection see committed data while the writer keeps going
+    with engine.connect() as connection:
+        connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+    return create_engine(f'sqlite:///file:{engine.url.database}?mode=ro&uri=true')
+
+def init_read_replicas(app):
+    """Create replica engines for READ_REPLICAS; call inside an app context after init_sharding"""
+    config = app.config.get('READ_REPLICAS') or {}
+    replicas = {}
+    if config == AUTO:
+        config = {DEFAULT_SHARD: SQLITE_READONLY}
+        config.update({name: SQLITE_READONLY for name in app.config.get('SUBMISSION_SHARDS') or {}})
+
+    for shard, url in config.items():
+        key = bind_key(shard)
+        if key not in db.engines:
+            raise ValueError(f'Replica configured for unknown shard: {shard}')
+        if url == SQLITE_READONLY:
+            if db.engines[key].dialect.name != 'sqlite':
+                continue
+            replicas[key] = _sqlite_readonly_engine(db.engines[key])
+        else:
+            replicas[key] = create_engine(url, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.extensions['read_replicas'] = replicas
+
+def get_replica(key):
+    """Replica engine for a bind key, or None to use the primary"""
+    return current_app.extensions.get('read_replicas', {}).get(key)
+
+def recently_wrote():
+    """Whether this browser session or authenticated principal wrote within the replica lag window"""
+    last_write = session.get('last_write_at')
+    if last_write is not None and time.time() - last_write < current_app.config['REPLICA_READ_AFTER_WRITE_SECONDS']:
+        return True
+    principal = get_current_principal()
+    return principal is not None and recent_writers.get(principal.id) is not None
+
+def route_reads_to_replica():
+    """before_request hook: GETs go to the replica unless the user just wrote something"""
+    if request.method in ('GET', 'HEAD') and not recently_wrote():
+        db.session.info['read_replica'] = True
+
+def remember_write(response):
+    """after_request hook: pin the user's reads to the primary for a while after a successful write"""
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or response.status_code >= 400:
+        return response
+    if session.get('user_id'):
+        session['last_write_at'] = time.time()
+    principal = get_current_principal()
+    if principal is not None:
+        recent_writers.set(principal.id, True, ttl=current_app.config['REPLICA_READ_AFTER_WRITE_SECONDS'])
+    return response
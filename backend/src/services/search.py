@@ -0,0 +1,128 @@
+from models.user import db, Submission
+from sqlalchemy import text
+import re
+
+# Submission columns covered by the search index
+SEARCH_COLUMNS = ['name', 'email', 'phone', 'page_title', 'form_url', 'additional_data']
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def tokenize_query(query):
+    """Split a free-text query into search terms, ignoring operators and punctuation"""
+    return [token.lower() for token in TOKEN_PATTERN.findall(query or '')][:10]
+
+class SqliteSearchBackend:
+    """FTS5 index using submissions as external content, kept in sync by triggers"""
+
+    def ensure_index(self, connection):
+        exists = connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'submissions_fts'"
+        )).first()
+
+        columns = ', '.join(SEARCH_COLUMNS)
+        new_values = ', '.join(f'new.{c}' for c in SEARCH_COLUMNS)
+        old_values = ', '.join(f'old.{c}' for c in SEARCH_COLUMNS)
+
+        connection.execute(text(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS submissions_fts USING fts5(
+                client_id, {columns},
+                content='submissions', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS submissions_fts_insert AFTER INSERT ON submissions BEGIN
+                INSERT INTO submissions_fts(rowid, client_id, {columns})
+                VALUES (new.id, new.client_id, {new_values});
+            END
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS submissions_fts_delete AFTER DELETE ON submissions BEGIN
+                INSERT INTO submissions_fts(submissions_fts, rowid, client_id, {columns})
+                VALUES ('delete', old.id, old.client_id, {old_values});
+            END
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS submissions_fts_update AFTER UPDATE ON submissions BEGIN
+                INSERT INTO submissions_fts(submissions_fts, rowid, client_id, {columns})
+                VALUES ('delete', old.id, old.client_id, {old_values});
+                INSERT INTO submissions_fts(rowid, client_id, {columns})
+                VALUES (new.id, new.client_id, {new_values});
+            END
+        """))
+
+        # Index rows that were stored before the search index existed
+        if not exists:
+            connection.execute(text("INSERT INTO submissions_fts(submissions_fts) VALUES ('rebuild')"))
+
+    def search(self, client_id, terms, limit, offset, sort):
+        # Every term is a quoted prefix query; the client_id column scopes the match
+        match = 'client_id:"{}" AND {{{}}}: ({})'.format(
+            client_id.replace('"', ''),
+            ' '.join(SEARCH_COLUMNS),
+            ' AND '.join(f'"{term}"*' for term in terms)
+        )
+        order = 'rank' if sort == 'relevance' else 'rowid DESC'
+        rows = db.session.execute(text(f"""
+            SELECT rowid FROM submissions_fts
+            WHERE submissions_fts MATCH :match
+            ORDER BY {order}
+            LIMIT :limit OFFSET :offset
+        """), {'match': match, 'limit': limit, 'offset': offset}, bind_arguments={'mapper': Submission})
+        return [row[0] for row in rows]
+
+class PostgresSearchBackend:
+    """tsvector expression index over the same columns, maintained by Postgres itself"""
+
+    DOCUMENT = "to_tsvector('simple', {})".format(
+        " || ' ' || ".join(f"coalesce({c}, '')" for c in SEARCH_COLUMNS)
+    )
+
+    def ensure_index(self, connection):
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_submissions_search ON submissions USING GIN ({self.DOCUMENT})"
+        ))
+
+    def search(self, client_id, terms, limit, offset, sort):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        order = f"ts_rank({self.DOCUMENT}, to_tsquery('simple', :query)) DESC" if sort == 'relevance' else 'id DESC'
+        rows = db.session.execute(text(f"""
+            SELECT id FROM submissions
+            WHERE client_id = :client_id AND {self.DOCUMENT} @@ to_tsquery('simple', :query)
+            ORDER BY {order}
+            LIMIT :limit OFFSET :offset
+        """), {'client_id': client_id, 'query': query, 'limit': limit, 'offset': offset},
+            bind_arguments={'mapper': Submission})
+        return [row[0] for row in rows]
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend
+}
+
+_backend = None
+
+def get_backend():
+    """Search backend for the configured database dialect"""
+    global _backend
+    if _backend is None:
+        backend_class = BACKENDS.get(db.engine.dialect.name)
+        if backend_class is None:
+            raise RuntimeError(f'Full-text search is not supported on {db.engine.dialect.name}')
+        _backend = backend_class()
+    return _backend
+
+def init_search_index(engine=None):
+    """Create the search index and its sync hooks if they don't exist yet"""
+    engine = engine or db.engine
+    if engine.dialect.name not in BACKENDS:
+        return
+    with engine.begin() as connection:
+        get_backend().ensure_index(connection)
+
+def search_submission_ids(client_id, query, limit=25, offset=0, sort='recent'):
+    """Return matching submission ids for a client, newest or most relevant first"""
+    terms = tokenize_query(query)
+    if not terms:
+        return []
+    return get_backend().search(client_id, terms, limit, offset, sort)
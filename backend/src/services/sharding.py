@@ -0,0 +1,223 @@
+from flask import current_app, request
+from models.user import db, SHARDED_TABLES
+from services.search import init_search_index
+from contextlib import contextmanager
+import bisect
+import hashlib
+
+# The primary database is always a shard, so existing data stays put when shards are added
+DEFAULT_SHARD = 'default'
+VIRTUAL_NODES = 64
+
+def parse_shards(value):
+    """{name: url} from a SUBMISSION_SHARDS value like 'eu1=sqlite:///eu1.db,eu2=postgresql://...'"""
+    shards = {}
+    for entry in value.split(','):
+        if not entry.strip():
+            continue
+        name, _, url = entry.partition('=')
+        name = name.strip()
+        if not name or not url or name == DEFAULT_SHARD:
+            raise ValueError(f'Invalid shard entry: {entry!r}')
+        shards[name] = url.strip()
+    return shards
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+class HashRing:
+    """Consistent hash ring; adding a shard only moves the clients that land on its points"""
+
+    def __init__(self, shards, virtual_nodes=VIRTUAL_NODES):
+        self.shards = sorted(shards)
+        points = sorted((_hash(f'{shard}#{i}'), shard) for shard in self.shards for i in range(virtual_nodes))
+        self._points = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, key):
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+def get_ring():
+    return current_app.extensions['shard_ring']
+
+def shard_names():
+    return get_ring().shards
+
+def shard_for(client_id):
+    return get_ring().shard_for(client_id)
+
+def bind_key(shard):
+    return None if shard == DEFAULT_SHARD else shard
+
+def engine_for(shard):
+    return db.engines[bind_key(shard)]
+
+def _switch(session, key):
+    # Ids are only unique per shard, so rows from the previous shard must leave the identity map
+    if session.info.get('shard') != key:
+        session.flush()
+        for instance in [obj for obj in session if obj.__table__.name in SHARDED_TABLES]:
+            session.expunge(instance)
+    session.info['shard'] = key
+
+@contextmanager
+def use_shard(shard):
+    """Route sharded tables to one shard for the duration of the block"""
+    session = db.session
+    previous = session.info.get('shard')
+    _switch(session, bind_key(shard))
+    try:
+        yield shard
+    except Exception:
+        session.info['shard'] = previous
+        raise
+    _switch(session, previous)
+
+def each_shard():
+    """Run the loop body once per shard, for admin-wide work across all clients"""
+    for shard in shard_names():
+        with use_shard(shard):
+            yield shard
+
+def fan_out(query):
+    """Rows of the same query run against every shard"""
+    rows = []
+    for _ in each_shard():
+        rows.extend(query.all())
+    return rows
+
+def pin_shard(client_id):
+    """Route the current session's sharded tables to the client's shard"""
+    db.session.info['shard'] = bind_key(shard_for(client_id))
+
+def pin_request_shard():
+    """Route the request's session to the shard of the client_id in its URL"""
+    client_id = (request.view_args or {}).get('client_id')
+    if client_id:
+        pin_shard(client_id)
+
+def init_sharding(app):
+    """Build the shard ring; call after db.init_app with SQLALCHEMY_BINDS holding the shard URLs"""
+    shards = app.config.get('SUBMISSION_SHARDS') or {}
+    app.extensions['shard_ring'] = HashRing([DEFAULT_SHARD] + list(shards))
+    if shards:
+        app.before_request(pin_request_shard)
+
+def create_shard_tables():
+    """Create the sharded tables and their search index on every extra shard"""
+    tables = [table for name, table in db.metadata.tables.items() if name in SHARDED_TABLES]
+    for shard in shard_names():
+        if shard == DEFAULT_SHARD:
+            continue
+        engine = engine_for(shard)
+        db.metadata.create_all(engine, tables=tables)
+        init_search_index(engine)
+
+def misplaced_clients():
+    """(client_id, current shard, ring shard) for clients with rows on the wrong shard"""
+    tables = db.metadata.tables
+    moves = []
+    for shard in shard_names():
+        with engine_for(shard).connect() as connection:
+            client_ids = set()
+            for name in ('submissions', 'submission_rollups', 'submission_keys', 'delivery_outbox'):
+                column = tables[name].c.client_id
+                client_ids.update(connection.execute(db.select(column).distinct()).scalars())
+        for client_id in sorted(client_ids):
+            target = shard_for(client_id)
+            if target != shard:
+                moves.append((client_id, shard, target))
+    return moves
+
+def move_client(client_id, source, target, batch_size=500):
+    """Copy a client's rows to the target shard in batches, deleting each batch from the source
+
+    Moved submissions get new ids on the target shard; their custom field values, idempotency
+    keys and webhook outbox rows are rewritten to match. Returns the number of submissions moved.
+    """
+    tables = db.metadata.tables
+    submissions = tables['submissions']
+    fields = tables['submission_fields']
+    keys = tables['submission_keys']
+    rollups = tables['submission_rollups']
+    outbox = tables['delivery_outbox']
+    source_engine = engine_for(source)
+    target_engine = engine_for(target)
+    moved = 0
+
+    while True:
+        with source_engine.connect() as connection:
+            rows = connection.execute(
+                db.select(submissions).where(submissions.c.client_id == client_id)
+                .order_by(submissions.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            ids = [row['id'] for row in rows]
+            field_rows = connection.execute(
+                db.select(fields).where(fields.c.submission_id.in_(ids))
+            ).mappings().all()
+            key_rows = connection.execute(
+                db.select(keys).where(keys.c.client_id == client_id, keys.c.submission_id.in_(ids))
+            ).mappings().all()
+            outbox_rows = connection.execute(
+                db.select(outbox).where(outbox.c.client_id == client_id, outbox.c.submission_id.in_(ids))
+            ).mappings().all()
+
+        with target_engine.begin() as connection:
+            new_ids = {}
+            for row in rows:
+                values = {k: v for k, v in row.items() if k != 'id'}
+                new_ids[row['id']] = connection.execute(db.insert(submissions).values(values)).inserted_primary_key[0]
+            if field_rows:
+                connection.execute(db.insert(fields), [
+                    dict({k: v for k, v in row.items() if k != 'id'}, submission_id=new_ids[row['submission_id']])
+                    for row in field_rows
+                ])
+            existing = set(connection.execute(
+                db.select(keys.c.idempotency_key).where(
+                    keys.c.client_id == client_id,
+                    keys.c.idempotency_key.in_([row['idempotency_key'] for row in key_rows])
+                )
+            ).scalars()) if key_rows else set()
+            key_values = [
+                dict({k: v for k, v in row.items() if k != 'id'}, submission_id=new_ids[row['submission_id']])
+                for row in key_rows if row['idempotency_key'] not in existing
+            ]
+            if key_values:
+                connection.execute(db.insert(keys), key_values)
+            if outbox_rows:
+                # A lease taken on the source shard means nothing on the target
+                connection.execute(db.insert(outbox), [
+                    dict({k: v for k, v in row.items() if k != 'id'},
+                         submission_id=new_ids[row['submission_id']], claim=None)
+                    for row in outbox_rows
+                ])
+
+        # Only delete from the source once the copy has committed
+        with source_engine.begin() as connection:
+            connection.execute(db.delete(keys).where(keys.c.client_id == client_id, keys.c.submission_id.in_(ids)))
+            connection.execute(db.delete(outbox).where(outbox.c.client_id == client_id, outbox.c.submission_id.in_(ids)))
+            connection.execute(db.delete(fields).where(fields.c.submission_id.in_(ids)))
+            connection.execute(db.delete(submissions).where(submissions.c.id.in_(ids)))
+        moved += len(ids)
+
+    # Rollups are additive, so rows can be copied as-is next to any the target already has
+    with source_engine.connect() as connection:
+        rollup_rows = connection.execute(
+            db.select(rollups).where(rollups.c.client_id == client_id)
+        ).mappings().all()
+    if rollup_rows:
+        with target_engine.begin() as connection:
+            connection.execute(db.insert(rollups), [{k: v for k, v in row.items() if k != 'id'} for row in rollup_rows])
+        with source_engine.begin() as connection:
+            connection.execute(db.delete(rollups).where(rollups.c.client_id == client_id))
+
+    # Keys and outbox rows whose submission was archived have nothing to point at on the target, and
+    # left behind their submission id could later be reused by another client's submission
+    with source_engine.begin() as connection:
+        connection.execute(db.delete(keys).where(keys.c.client_id == client_id))
+        connection.execute(db.delete(outbox).where(outbox.c.client_id == client_id))
+
+    return moved
@@ -0,0 +1,138 @@
+from flask import current_app, request
+from collections import Counter, OrderedDict
+import os
+import threading
+import time
+
+# Off-screen input the tracking script adds to every form; real visitors never fill it in, bots that
+# auto-complete every input do. Only our own name is matched, since real forms use names like website_url.
+HONEYPOT_FIELD = 'leadlift_hp'
+
+DISPOSABLE_EMAIL_DOMAINS = frozenset([
+    '10minutemail.com', 'guerrillamail.com', 'guerrillamail.net', 'sharklasers.com', 'mailinator.com',
+    'maildrop.cc', 'yopmail.com', 'yopmail.net', 'tempmail.com', 'temp-mail.org', 'trashmail.com',
+    'getnada.com', 'dispostable.com', 'throwawaymail.com', 'fakeinbox.com', 'mintemail.com',
+    'mohmal.com', 'emailondeck.com', 'spamgourmet.com', 'mailnesia.com', 'tempr.email', 'discard.email',
+])
+
+# Rejected traffic by reason since the worker started
+rejections = Counter()
+_rejections_lock = threading.Lock()
+
+def count_rejection(reason):
+    with _rejections_lock:
+        rejections[reason] += 1
+
+def load_disposable_domains(path):
+    """Extra disposable domains, one per line, merged with the built-in list"""
+    if not path or not os.path.exists(path):
+        return DISPOSABLE_EMAIL_DOMAINS
+    with open(path) as f:
+        extra = {line.strip().lower() for line in f if line.strip() and not line.startswith('#')}
+    return DISPOSABLE_EMAIL_DOMAINS | extra
+
+# Most buckets a single allow() call evicts, so no request pays for a sweep of the whole table
+PRUNE_STEP = 64
+
+class TokenBucketLimiter:
+    """In-memory token buckets keyed by IP or client id, least recently updated first"""
+
+    def __init__(self, rate_per_minute, burst, max_keys=100000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return allowed
+
+    def _prune(self, now):
+        """Evict from the oldest end: enough buckets to get back under max_keys, plus (up to PRUNE_STEP)
+        any that would be full again and so carry no state worth keeping"""
+        refill_time = self.burst / self.rate if self.rate else 0
+        for _ in range(PRUNE_STEP):
+            _, updated = next(iter(self._buckets.values()))
+            if len(self._buckets) <= self.max_keys and now - updated <= refill_time:
+                break
+            self._buckets.popitem(last=False)
+
+class SpamFilter:
+    """Cheap checks run before a submission touches the database"""
+
+    def __init__(self, config):
+        self.max_bytes = config['SPAM_MAX_SUBMISSION_BYTES']
+        self.max_batch_bytes = config['SPAM_MAX_BATCH_BYTES']
+        self.max_fields = config['SPAM_MAX_SUBMISSION_FIELDS']
+        self.max_value_length = config['SPAM_MAX_VALUE_LENGTH']
+        self.ip_limiter = TokenBucketLimiter(config['SPAM_RATE_PER_IP'], config['SPAM_BURST_PER_IP'])
+        self.client_limiter = TokenBucketLimiter(config['SPAM_RATE_PER_CLIENT'], config['SPAM_BURST_PER_CLIENT'])
+        self.disposable_domains = load_disposable_domains(config.get('DISPOSABLE_EMAIL_DOMAINS_FILE'))
+        self.trusted_proxy_hops = config['TRUSTED_PROXY_HOPS']
+
+    def client_ip(self, forwarded_for, remote_addr):
+        """Visitor address for the per-IP limit
+        
+        Only the X-Forwarded-For entries appended by our own proxies can be trusted (the client writes
+        the rest), so this is the entry TRUSTED_PROXY_HOPS from the right, or the peer address.
+        """
+        hops = self.trusted_proxy_hops
+        if hops and forwarded_for:
+            entries = [entry.strip() for entry in forwarded_for.split(',') if entry.strip()]
+            if len(entries) >= hops:
+                return entries[-hops]
+        return remote_addr
+
+    def check_request(self, client_id, max_bytes=None):
+        """Checks that need only headers; returns (reason, status) or None"""
+        ip = self.client_ip(request.headers.get('X-Forwarded-For'), request.remote_addr)
+        return self.check_limits(client_id, ip, request.content_length, max_bytes)
+
+    def check_limits(self, client_id, ip, content_length, max_bytes=None):
+        """Size and rate checks on already-extracted request details, for callers outside Flask"""
+        if content_length is not None and content_length > (max_bytes or self.max_bytes):
+            return 'payload_too_large', 413
+
+        if not self.ip_limiter.allow(ip):
+            return 'rate_limited_ip', 429
+        if not self.client_limiter.allow(client_id):
+            return 'rate_limited_client', 429
+        return None
+
+    def check_payload(self, data):
+        """Checks on the decoded body; returns (reason, status) or None"""
+        if not isinstance(data, dict):
+            return 'invalid_payload', 400
+        if len(data) > self.max_fields:
+            return 'too_many_fields', 413
+
+        for key, value in data.items():
+            if isinstance(value, str) and len(value) > self.max_value_length:
+                return 'value_too_long', 413
+            if key == HONEYPOT_FIELD and value:
+                return 'honeypot', 200
+
+        email = data.get('email') or data.get('Email') or data.get('EMAIL')
+        if isinstance(email, str) and '@' in email:
+            if email.rsplit('@', 1)[1].strip().lower() in self.disposable_domains:
+                return 'disposable_email', 200
+        return None
+
+_filter = None
+
+def get_spam_filter():
+    global _filter
+    if _filter is None:
+        _filter = SpamFilter(current_app.config)
+    return _filter
@@ -0,0 +1,180 @@
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags
+from services.metrics import observe_request
+import gzip
+import mimetypes
+import os
+import re
+import time
+
+# Vite writes fingerprinted bundles as assets/<name>-<hash>.<ext>; their content never changes
+FINGERPRINTED = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Preferred first; a file.br / file.gz next to the original is served when the client accepts it
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+COMPRESSIBLE = re.compile(r'^(text/|application/(javascript|json|xml|manifest\+json|wasm)|image/svg\+xml)')
+
+class StaticAsset:
+    """One file of the bundled dashboard with its headers worked out up front"""
+
+    def __init__(self, path, relative, gzip_min_bytes):
+        stat = os.stat(path)
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.mimetype.startswith('text/') or self.mimetype == 'application/javascript':
+            self.mimetype += '; charset=utf-8'
+        self.mtime = int(stat.st_mtime)
+        self.last_modified = http_date(self.mtime)
+        self.etag = f'{stat.st_size:x}-{self.mtime:x}'
+        self.cache_control = IMMUTABLE if FINGERPRINTED.match(relative) else REVALIDATE
+        self.compressible = bool(COMPRESSIBLE.match(self.mimetype))
+        self.variants = {encoding: path + suffix for encoding, suffix in ENCODINGS if os.path.exists(path + suffix)}
+        # Encodings this asset can be sent in, best first; gzip is made in memory when no file exists
+        self.encodings = [encoding for encoding, _ in ENCODINGS if encoding in self.variants]
+        if 'gzip' not in self.encodings and self.compressible and stat.st_size >= gzip_min_bytes:
+            self.encodings.append('gzip')
+        self._bodies = {}
+
+    def body(self, encoding):
+        """File contents in the given encoding (None for identity), read once and kept in memory"""
+        body = self._bodies.get(encoding)
+        if body is None:
+            # Two threads may both fill the same entry on first use; the results are identical
+            if encoding in self.variants:
+                with open(self.variants[encoding], 'rb') as f:
+                    body = f.read()
+            elif encoding == 'gzip':
+                body = gzip.compress(self.body(None), compresslevel=9, mtime=0)
+            else:
+                with open(self.path, 'rb') as f:
+                    body = f.read()
+            self._bodies[encoding] = body
+        return body
+
+class StaticManifest:
+    """Every file under the static folder, scanned once at startup so requests never touch os.path"""
+
+    def __init__(self, static_dir, gzip_min_bytes=1024):
+        self.static_dir = static_dir
+        self.gzip_min_bytes = gzip_min_bytes
+        self.assets = {}
+        if static_dir and os.path.isdir(static_dir):
+            suffixes = tuple(suffix for _, suffix in ENCODINGS)
+            for root, _, files in os.walk(static_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    relative = os.path.relpath(path, static_dir).replace(os.sep, '/')
+                    # Precompressed variants are picked up by the file they belong to
+                    if name.endswith(suffixes) and os.path.exists(path.rsplit('.', 1)[0]):
+                        continue
+                    self.assets[relative] = StaticAsset(path, relative, gzip_min_bytes)
+        self.index = self.assets.get('index.html')
+
+    def lookup(self, path):
+        """Asset for a URL path; unknown paths get index.html for client-side routing"""
+        key = path.lstrip('/')
+        # Flask also serves the folder under /static/
+        asset = self.assets.get(key) or (self.assets.get(key[7:]) if key.startswith('static/') else None)
+        if asset is not None:
+            return asset
+        # A missing bundle means a stale page asked for an old build; HTML in its place would not parse
+        if key.startswith('assets/'):
+            return None
+        return self.index
+
+    def choose_encoding(self, asset, accept_encoding):
+        if not asset.encodings or not accept_encoding:
+            return None
+        accepted = parse_accept_header(accept_encoding)
+        for encoding in asset.encodings:
+            if accepted[encoding]:
+                return encoding
+        return None
+
+    def respond(self, path, method, headers):
+        """(status, headers, body) for a GET/HEAD of a static path; `headers` is a dict with lower-case keys or a Headers object"""
+        asset = self.lookup(path)
+        if asset is None:
+            return 404, [('Content-Type', 'text/plain; charset=utf-8')], b'Not found'
+
+        encoding = self.choose_encoding(asset, headers.get('accept-encoding'))
+        etag = f'"{asset.etag}-{encoding}"' if encoding else f'"{asset.etag}"'
+        response_headers = [
+            ('Cache-Control', asset.cache_control),
+            ('ETag', etag),
+            ('Last-Modified', asset.last_modified),
+        ]
+        if asset.encodings:
+            response_headers.append(('Vary', 'Accept-Encoding'))
+
+        if not_modified(headers, etag, asset.mtime):
+            return 304, response_headers, b''
+
+        body = asset.body(encoding)
+        response_headers.append(('Content-Type', asset.mimetype))
+        response_headers.append(('Content-Length', str(len(body))))
+        if encoding:
+            response_headers.append(('Content-Encoding', encoding))
+        return 200, response_headers, b'' if method == 'HEAD' else body
+
+def not_modified(headers, etag, mtime):
+    """If-None-Match takes precedence over If-Modified-Since (RFC 9110)"""
+    if_none_match = headers.get('if-none-match')
+    if if_none_match:
+        return parse_etags(if_none_match).contains_weak(etag.strip('"'))
+    since = parse_date(headers.get('if-modified-since'))
+    return since is not None and mtime <= since.timestamp()
+
+def get_manifest(app):
+    return app.extensions['static_manifest']
+
+def init_static_assets(app):
+    app.extensions['static_manifest'] = StaticManifest(app.static_folder, app.config['STATIC_GZIP_MIN_BYTES'])
+
+def compress_static(static_dir, min_bytes=1024):
+    """Write .gz (and .br when the brotli package is installed) next to compressible files
+
+    Returns {encoding: files written}. Run after `vite build`; the server picks the files up on start.
+    """
+    try:
+        import brotli
+    except ImportError:  # gzip alone still works everywhere
+        brotli = None
+
+    written = {'gzip': 0, 'br': 0}
+    for relative, asset in StaticManifest(static_dir, min_bytes).assets.items():
+        if not asset.compressible or os.path.getsize(asset.path) < min_bytes:
+            continue
+        data = asset.body(None)
+        with open(asset.path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        written['gzip'] += 1
+        if brotli is not None:
+            with open(asset.path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+            written['br'] += 1
+    return written
+
+class StaticAssetApp:
+    """ASGI app answering dashboard file requests from the manifest and passing the API to `fallback`"""
+
+    def __init__(self, manifest, fallback):
+        self.manifest = manifest
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get('path', '') if scope['type'] == 'http' else ''
+        if not path or path.startswith('/api/') or scope['method'] not in ('GET', 'HEAD'):
+            return await self.fallback(scope, receive, send)
+
+        started = time.perf_counter()
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        status, response_headers, body = self.manifest.respond(path, scope['method'], headers)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        observe_request('static', scope['method'], status, time.perf_counter() - started, 0, 0.0)
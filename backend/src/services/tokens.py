@@ -0,0 +1,56 @@
+from flask import current_app, request
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+import hashlib
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+# Serializers hold the derived signing keys; build them once per key set and token type
+_serializers = {}
+
+def get_serializer(token_type):
+    keys = tuple(current_app.config.get('TOKEN_SECRET_KEYS') or [current_app.config['SECRET_KEY']])
+    cache_key = (keys, token_type)
+    serializer = _serializers.get(cache_key)
+    if serializer is None:
+        # With several keys the last one signs and all of them verify, which allows rotation
+        serializer = URLSafeTimedSerializer(list(keys), salt=f'leadlift-{token_type}-token')
+        _serializers[cache_key] = serializer
+    return serializer
+
+def password_fingerprint(user):
+    """Short digest of the password hash; changing the password revokes refresh tokens"""
+    return hashlib.sha256(user.password_hash.encode('utf-8')).hexdigest()[:16]
+
+def issue_tokens(user):
+    """Create an access/refresh token pair for a user"""
+    access_claims = {
+        'uid': user.id,
+        'usr': user.username,
+        'role': user.role,
+        'act': bool(user.is_active)
+    }
+    refresh_claims = {
+        'uid': user.id,
+        'pwd': password_fingerprint(user)
+    }
+    return {
+        'access_token': get_serializer(ACCESS).dumps(access_claims),
+        'refresh_token': get_serializer(REFRESH).dumps(refresh_claims),
+        'token_type': 'Bearer',
+        'expires_in': current_app.config['ACCESS_TOKEN_TTL']
+    }
+
+def verify_token(token, token_type):
+    """Return the token's claims, or None if it is invalid or expired"""
+    max_age = current_app.config['ACCESS_TOKEN_TTL'] if token_type == ACCESS else current_app.config['REFRESH_TOKEN_TTL']
+    try:
+        return get_serializer(token_type).loads(token, max_age=max_age)
+    except (BadSignature, SignatureExpired):
+        return None
+
+def get_bearer_token():
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[7:].strip() or None
+    return None
@@ -0,0 +1,41 @@
+from models.user import db, UTM_FIELDS, intern_utm
+from services.sharding import engine_for, shard_names
+from sqlalchemy import inspect, text
+
+def legacy_utm_columns(engine):
+    """UTM string columns still present on submissions from before dictionary encoding"""
+    columns = {column['name'] for column in inspect(engine).get_columns('submissions')}
+    return [name for name in UTM_FIELDS if name in columns], columns
+
+def encode_legacy_utm_columns(drop=True):
+    """Move legacy UTM strings into utm_values and the *_id columns on every shard; returns rows updated
+
+    utm_values stays on the primary, so values are interned (and committed) through the session
+    before the shard's rows are pointed at them.
+    """
+    updated = 0
+    for shard in shard_names():
+        engine = engine_for(shard)
+        legacy, columns = legacy_utm_columns(engine)
+        for name in legacy:
+            id_column = name + '_id'
+            if id_column not in columns:
+                with engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE submissions ADD COLUMN {id_column} INTEGER'))
+            with engine.connect() as connection:
+                values = connection.execute(text(
+                    f'SELECT DISTINCT {name} FROM submissions WHERE {name} IS NOT NULL AND {id_column} IS NULL'
+                )).scalars().all()
+            ids = {value: intern_utm(value) for value in values}
+            db.session.commit()
+
+            with engine.begin() as connection:
+                for value, utm_id in ids.items():
+                    result = connection.execute(
+                        text(f'UPDATE submissions SET {id_column} = :utm_id WHERE {name} = :value AND {id_column} IS NULL'),
+                        {'utm_id': utm_id, 'value': value}
+                    )
+                    updated += result.rowcount
+                if drop:
+                    connection.execute(text(f'ALTER TABLE submissions DROP COLUMN {name}'))
+    return updated
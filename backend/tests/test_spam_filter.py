@@ -0,0 +1,52 @@
+"""Capture endpoint honeypot: only the tracking script's own hidden field marks a bot
+
+Run from backend/: python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+@pytest.fixture(scope='module')
+def app():
+    workdir = tempfile.mkdtemp(prefix='test-spam-')
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'test.db')}"
+    from main import app, init_db
+    from models.user import db, Client
+    with app.app_context():
+        init_db()
+        db.session.add(Client(name='Test', domain='example.com', client_id='test-client'))
+        db.session.commit()
+    return app
+
+def stored(app, email):
+    from models.user import Submission
+    with app.app_context():
+        return Submission.query.filter_by(client_id='test-client', email=email).count()
+
+def test_form_with_website_url_field_is_stored(app):
+    response = app.test_client().post('/api/submissions/test-client', json={
+        'email': 'real@lead.com', 'website_url': 'https://mycompany.com', 'hp': 'yes', 'honeypot': 'x'
+    })
+    assert response.status_code == 200
+    assert stored(app, 'real@lead.com') == 1
+
+def test_empty_honeypot_is_stored(app):
+    response = app.test_client().post('/api/submissions/test-client', json={'email': 'ok@lead.com', 'leadlift_hp': ''})
+    assert response.status_code == 200
+    assert stored(app, 'ok@lead.com') == 1
+
+def test_filled_honeypot_is_dropped(app):
+    response = app.test_client().post('/api/submissions/test-client', json={'email': 'bot@lead.com', 'leadlift_hp': 'x'})
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+    assert stored(app, 'bot@lead.com') == 0
+
+def test_tracking_script_adds_the_honeypot(app):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    script = client.get('/api/clients/test-client/tracking-script').get_json()['script']
+    assert "const HONEYPOT = 'leadlift_hp';" in script